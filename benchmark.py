@@ -0,0 +1,429 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pygame
+
+from engine.engine import RPGEngine
+from engine.input_state import InjectedInput
+from engine.script_compiler import compile_script
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Сценарии: имя -> количество объектов по умолчанию
+DEFAULT_SCENARIOS = [
+    ('baseline', 0),
+    ('enemies', 2000),
+    ('colliders', 2000),
+    ('npcs', 500),
+    ('scripts', 50),
+    ('quests', 200)
+]
+
+# Подсистемы, чье время считается отдельно: имя -> (атрибут движка, метод)
+TICK_SUBSYSTEMS = {
+    'movement': ('map_system', 'update_player_position'),
+    'entities': ('entity_manager', 'update'),
+    'combat': ('entity_manager', 'check_attack_hit'),
+    'npcs': ('npc_system', 'update'),
+    'quests': ('quest_system', 'update_quests'),
+    'scripts': ('script_runner', 'update'),
+    'events': ('event_bus', 'flush'),
+    'cooldowns': ('cache_manager', 'update_cooldowns'),
+    # Запись на диск вызывается изнутри других подсистем и входит и в их время
+    'cooldown_saves': ('cache_manager', 'save_slot_cooldown'),
+    'value_saves': ('value_system', 'flush_changes')
+}
+
+RENDER_SUBSYSTEMS = {
+    'map': ('map_system', 'render'),
+    'entities': ('entity_manager', 'render'),
+    'npcs': ('npc_system', 'render'),
+    'hud': ('hud', 'render'),
+    'menu': ('menu_system', 'render'),
+    'present': ('presenter', 'present')
+}
+
+# Строки скрипта для замера пропускной способности интерпретатора
+THROUGHPUT_LINES = [
+    "%0.v -= 0",
+    "&%0.v > -1:",
+    "$quest.Cancel(999999)",
+    "$map.remove(\"benchmark_missing\")",
+    "$npc.dialog(999999)",
+    "&end",
+    "@open.menu(999999)"
+]
+
+# Пороги шума для compare: разница меньше не считается регрессией
+NOISE_FLOOR = {'ms': 0.05, 'kb': 256}
+
+def build_enemies(engine, count, rng, ticks):
+    template_ids = sorted(engine.entity_manager.enemy_templates)
+    center_x, center_y = engine.player["rect"].center
+    for _ in range(count):
+        engine.entity_manager.spawn_enemy(rng.choice(template_ids),
+                                          center_x + rng.randint(-3000, 3000),
+                                          center_y + rng.randint(-3000, 3000))
+
+def build_colliders(engine, count, rng, ticks):
+    center_x, center_y = engine.player["rect"].center
+    for i in range(count):
+        x = center_x + rng.randint(-4000, 4000)
+        y = center_y + rng.randint(-4000, 4000)
+        if abs(x - center_x) < 400 and abs(y - center_y) < 400:
+            continue  # оставляем игроку место для движения
+        engine.map_system.add_map_object(f"bench_wall_{i}", {
+            'type': 'wall',
+            'layer': 1,
+            'collision': True,
+            'world_pos': [x, y],
+            'world_size': [rng.randint(16, 96), rng.randint(16, 96)],
+            'texture': {'color': [90, 90, 100]}
+        })
+
+def build_npcs(engine, count, rng, ticks):
+    template_ids = sorted(engine.npc_system.npc_templates)
+    center_x, center_y = engine.player["rect"].center
+    for _ in range(count):
+        engine.npc_system.spawn_npc(rng.choice(template_ids),
+                                    center_x + rng.randint(-3000, 3000),
+                                    center_y + rng.randint(-3000, 3000))
+
+def build_scripts(engine, count, rng, ticks):
+    """Длинный скрипт: count команд за тик на весь прогон"""
+    commands = []
+    for _ in range(ticks + 1):
+        for i in range(count):
+            kind = i % 4
+            if kind == 0:
+                commands.append("%0.v -= 0")
+            elif kind == 1:
+                commands.append("&%0.v > 100:")
+            elif kind == 2:
+                commands.append("$function.nullstroke")
+            else:
+                commands.append("&end")
+        # Условие тика закрывается в этом же тике, иначе ложное условие перепрыгнет весь скрипт
+        if count % 4 in (2, 3):
+            commands.append("&end")
+        commands.append("!delay(0)")
+    
+    script = engine.script_runner.parse_script({
+        'name': 'Benchmark Script',
+        'script': commands
+    })
+    if script['errors']:
+        raise RuntimeError(f"Benchmark script does not compile: {script['errors'][0]}")
+    script_id = max(engine.script_runner.scripts, default=0) + 1
+    engine.script_runner.scripts[script_id] = script
+    engine.script_runner.execute_script(script_id)
+
+def build_quests(engine, count, rng, ticks):
+    templates = list(engine.quest_system.quests.values())
+    if not templates:
+        return
+    quest_id = max(engine.quest_system.quests) + 1
+    for i in range(count):
+        quest = dict(templates[i % len(templates)])
+        quest['id'] = quest_id + i
+        engine.quest_system.quests[quest_id + i] = quest
+        engine.quest_system.give_quest(quest_id + i)
+
+SCENARIO_BUILDERS = {
+    'baseline': None,
+    'enemies': build_enemies,
+    'colliders': build_colliders,
+    'npcs': build_npcs,
+    'scripts': build_scripts,
+    'quests': build_quests
+}
+
+def drive_input(engine, tick):
+    """Детерминированный ввод: ходим по кругу и держим атаку"""
+    engine.input.clear()
+    phase = (tick // 60) % 4
+    engine.input.press((pygame.K_d, pygame.K_s, pygame.K_a, pygame.K_w)[phase])
+    engine.input.set_mouse(pos=(400, 300), buttons=[True, False, False])
+
+def instrument(engine, subsystems, totals):
+    """Оборачивает методы подсистем таймерами, время копится в totals"""
+    for name, (attr, method) in subsystems.items():
+        target = getattr(engine, attr)
+        original = getattr(target, method)
+        totals[name] = 0.0
+        
+        def timed(*args, _original=original, _name=name, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _original(*args, **kwargs)
+            finally:
+                totals[_name] += time.perf_counter() - start
+        
+        setattr(target, method, timed)
+
+def summarize(samples):
+    """mean/p50/p95/max в миллисекундах"""
+    if not samples:
+        return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    ordered = sorted(samples)
+    
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+    
+    return {
+        'mean': sum(ordered) / len(ordered) * 1000,
+        'p50': percentile(0.5),
+        'p95': percentile(0.95),
+        'max': ordered[-1] * 1000
+    }
+
+def run_scenario(name, count, mode, ticks, warmup, seed):
+    """Один прогон сценария во временной папке кэша; возвращает словарь метрик"""
+    with tempfile.TemporaryDirectory(prefix='timeengine_bench_') as cache_dir:
+        return measure_scenario(name, count, mode, ticks, warmup, seed, cache_dir)
+
+def measure_scenario(name, count, mode, ticks, warmup, seed, cache_dir):
+    headless = mode == 'headless'
+    rng = random.Random(seed)
+    engine = None
+    
+    # Память меряется только на запуске, сборке сцены и прогреве: трассировка замедлила бы замер тиков
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            engine = RPGEngine(headless=headless, cache_dir=cache_dir)
+            startup = time.perf_counter() - start
+            engine.input = InjectedInput()
+            engine.script_runner.silent_mode = True
+            
+            start = time.perf_counter()
+            builder = SCENARIO_BUILDERS[name]
+            if builder:
+                builder(engine, count, rng, ticks + warmup)
+            if engine.inventory.get_item(0):
+                engine.toggle_slot(0)
+            build = time.perf_counter() - start
+            
+            for tick in range(warmup):
+                drive_input(engine, tick)
+                engine.tick()
+                engine.render()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        
+        tick_totals = {}
+        render_totals = {}
+        instrument(engine, TICK_SUBSYSTEMS, tick_totals)
+        if not headless:
+            instrument(engine, RENDER_SUBSYSTEMS, render_totals)
+        
+        tick_samples = []
+        render_samples = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for tick in range(warmup, warmup + ticks):
+                drive_input(engine, tick)
+                start = time.perf_counter()
+                engine.tick()
+                tick_samples.append(time.perf_counter() - start)
+                
+                if not headless:
+                    start = time.perf_counter()
+                    engine.render()
+                    render_samples.append(time.perf_counter() - start)
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if engine is not None:
+            # Останавливаем поток записи до удаления временной папки
+            engine.cache_manager.shutdown()
+    
+    result = {
+        'scenario': name,
+        'count': count,
+        'mode': mode,
+        'ticks': ticks,
+        'startup_ms': startup * 1000,
+        'build_ms': build * 1000,
+        'tick_ms': summarize(tick_samples),
+        'subsystems_ms': {key: total / ticks * 1000 for key, total in tick_totals.items()},
+        'warmup_peak_memory_kb': peak_memory // 1024
+    }
+    if not headless:
+        result['render_ms'] = summarize(render_samples)
+        result['render_subsystems_ms'] = {key: total / ticks * 1000 for key, total in render_totals.items()}
+        pygame.display.quit()
+    return result
+
+def run_throughput(args):
+    """Команд в секунду: разбор исходника при каждом запуске против закэшированной программы"""
+    lines = [THROUGHPUT_LINES[i % len(THROUGHPUT_LINES)] for i in range(args.lines)]
+    source = '\n'.join(lines)
+    
+    with tempfile.TemporaryDirectory(prefix='timeengine_bench_') as cache_dir, \
+            contextlib.redirect_stdout(io.StringIO()):
+        engine = RPGEngine(headless=True, cache_dir=cache_dir)
+        try:
+            runner = engine.script_runner
+            runner.silent_mode = True
+            runner.instruction_budget = 0
+            runner.time_budget = 0
+            
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                runner.execute_program(compile_script(source)[0])
+            uncached = time.perf_counter() - start
+            
+            program = runner.compile_block(source)
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                runner.execute_program(program)
+            cached = time.perf_counter() - start
+        finally:
+            engine.cache_manager.shutdown()
+    
+    commands = args.lines * args.runs
+    report = {
+        'lines': args.lines,
+        'runs': args.runs,
+        'uncached_commands_per_s': commands / uncached,
+        'compiled_commands_per_s': commands / cached,
+        'speedup': uncached / cached
+    }
+    print(json.dumps(report, indent=2))
+
+def parse_scenarios(specs):
+    """'enemies=5000' -> ('enemies', 5000); без числа - количество по умолчанию"""
+    if not specs:
+        return list(DEFAULT_SCENARIOS)
+    defaults = dict(DEFAULT_SCENARIOS)
+    scenarios = []
+    for spec in specs:
+        name, _, count = spec.partition('=')
+        if name not in SCENARIO_BUILDERS:
+            raise SystemExit(f"Unknown scenario '{name}', available: {', '.join(SCENARIO_BUILDERS)}")
+        scenarios.append((name, int(count) if count else defaults[name]))
+    return scenarios
+
+def run_suite(args):
+    report = {
+        'version': 1,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'results': {}
+    }
+    
+    for name, count in parse_scenarios(args.scenario):
+        for mode in args.modes.split(','):
+            key = f"{name}_{count}/{mode}"
+            print(f"Running {key}...", file=sys.stderr)
+            try:
+                report['results'][key] = run_scenario(name, count, mode, args.ticks, args.warmup, args.seed)
+            except Exception as e:
+                print(f"Error running {key}: {e}", file=sys.stderr)
+                report['results'][key] = {'scenario': name, 'count': count, 'mode': mode, 'error': str(e)}
+    
+    if resource is not None:
+        report['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+        print(f"Saved benchmark report to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+def flatten_metrics(result):
+    """Метрики прогона для сравнения: путь -> (значение, единица)"""
+    metrics = {'startup_ms': (result['startup_ms'], 'ms')}
+    if 'warmup_peak_memory_kb' in result:
+        metrics['warmup_peak_memory_kb'] = (result['warmup_peak_memory_kb'], 'kb')
+    for group in ('tick_ms', 'render_ms'):
+        for stat in ('mean', 'p95'):
+            if group in result:
+                metrics[f"{group}.{stat}"] = (result[group][stat], 'ms')
+    for group in ('subsystems_ms', 'render_subsystems_ms'):
+        for key, value in result.get(group, {}).items():
+            metrics[f"{group}.{key}"] = (value, 'ms')
+    return metrics
+
+def compare_reports(args):
+    with open(args.baseline, 'r', encoding='utf-8') as file:
+        baseline = json.load(file)
+    with open(args.current, 'r', encoding='utf-8') as file:
+        current = json.load(file)
+    
+    regressions = 0
+    for key, result in current['results'].items():
+        base = baseline['results'].get(key)
+        if base is None or 'error' in base or 'error' in result:
+            print(f"{key}: skipped (missing or failed in one of the reports)")
+            continue
+        
+        base_metrics = flatten_metrics(base)
+        for metric, (value, unit) in flatten_metrics(result).items():
+            if metric not in base_metrics:
+                continue
+            base_value = base_metrics[metric][0]
+            change = (value - base_value) / base_value if base_value else 0.0
+            
+            status = 'ok'
+            if value - base_value > NOISE_FLOOR[unit] and change > args.threshold:
+                status = 'REGRESSION'
+                regressions += 1
+            elif base_value - value > NOISE_FLOOR[unit] and -change > args.threshold:
+                status = 'improved'
+            
+            if status != 'ok' or args.verbose:
+                print(f"{key} {metric}: {base_value:.3f} -> {value:.3f} {unit} ({change:+.1%}) {status}")
+    
+    print(f"{regressions} regression(s) over {args.threshold:.0%} threshold")
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="TimeEngine performance benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    run_parser = commands.add_parser('run', help="run scenarios and write a JSON report")
+    run_parser.add_argument('--scenario', action='append',
+                            help="name[=count], can be repeated (default: full suite)")
+    run_parser.add_argument('--modes', default='headless,windowed', help="headless,windowed")
+    run_parser.add_argument('--ticks', type=int, default=300)
+    run_parser.add_argument('--warmup', type=int, default=30)
+    run_parser.add_argument('--seed', type=int, default=1)
+    run_parser.add_argument('--output', '-o', help="report file (default: stdout)")
+    
+    compare_parser = commands.add_parser('compare', help="compare a report against a baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10, help="allowed slowdown (0.10 = 10%%)")
+    compare_parser.add_argument('--verbose', '-v', action='store_true', help="print unchanged metrics too")
+    
+    throughput_parser = commands.add_parser('throughput', help="measure script interpreter throughput")
+    throughput_parser.add_argument('--lines', type=int, default=200)
+    throughput_parser.add_argument('--runs', type=int, default=500)
+    
+    args = parser.parse_args()
+    if args.command == 'run':
+        run_suite(args)
+    elif args.command == 'throughput':
+        run_throughput(args)
+    else:
+        sys.exit(compare_reports(args))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,94 +1,206 @@
 import os
 import yaml
+import json
+import threading
 
 class CacheManager:
-    def __init__(self, cache_dir="engine/cache"):
+    def __init__(self, cache_dir="engine/cache", flush_interval=5.0, compact_every=100):
         self.cache_dir = cache_dir
-        self.slot_cooldowns = {}
-        self.values_cache = {}
+        self.slot_cooldowns = {}  # слот -> время окончания кд (время симуляции)
+        self.displayed_cooldowns = {}  # слот -> текст кд, который сейчас на HUD
+        self.game_time = 0.0
+        self.values_cache = {}  # значения в том виде, в каком они уже лежат на диске
+        self.hud = None
+        
+        # Write-behind: снапшот кд и журнал значений пишет фоновый поток раз в flush_interval секунд,
+        # при 0 потока нет и все пишется в shutdown
+        self.flush_interval = flush_interval
+        self.cooldowns_file = os.path.join(cache_dir, "cooldowns.yaml")
+        self.values_file = os.path.join(cache_dir, "values.yaml")
+        self.journal_file = os.path.join(cache_dir, "values.journal")
+        self.lock = threading.Lock()  # состояние, которое делят игра и поток записи
+        self.io_lock = threading.Lock()  # файлы пишет только один поток за раз
+        self.dirty = False
+        self.pending_values = {}  # value_id -> значение, еще не попавшее в журнал
+        self.journal_entries = 0
+        self.compact_every = compact_every  # после стольких записей журнал сворачивается в values.yaml
+        self.writer = None
+        self.stop_event = threading.Event()
+    
+    def invalidate_hud(self, old_cooldown, new_cooldown):
+        """Перерисовывает HUD, только если изменилось отображаемое значение кд"""
+        if not self.hud:
+            return
+        if (old_cooldown > 0) != (new_cooldown > 0) or f"{old_cooldown:.1f}" != f"{new_cooldown:.1f}":
+            self.hud.invalidate('inventory')
+            self.hud.invalidate('cooldown')
+    
+    def mark_dirty(self):
+        """Снапшот кд устарел; запускает фоновую запись при первой необходимости"""
+        with self.lock:
+            self.dirty = True
+        self.start_writer()
+    
+    def start_writer(self):
+        if self.writer is None and self.flush_interval:
+            self.writer = threading.Thread(target=self.writer_loop, name="CooldownWriter", daemon=True)
+            self.writer.start()
     
     def save_slot_cooldown(self, slot, cooldown):
-        """Сохраняет кд для слота"""
-        self.slot_cooldowns[slot] = cooldown
-        
-        # Сохраняем в файл
-        cooldown_data = {
-            'slot': slot,
-            'cooldown': cooldown
-        }
-        
-        # Создаем папку если не существует
-        os.makedirs(self.cache_dir, exist_ok=True)
-        
-        file_path = os.path.join(self.cache_dir, f"slot_{slot}_cooldown.yaml")
-        with open(file_path, 'w', encoding='utf-8') as file:
-            yaml.dump(cooldown_data, file)
+        """Сохраняет кд для слота (в секундах)"""
+        self.invalidate_hud(self.get_slot_cooldown(slot), cooldown)
+        with self.lock:
+            self.slot_cooldowns[slot] = self.game_time + cooldown
+        self.displayed_cooldowns[slot] = f"{cooldown:.1f}"
+        self.mark_dirty()
     
     def load_slot_cooldowns(self):
-        """Загружает все кд слотов из cache"""
-        self.slot_cooldowns = {}
+        """Загружает кд слотов из снапшота"""
+        snapshot = {}
+        if os.path.exists(self.cooldowns_file):
+            try:
+                with open(self.cooldowns_file, 'r', encoding='utf-8') as file:
+                    snapshot = yaml.safe_load(file) or {}
+            except Exception as e:
+                print(f"Error loading cooldowns: {e}")
         
-        if os.path.exists(self.cache_dir):
-            for file_name in os.listdir(self.cache_dir):
-                if file_name.startswith('slot_') and file_name.endswith('_cooldown.yaml'):
-                    file_path = os.path.join(self.cache_dir, file_name)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as file:
-                            cooldown_data = yaml.safe_load(file)
-                            slot = cooldown_data.get('slot')
-                            cooldown = cooldown_data.get('cooldown', 0)
-                            if slot is not None:
-                                self.slot_cooldowns[slot] = cooldown
-                    except:
-                        continue
+        with self.lock:
+            self.slot_cooldowns = {}
+            for slot, remaining in snapshot.items():
+                if remaining > 0:
+                    self.slot_cooldowns[int(slot)] = self.game_time + remaining
+        self.displayed_cooldowns = {slot: f"{self.get_slot_cooldown(slot):.1f}" for slot in self.slot_cooldowns}
     
     def get_slot_cooldown(self, slot):
-        """Получает кд для слота"""
-        return self.slot_cooldowns.get(slot, 0)
+        """Получает оставшийся кд для слота"""
+        expiry = self.slot_cooldowns.get(slot)
+        if expiry is None:
+            return 0
+        return max(0, expiry - self.game_time)
     
     def clear_slot_cooldown(self, slot):
         """Очищает кд для слота"""
         if slot in self.slot_cooldowns:
-            del self.slot_cooldowns[slot]
-        
-        # Удаляем файл
-        file_path = os.path.join(self.cache_dir, f"slot_{slot}_cooldown.yaml")
-        if os.path.exists(file_path):
-            os.remove(file_path)
+            self.invalidate_hud(self.get_slot_cooldown(slot), 0)
+            with self.lock:
+                del self.slot_cooldowns[slot]
+            self.displayed_cooldowns.pop(slot, None)
+            self.mark_dirty()
     
-    def update_cooldowns(self):
-        """Обновляет все кд (уменьшает на 1 кадр)"""
-        slots_to_remove = []
+    def update_cooldowns(self, delta_time):
+        """Сдвигает время; на диск ничего не пишет"""
+        self.game_time += delta_time
         
         for slot in list(self.slot_cooldowns.keys()):
-            if self.slot_cooldowns[slot] > 0:
-                self.slot_cooldowns[slot] -= 1
-                if self.slot_cooldowns[slot] <= 0:
-                    slots_to_remove.append(slot)
-                else:
-                    self.save_slot_cooldown(slot, self.slot_cooldowns[slot])
+            remaining = self.get_slot_cooldown(slot)
+            if remaining <= 0:
+                self.clear_slot_cooldown(slot)
+            elif self.hud and self.displayed_cooldowns.get(slot) != f"{remaining:.1f}":
+                # HUD перерисовывается только при смене показанных десятых
+                self.displayed_cooldowns[slot] = f"{remaining:.1f}"
+                self.hud.invalidate('inventory')
+                self.hud.invalidate('cooldown')
+    
+    def write_cooldowns_snapshot(self):
+        """Атомарно пишет снапшот оставшихся кд (tmp файл + rename)"""
+        with self.lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            snapshot = {slot: round(expiry - self.game_time, 3) for slot, expiry in self.slot_cooldowns.items()
+                        if expiry > self.game_time}
         
-        # Удаляем завершенные кд
-        for slot in slots_to_remove:
-            self.clear_slot_cooldown(slot)
+        try:
+            with self.io_lock:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                temp_path = self.cooldowns_file + ".tmp"
+                with open(temp_path, 'w', encoding='utf-8') as file:
+                    yaml.safe_dump(snapshot, file)
+                os.replace(temp_path, self.cooldowns_file)
+        except Exception as e:
+            with self.lock:
+                self.dirty = True
+            print(f"Error saving cooldowns: {e}")
+    
+    def writer_loop(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.write_cooldowns_snapshot()
+            self.flush_values()
+    
+    def shutdown(self):
+        """Останавливает фоновую запись и сбрасывает все несохраненное"""
+        self.stop_event.set()
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+        self.write_cooldowns_snapshot()
+        self.flush_values()
+    
+    def queue_values(self, changes):
+        """Ставит изменения значений в очередь записи; повторные изменения одного id схлопываются.
+        При flush_interval = 0 очередь пишется только в shutdown"""
+        with self.lock:
+            self.pending_values.update(changes)
+        self.start_writer()
+    
+    def flush_values(self):
+        """Дописывает накопленные изменения в журнал, при необходимости сворачивает его"""
+        with self.lock:
+            changes = self.pending_values
+            self.pending_values = {}
+        if not changes:
+            return
+        
+        try:
+            with self.io_lock:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(self.journal_file, 'a', encoding='utf-8') as file:
+                    file.write(json.dumps({str(value_id): value for value_id, value in changes.items()}) + "\n")
+                    file.flush()
+                    os.fsync(file.fileno())
+                self.journal_entries += 1
+                self.apply_journal_entry(self.values_cache, changes)
+            
+            if self.journal_entries >= self.compact_every:
+                self.save_values(self.values_cache)
+        except Exception as e:
+            with self.lock:
+                # Не теряем изменения: более новые из очереди важнее
+                changes.update(self.pending_values)
+                self.pending_values = changes
+            print(f"Error writing values journal: {e}")
+    
+    def apply_journal_entry(self, values, changes):
+        for value_id, value in changes.items():
+            value_id = int(value_id)
+            if value_id in values:
+                values[value_id]['value'] = value
     
     def save_values(self, values):
-        """Сохраняет значения в кэш"""
+        """Сохраняет все значения в values.yaml атомарно и очищает журнал (компакция)"""
         values_data = {}
         for value_id, value_data in values.items():
-            values_data[f"value_{value_id}"] = value_data
+            values_data[f"value_{value_id}"] = dict(value_data, id=value_id)
         
-        file_path = os.path.join(self.cache_dir, "values.yaml")
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        with open(file_path, 'w', encoding='utf-8') as file:
-            yaml.dump(values_data, file)
+        with self.io_lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = self.values_file + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                yaml.dump(values_data, file)
+            os.replace(temp_path, self.values_file)
+            
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+            self.journal_entries = 0
+            self.values_cache = {value_id: dict(value_data) for value_id, value_data in values.items()}
     
     def load_values(self):
-        """Загружает значения из кэша"""
-        values = {}
-        file_path = os.path.join(self.cache_dir, "values.yaml")
+        """Собирает значения из конфига и накладывает сохраненные из кэша и журнала.
+        Набор id, имена и min/max всегда берутся из конфига, из кэша - только value"""
+        values = self.load_values_from_config()
+        file_path = self.values_file
         
+        cached = {}
         if os.path.exists(file_path):
             try:
                 with open(file_path, 'r', encoding='utf-8') as file:
@@ -96,19 +208,40 @@ class CacheManager:
                 
                 for key, value_data in values_data.items():
                     if isinstance(value_data, dict):
-                        values[value_data.get('id')] = {
-                            'name': value_data.get('name', f'Value {value_data.get("id")}'),
-                            'value': value_data.get('value', 0),
-                            'min': value_data.get('min', 0),
-                            'max': value_data.get('max', float('inf'))
-                        }
+                        cached[value_data.get('id')] = value_data
             except Exception as e:
                 print(f"Error loading values from cache: {e}")
         
-        # Если нет кэша, загружаем из конфига
-        if not values:
-            values = self.load_values_from_config()
+        for value_id, value_data in values.items():
+            if value_id in cached and 'value' in cached[value_id]:
+                value_data['value'] = cached[value_id]['value']
+        
+        # Изменения после последней компакции лежат в журнале
+        replayed = 0
+        if os.path.exists(self.journal_file):
+            try:
+                with open(self.journal_file, 'r', encoding='utf-8') as file:
+                    for line in file:
+                        try:
+                            self.apply_journal_entry(values, json.loads(line))
+                            replayed += 1
+                        except ValueError:
+                            break  # недописанная при падении строка
+            except Exception as e:
+                print(f"Error replaying values journal: {e}")
+        
+        # Сохраненное значение могло выйти за новые границы из конфига
+        for value_data in values.values():
+            value_data['value'] = max(value_data['min'], min(value_data['max'], value_data['value']))
+        
+        # Переписываем кэш, если журнал докатился или схема в конфиге поменялась
+        schema_changed = set(cached) != set(values) or any(
+            cached[value_id].get(field) != value_data[field]
+            for value_id, value_data in values.items() for field in ('name', 'value', 'min', 'max'))
+        if replayed or schema_changed:
             self.save_values(values)
+        else:
+            self.values_cache = {value_id: dict(value_data) for value_id, value_data in values.items()}
         
         return values
     
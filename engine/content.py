@@ -0,0 +1,471 @@
+import io
+import os
+import sys
+import yaml
+import pickle
+import hashlib
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+
+# Категории контента и их папки
+CONTENT_PATHS = {
+    'items': os.path.join("game", "items"),
+    'enemys': os.path.join("game", "enemys"),
+    'npcs': os.path.join("game", "npcs"),
+    'quests': os.path.join("game", "quests"),
+    'maps': os.path.join("game", "maps"),
+    'menus': os.path.join("game", "menus"),
+    'scripts': os.path.join("game", "scripts"),
+    'lang': os.path.join("engine", "lang")
+}
+
+# Как категория называется в сообщениях об ошибках
+CONTENT_LABELS = {
+    'items': "item",
+    'enemys': "enemy template",
+    'npcs': "NPC template",
+    'quests': "quest",
+    'maps': "map",
+    'menus': "menu",
+    'scripts': "script",
+    'lang': "localization"
+}
+
+# Шаблоны, которые в ленивом режиме читаются по первому обращению
+LAZY_CATEGORIES = ('enemys', 'npcs', 'quests', 'maps', 'menus')
+
+PACK_MAGIC = b'TEPACK'
+PACK_VERSION = 3  # растет при любом изменении формата пака или предрасчета
+INDEX_MAGIC = b'TEINDX'
+INDEX_VERSION = 1
+
+# Классы, которые можно создать при чтении пака и индекса. Любой другой global в файле - ошибка,
+# поэтому подмененный пак не может выполнить произвольный код через pickle
+SAFE_CLASSES = {
+    ('engine.script_compiler', 'Instruction'),
+    ('engine.script_compiler', 'ScriptCompileError'),
+    ('engine.quest_specs', 'QuestTask'),
+    ('engine.quest_specs', 'QuestReward'),
+    ('engine.quest_specs', 'QuestSpec'),
+    ('engine.quest_specs', 'QuestSpecError'),
+    # yaml.safe_load разбирает даты и время со смещением в эти типы
+    ('datetime', 'date'),
+    ('datetime', 'datetime'),
+    ('datetime', 'timezone'),
+    ('datetime', 'timedelta')
+}
+
+class SafeUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if (module, name) not in SAFE_CLASSES:
+            raise pickle.UnpicklingError(f"{module}.{name} is not allowed in content files")
+        return super().find_class(module, name)
+
+def list_content_files(category):
+    """Пути YAML файлов категории в порядке os.listdir"""
+    path = CONTENT_PATHS[category]
+    if not os.path.exists(path):
+        return []
+    return [os.path.join(path, file_name) for file_name in os.listdir(path) if file_name.endswith(".yaml")]
+
+def file_hash(file_path):
+    with open(file_path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+def write_binary(file_path, magic, version, data):
+    """Пишет заголовок с версией + pickle атомарно"""
+    temp_path = file_path + ".tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(magic + version.to_bytes(4, 'little'))
+        pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, file_path)
+
+def read_binary(file_path, magic, version):
+    """Читает файл одним чтением; None, если файла нет или версия другая.
+    Из pickle создаются только классы SAFE_CLASSES"""
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'rb') as file:
+        raw = file.read()
+    header_size = len(magic) + 4
+    if raw[:len(magic)] != magic:
+        return None
+    if int.from_bytes(raw[len(magic):header_size], 'little') != version:
+        return None
+    return SafeUnpickler(io.BytesIO(raw[header_size:])).load()
+
+def parse_yaml_file(file_path):
+    """(путь, данные, текст ошибки) - выполняется и в процессах-воркерах"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return file_path, yaml.safe_load(file), None
+    except Exception as e:
+        return file_path, None, str(e)
+
+class YamlContent:
+    """Источник контента: YAML файлы из game/, по одному на главном потоке"""
+    def parse_files(self, category):
+        return [parse_yaml_file(file_path) for file_path in list_content_files(category)]
+    
+    def load(self, category):
+        """Список (имя файла, данные) категории; ошибки печатаются по каждому файлу"""
+        loaded = []
+        for file_path, data, error in self.parse_files(category):
+            file_name = os.path.basename(file_path)
+            if error is None and not isinstance(data, dict):
+                error = "file is empty or not a mapping"
+            if error is not None:
+                print(f"Error loading {CONTENT_LABELS[category]} {file_name}: {error}")
+                continue
+            loaded.append((file_name, data))
+        return loaded
+    
+    def templates(self, category):
+        """{id: данные} категории"""
+        templates = {}
+        for file_name, data in self.load(category):
+            template_id = data.get('id')
+            if template_id is not None:
+                templates[template_id] = data
+        return templates
+    
+    def read(self, category, file_name):
+        """Данные одного файла или None, если его нет"""
+        file_path = os.path.join(CONTENT_PATHS[category], file_name)
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return yaml.safe_load(file) or {}
+    
+    def get_resolved(self, key):
+        """Предрассчитанные данные (предметы, скрипты, разобранные квесты); у YAML их нет"""
+        return None
+
+class ParallelYamlContent(YamlContent):
+    """Источник контента: все YAML файлы находятся сразу и разбираются пулом процессов"""
+    def __init__(self, workers=0, min_files=64):
+        self.parsed = {category: [] for category in CONTENT_PATHS}
+        files = [(category, file_path) for category in CONTENT_PATHS for file_path in list_content_files(category)]
+        file_paths = [file_path for category, file_path in files]
+        workers = min(workers or os.cpu_count() or 1, len(file_paths))
+        
+        # Мелкий контент быстрее разобрать на месте, чем запускать процессы
+        results = None
+        if workers > 1 and len(file_paths) >= min_files:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    chunk_size = max(1, len(file_paths) // (workers * 4))
+                    results = list(executor.map(parse_yaml_file, file_paths, chunksize=chunk_size))
+            except Exception as e:
+                print(f"Parallel content loading failed ({e}), loading serially")
+        if results is None:
+            results = [parse_yaml_file(file_path) for file_path in file_paths]
+        
+        # Порядок файлов внутри категории тот же, что у os.listdir
+        for (category, file_path), result in zip(files, results):
+            self.parsed[category].append(result)
+    
+    def parse_files(self, category):
+        return self.parsed.get(category, [])
+    
+    def read(self, category, file_name):
+        for file_path, data, error in self.parse_files(category):
+            if os.path.basename(file_path) == file_name:
+                if error is not None:
+                    raise ValueError(error)
+                return data or {}
+        return None
+
+class ContentIndex:
+    """Индекс id -> файл шаблона. Хранится на диске, при запуске перечитываются только измененные файлы"""
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.ids = {category: {} for category in LAZY_CATEGORIES}
+        self.stats = {'files': 0, 'parsed': 0}
+        self.load_or_build()
+    
+    def load_or_build(self):
+        try:
+            cached = read_binary(self.index_path, INDEX_MAGIC, INDEX_VERSION) or {}
+        except Exception as e:
+            print(f"Error loading content index: {e}")
+            cached = {}
+        
+        entries = {}
+        for category in LAZY_CATEGORIES:
+            for file_path in list_content_files(category):
+                stat = os.stat(file_path)
+                entry = cached.get(file_path)
+                if entry is None or entry[:2] != (stat.st_mtime_ns, stat.st_size):
+                    entry = (stat.st_mtime_ns, stat.st_size) + self.read_id(file_path)
+                    self.stats['parsed'] += 1
+                entries[file_path] = entry
+                
+                template_id, error = entry[2], entry[3]
+                if error is not None:
+                    print(f"Error loading {CONTENT_LABELS[category]} {os.path.basename(file_path)}: {error}")
+                elif template_id is not None:
+                    self.ids[category][template_id] = file_path
+        
+        self.stats['files'] = len(entries)
+        if entries != cached:
+            try:
+                write_binary(self.index_path, INDEX_MAGIC, INDEX_VERSION, entries)
+            except Exception as e:
+                print(f"Error saving content index: {e}")
+    
+    @staticmethod
+    def read_id(file_path):
+        """(id, текст ошибки) файла шаблона"""
+        file_path, data, error = parse_yaml_file(file_path)
+        if error is None and not isinstance(data, dict):
+            error = "file is empty or not a mapping"
+        if error is not None:
+            return None, error
+        return data.get('id'), None
+
+class LazyTemplates(MutableMapping):
+    """Словарь шаблонов: файл читается при первом обращении, давно не используемые выгружаются"""
+    def __init__(self, category, ids, max_loaded=256, max_bytes=0):
+        self.category = category
+        self.ids = ids  # id -> путь файла
+        self.max_loaded = max_loaded
+        self.max_bytes = max_bytes  # 0 - без лимита по объему
+        self.loaded = OrderedDict()  # id -> данные, в порядке использования
+        self.sizes = {}  # id -> оценка объема загруженного шаблона (размер файла)
+        self.loaded_bytes = 0
+        self.added = {}  # шаблоны, добавленные в рантайме - их негде перечитать
+        self.stats = {'hits': 0, 'loads': 0, 'evictions': 0}
+    
+    def __getitem__(self, template_id):
+        if template_id in self.added:
+            return self.added[template_id]
+        
+        data = self.loaded.get(template_id)
+        if data is not None:
+            self.loaded.move_to_end(template_id)
+            self.stats['hits'] += 1
+            return data
+        
+        file_path, data, error = parse_yaml_file(self.ids[template_id])
+        if error is None and not isinstance(data, dict):
+            error = "file is empty or not a mapping"
+        elif error is None and data.get('id') != template_id:
+            error = f"id changed to {data.get('id')}"
+        if error is not None:
+            # Файл сломан или изменен после индексации - шаблона больше нет, in тоже вернет False
+            print(f"Error loading {CONTENT_LABELS[self.category]} {os.path.basename(file_path)}: {error}")
+            self.ids.pop(template_id, None)
+            raise KeyError(template_id)
+        
+        size = os.path.getsize(file_path)
+        self.stats['loads'] += 1
+        self.loaded[template_id] = data
+        self.sizes[template_id] = size
+        self.loaded_bytes += size
+        self.evict()
+        return data
+    
+    def __setitem__(self, template_id, data):
+        self.added[template_id] = data
+        self.unload(template_id)
+    
+    def __delitem__(self, template_id):
+        if template_id not in self:
+            raise KeyError(template_id)
+        self.added.pop(template_id, None)
+        self.unload(template_id)
+        self.ids.pop(template_id, None)
+    
+    def __contains__(self, template_id):
+        return template_id in self.added or template_id in self.ids
+    
+    def __iter__(self):
+        yield from self.ids
+        for template_id in self.added:
+            if template_id not in self.ids:
+                yield template_id
+    
+    def __len__(self):
+        return len(self.ids) + sum(1 for template_id in self.added if template_id not in self.ids)
+    
+    def unload(self, template_id):
+        if self.loaded.pop(template_id, None) is not None:
+            self.loaded_bytes -= self.sizes.pop(template_id)
+    
+    def evict(self, max_loaded=None):
+        """Выгружает давно не использованные шаблоны сверх лимита по числу или по объему (0 - все)"""
+        limit = self.max_loaded if max_loaded is None else max_loaded
+        # Последний загруженный шаблон остается, даже если один больше лимита по объему
+        while len(self.loaded) > limit or (self.max_bytes and self.loaded_bytes > self.max_bytes and len(self.loaded) > 1):
+            template_id = self.loaded.popitem(last=False)[0]
+            self.loaded_bytes -= self.sizes.pop(template_id)
+            self.stats['evictions'] += 1
+    
+    def get_stats(self):
+        return dict(self.stats, loaded=len(self.loaded), loaded_bytes=self.loaded_bytes, known=len(self))
+
+class LazyContent(YamlContent):
+    """Источник контента: шаблоны читаются по индексу при первом обращении"""
+    def __init__(self, index_path, max_loaded=256, max_bytes=0):
+        self.index = ContentIndex(index_path)
+        self.max_loaded = max_loaded
+        self.max_bytes = max_bytes
+    
+    def templates(self, category):
+        if category not in LAZY_CATEGORIES:
+            return super().templates(category)
+        return LazyTemplates(category, dict(self.index.ids[category]), self.max_loaded, self.max_bytes)
+
+def load_yaml_content(workers=0, index_path=None, max_loaded=256, max_bytes=0):
+    """YAML источник: ленивый по индексу, параллельный или последовательный"""
+    if index_path:
+        return LazyContent(index_path, max_loaded, max_bytes)
+    if workers == 1:
+        return YamlContent()
+    return ParallelYamlContent(workers)
+
+class PackContent(YamlContent):
+    """Источник контента из скомпилированного пака"""
+    def __init__(self, pack):
+        self.pack = pack
+    
+    def load(self, category):
+        return list(self.pack['files'].get(category, []))
+    
+    def read(self, category, file_name):
+        for name, data in self.pack['files'].get(category, []):
+            if name == file_name:
+                return data
+        return None
+    
+    def get_resolved(self, key):
+        return self.pack['resolved'].get(key)
+
+class ContentPack:
+    @staticmethod
+    def scan():
+        """Текущее состояние файлов контента: путь -> (mtime_ns, size)"""
+        state = {}
+        for category in CONTENT_PATHS:
+            for file_path in list_content_files(category):
+                stat = os.stat(file_path)
+                state[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return state
+    
+    @staticmethod
+    def build(workers=0):
+        """Читает весь контент и предрассчитывает то, что движок иначе считает при загрузке"""
+        from .item_loader import ItemLoader
+        from .script_runner import ScriptRunner
+        from .quest_specs import compile_quest
+        
+        source = load_yaml_content(workers)
+        files = {category: source.load(category) for category in CONTENT_PATHS if category not in ('items', 'scripts')}
+        
+        # Динамические значения предметов раскрываются в том же порядке, что и при загрузке из YAML
+        item_loader = ItemLoader(content=source)
+        item_loader.load_items()
+        
+        scripts = {}
+        for script_file, script_data in source.load('scripts'):
+            script_id = script_data.get('id')
+            if script_id is not None:
+                scripts[script_id] = ScriptRunner.parse_script(script_data)
+        
+        quest_specs = {}
+        for quest_file, quest_data in files['quests']:
+            quest_id = quest_data.get('id')
+            if quest_id is not None:
+                quest_specs[quest_id] = compile_quest(quest_data)
+        
+        manifest = {file_path: (mtime, size, file_hash(file_path))
+                    for file_path, (mtime, size) in ContentPack.scan().items()}
+        return {
+            'version': PACK_VERSION,
+            'manifest': manifest,
+            'files': files,
+            'resolved': {
+                'items': item_loader.items,
+                'scripts': scripts,
+                'quest_specs': quest_specs
+            }
+        }
+    
+    @staticmethod
+    def save(pack, pack_path):
+        write_binary(pack_path, PACK_MAGIC, PACK_VERSION, pack)
+    
+    @staticmethod
+    def load(pack_path):
+        return read_binary(pack_path, PACK_MAGIC, PACK_VERSION)
+    
+    @staticmethod
+    def is_stale(pack):
+        """Пак устарел, если файлы добавлены/удалены или изменилось содержимое.
+        Совпадение mtime и размера считается неизменностью, иначе сверяется hash"""
+        manifest = pack['manifest']
+        current = ContentPack.scan()
+        if current.keys() != manifest.keys():
+            return True
+        for file_path, (mtime, size) in current.items():
+            packed_mtime, packed_size, packed_hash = manifest[file_path]
+            if mtime == packed_mtime and size == packed_size:
+                continue
+            if size != packed_size or file_hash(file_path) != packed_hash:
+                return True
+        return False
+
+def open_content(pack_path=None, autobuild=False, workers=0, index_path=None, max_loaded=256, max_bytes=0):
+    """Источник контента для движка: свежий пак, иначе YAML (или пересборка пака при autobuild).
+    С index_path шаблоны грузятся лениво, пак при этом не используется"""
+    if index_path:
+        return load_yaml_content(workers, index_path, max_loaded, max_bytes)
+    if not pack_path:
+        return load_yaml_content(workers)
+    
+    # Пак не собран - обычный запуск из YAML; предупреждаем только об устаревшем или битом паке
+    if not os.path.exists(pack_path) and not autobuild:
+        return load_yaml_content(workers)
+    
+    try:
+        pack = ContentPack.load(pack_path)
+        if pack is not None and not ContentPack.is_stale(pack):
+            return PackContent(pack)
+        if pack is None:
+            reason = "missing" if not os.path.exists(pack_path) else "an old version"
+        else:
+            reason = "stale"
+    except Exception as e:
+        reason = f"unreadable ({e})"
+    
+    if not autobuild:
+        print(f"Content pack {pack_path} is {reason}, loading YAML")
+        return load_yaml_content(workers)
+    
+    print(f"Content pack {pack_path} is {reason}, rebuilding")
+    try:
+        pack = ContentPack.build(workers)
+        ContentPack.save(pack, pack_path)
+        return PackContent(pack)
+    except Exception as e:
+        print(f"Error building content pack: {e}")
+        return load_yaml_content(workers)
+
+def main():
+    """python -m engine.content [путь к паку] - компилирует game/ в пак"""
+    pack_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join("game", "content.pack")
+    pack = ContentPack.build()
+    ContentPack.save(pack, pack_path)
+    
+    # Пак, который движок не сможет прочитать, не должен молча попасть в сборку
+    try:
+        ContentPack.load(pack_path)
+    except Exception as e:
+        print(f"Error verifying content pack {pack_path}: {e}")
+        sys.exit(1)
+    print(f"Content pack saved to {pack_path} ({len(pack['manifest'])} files)")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,7 +1,6 @@
 import pygame
 import os
 import yaml
-import re
 import shutil
 import math
 import time
@@ -12,10 +11,18 @@ from .cache_manager import CacheManager
 from .entity_manager import EntityManager
 from .health_system import HealthSystem
 from .quest_system import QuestSystem
+from .event_bus import EventBus, EntityKilled, ItemGiven, QuestCancelled
 from .npc_system import NPCSystem
 from .map_system import MapSystem
 from .value_system import ValueSystem
 from .menu_system import MenuSystem
+from .font_manager import FontManager
+from .texture_manager import TextureManager
+from .hud_system import HUDSystem
+from .presentation import DirtyRectPresenter
+from .input_state import PygameInput, InjectedInput
+from .profiler import Profiler
+from .content import YamlContent, open_content
 
 class Camera:
     def __init__(self, screen_width, screen_height):
@@ -25,21 +32,39 @@ class Camera:
         self.offset_y = 0
         self.target_x = 0
         self.target_y = 0
-        self.smoothness = 0.1
+        self.smoothness = 0.1  # доля пути к цели за 1/60 секунды
+        self.previous_x = 0
+        self.previous_y = 0
     
-    def update(self, target_x, target_y):
+    def begin_tick(self):
+        """Запоминает положение до тика для интерполяции"""
+        self.previous_x = self.offset_x
+        self.previous_y = self.offset_y
+    
+    def update(self, target_x, target_y, delta_time=1 / 60):
         self.target_x = target_x - self.screen_width // 2
         self.target_y = target_y - self.screen_height // 2
         
-        self.offset_x += (self.target_x - self.offset_x) * self.smoothness
-        self.offset_y += (self.target_y - self.offset_y) * self.smoothness
+        # Сглаживание не зависит от частоты тиков
+        factor = 1 - (1 - self.smoothness) ** (delta_time * 60)
+        self.offset_x += (self.target_x - self.offset_x) * factor
+        self.offset_y += (self.target_y - self.offset_y) * factor
+    
+    def get_offset(self, alpha=1.0):
+        """Смещение камеры между прошлым и текущим тиком"""
+        offset_x = self.previous_x + (self.offset_x - self.previous_x) * alpha
+        offset_y = self.previous_y + (self.offset_y - self.previous_y) * alpha
+        return (int(offset_x), int(offset_y))
     
-    def get_offset(self):
-        return (int(self.offset_x), int(self.offset_y))
+    def get_visible_rect(self, alpha=1.0):
+        """Видимая область мира"""
+        offset_x, offset_y = self.get_offset(alpha)
+        return pygame.Rect(offset_x, offset_y, self.screen_width, self.screen_height)
 
 class Localization:
-    def __init__(self, lang_code="en"):
+    def __init__(self, lang_code="en", content=None):
         self.lang_code = lang_code
+        self.content = content or YamlContent()
         self.translations = {}
         self.load_config()
         self.load_localization()
@@ -57,15 +82,15 @@ class Localization:
     
     def load_localization(self):
         lang_path = os.path.join("engine", "lang", f"{self.lang_code}.yaml")
-        if os.path.exists(lang_path):
-            try:
-                with open(lang_path, 'r', encoding='utf-8') as file:
-                    self.translations = yaml.safe_load(file) or {}
-            except Exception as e:
-                print(f"Error loading localization: {e}")
-                self.translations = {}
-        else:
-            print(f"Localization file not found: {lang_path}")
+        try:
+            translations = self.content.read('lang', f"{self.lang_code}.yaml")
+            if translations is None:
+                print(f"Localization file not found: {lang_path}")
+            else:
+                self.translations = dict(translations)
+        except Exception as e:
+            print(f"Error loading localization: {e}")
+            self.translations = {}
         
         # Запасные переводы
         defaults = {
@@ -89,63 +114,137 @@ class Localization:
         return self.translations.get(key, default or key)
 
 class RPGEngine:
-    def __init__(self, screen_width=800, screen_height=600):
+    def __init__(self, screen_width=800, screen_height=600, headless=None, cache_dir="engine/cache"):
+        # Настройки производительности из game_config.yaml
+        self.config = self.load_config()
+        performance = self.config.get('performance', {}) or {}
+        
+        # Headless: без окна, конвертации текстур и отрисовки, ввод только программный
+        self.headless = performance.get('headless', False) if headless is None else headless
+        self.headless_tick_rate = performance.get('headless_tick_rate', 0)
+        if self.headless:
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        
         pygame.init()
-        self.screen = pygame.display.set_mode((screen_width, screen_height))
-        pygame.display.set_caption("TimeEngine v9")
+        if self.headless:
+            self.screen = pygame.Surface((screen_width, screen_height))
+            self.input = InjectedInput()
+        else:
+            self.screen = pygame.display.set_mode((screen_width, screen_height))
+            pygame.display.set_caption("TimeEngine v9")
+            self.input = PygameInput()
         
         self.clock = pygame.time.Clock()
         self.running = True
-        self.delta_time = 0
         self.menu_cooldown_duration = 10
         
+        # Симуляция идет фиксированными тиками, отрисовка - со своей частотой
+        self.tick_rate = performance.get('tick_rate', 60)
+        self.render_rate = performance.get('render_rate', 60)
+        self.max_catchup_steps = performance.get('max_catchup_steps', 5)
+        self.delta_time = 1.0 / self.tick_rate
+        self.accumulator = 0.0
+        self.interpolation = 1.0  # доля тика для интерполяции отрисовки
+        self.tick_count = 0
+        
+        # Профайлер подсистем: F3 - график, F4 - запись trace
+        self.profiler = Profiler(performance.get('profiler', False))
+        self.trace_path = performance.get('profiler_trace_path', 'profile_trace.json')
+        
+        # Контент: скомпилированный пак, если он свежий, иначе YAML из game/;
+        # в ленивом режиме шаблоны читаются по индексу при первом обращении
+        index_path = performance.get('content_index', 'game/content.index') if performance.get('lazy_templates') else None
+        self.content = open_content(performance.get('content_pack'), performance.get('content_pack_autobuild', False),
+                                    performance.get('content_workers', 0), index_path,
+                                    performance.get('template_cache_size', 256),
+                                    int(performance.get('template_cache_kb', 0) * 1024))
+        
         # Локализация
-        self.localization = Localization()
+        self.localization = Localization(content=self.content)
         
         # Камера
         self.camera = Camera(screen_width, screen_height)
         
+        # Общие шрифты и кэш текста
+        self.font_manager = FontManager()
+        
+        # Общие текстуры с бюджетом памяти
+        texture_budget_mb = performance.get('texture_budget_mb', 64)
+        self.texture_manager = TextureManager(int(texture_budget_mb * 1024 * 1024))
+        self.texture_manager.convert = not self.headless
+        
         # Система здоровья
-        self.health_system = HealthSystem()
+        self.health_system = HealthSystem(font_manager=self.font_manager, texture_manager=self.texture_manager)
         
-        # Менеджер кэша
-        self.cache_manager = CacheManager()
+        # Менеджер кэша (сохранения игрока; бенчмарк подставляет временную папку)
+        self.cache_manager = CacheManager(cache_dir, flush_interval=performance.get('cooldown_flush_interval', 5.0))
         
         # Система значений (валют) - ДОЛЖНА БЫТЬ ПЕРВОЙ!
         self.value_system = ValueSystem(self.cache_manager)
         
         # Загрузка ресурсов
-        self.item_loader = ItemLoader()
-        self.inventory = Inventory(self.cache_manager)
-        self.script_runner = ScriptRunner(self.inventory, self.item_loader, self.health_system)
+        self.item_loader = ItemLoader(self.content)
+        self.inventory = Inventory(self.cache_manager, font_manager=self.font_manager,
+                                   texture_manager=self.texture_manager)
+        self.script_runner = ScriptRunner(self.inventory, self.item_loader, self.health_system, content=self.content)
+        self.script_runner.instruction_budget = performance.get('script_instruction_budget', 0)
+        self.script_runner.time_budget = performance.get('script_time_budget_ms', 0) / 1000
         
         # Менеджер сущностей
-        self.entity_manager = EntityManager(self.script_runner)
+        self.entity_manager = EntityManager(self.script_runner, self.font_manager, self.texture_manager,
+                                            performance.get('entity_backend', 'objects'), self.content)
         self.script_runner.entity_manager = self.entity_manager
         
         # Система квестов (теперь с value_system)
         self.quest_system = QuestSystem(self.entity_manager, self.inventory, self.health_system, 
-                                      self.item_loader, self.localization, self.script_runner, self.value_system)
+                                      self.item_loader, self.localization, self.script_runner, self.value_system,
+                                      self.font_manager, self.content)
         self.script_runner.quest_system = self.quest_system
         
         # Система NPC
-        self.npc_system = NPCSystem(self.script_runner)
+        self.npc_system = NPCSystem(self.script_runner, self.font_manager, self.texture_manager, self.content)
         self.script_runner.npc_system = self.npc_system
         
         # Система карт
-        self.map_system = MapSystem(self.entity_manager, self.npc_system)
+        self.map_system = MapSystem(self.entity_manager, self.npc_system, self.texture_manager, self.content)
+        self.map_system.prebake = not self.headless
         self.script_runner.map_system = self.map_system
         
         # Система меню (теперь с value_system)
-        self.menu_system = MenuSystem(self.script_runner, self.value_system)
+        self.menu_system = MenuSystem(self.script_runner, self.value_system, self.font_manager,
+                                      self.texture_manager, self.content)
         self.script_runner.menu_system = self.menu_system
         
         # Передаем value_system в script_runner
         self.script_runner.value_system = self.value_system
         
+        # HUD: панели перерисовываются только при изменении данных
+        self.hud = HUDSystem()
+        self.health_system.hud = self.hud
+        self.inventory.hud = self.hud
+        self.quest_system.hud = self.hud
+        self.cache_manager.hud = self.hud
+        
+        # Шина событий: системы реагируют на изменения вместо опроса каждый кадр
+        self.event_bus = EventBus()
+        self.inventory.event_bus = self.event_bus
+        self.value_system.event_bus = self.event_bus
+        self.map_system.event_bus = self.event_bus
+        self.npc_system.event_bus = self.event_bus
+        self.quest_system.set_event_bus(self.event_bus)
+        self.menu_system.set_event_bus(self.event_bus)
+        self.event_bus.subscribe(ItemGiven, self.on_item_given)
+        self.event_bus.subscribe(QuestCancelled, self.on_quest_cancelled)
+        
+        # Вывод кадра: flip целиком или только измененные области
+        self.presenter = DirtyRectPresenter((screen_width, screen_height),
+                                            performance.get('presentation', 'flip') == 'dirty_rects')
+        
         # Игрок
         self.player = self.create_player()
-        self.player_speed = 5
+        self.player_speed = 300  # пикселей в секунду
+        self.player_subpixel = [0.0, 0.0]
+        self.previous_player_pos = self.player["rect"].topleft
         
         # Выбранный предмет
         self.selected_slot = None
@@ -153,6 +252,7 @@ class RPGEngine:
         self.item_state = "idle"
         self.attack_progress = 0
         self.attack_direction = "down"
+        self.attack_speed = 9.0  # доля взмаха в секунду
         
         # Tooltip
         self.show_tooltip = False
@@ -165,7 +265,9 @@ class RPGEngine:
         
         # Кд для клавиш
         self.key_cooldowns = {i: 0 for i in range(1, 10)}
-        self.key_cooldown_duration = 10
+        self.key_cooldown_duration = 1 / 6  # в секундах
+        
+        self.setup_hud()
         
         # Загрузка предметов и скриптов
         self.load_game_data()
@@ -183,28 +285,33 @@ class RPGEngine:
         else:
             return {"texture": None, "rect": pygame.Rect(400, 300, 50, 50)}
     
+    def load_config(self):
+        config_path = os.path.join("game", "config", "game_config.yaml")
+        if os.path.exists(config_path):
+            try:
+                with open(config_path, 'r', encoding='utf-8') as file:
+                    return yaml.safe_load(file) or {}
+            except Exception as e:
+                print(f"Error loading config: {e}")
+        return {}
+    
     def load_texture(self, texture_name, default_size=(50, 50)):
-        texture_path = os.path.join("game", "textures", texture_name)
-        if os.path.exists(texture_path):
-            texture = pygame.image.load(texture_path).convert_alpha()
-            texture = pygame.transform.scale(texture, default_size)
-            return texture
-        return None
+        return self.texture_manager.load(texture_name, default_size, scope=TextureManager.GLOBAL_SCOPE)
+    
+    def setup_hud(self):
+        inventory_width = self.inventory.slot_size * len(self.inventory.slots) + 20
+        self.hud.add_panel('inventory', (10, 500, inventory_width, self.inventory.slot_size + 20),
+                           lambda surface, pos: self.inventory.render(surface, self.item_loader, self.selected_slot, pos))
+        self.hud.add_panel('health', (20, 20, 240, 32), self.health_system.render)
+        self.hud.add_panel('cooldown', (10, 450, 250, 24), self.render_cooldown)
+        self.hud.add_panel('quest_log', (600, 20, 180, self.screen.get_height() - 20), self.quest_system.render_quest_log)
     
     def load_game_data(self):
         # Загрузка всех предметов
-        items_path = os.path.join("game", "items")
-        if os.path.exists(items_path):
-            for item_file in os.listdir(items_path):
-                if item_file.endswith(".yaml"):
-                    self.item_loader.load_item(os.path.join(items_path, item_file))
+        self.item_loader.load_items()
         
         # Загрузка и выполнение скриптов
-        scripts_path = os.path.join("game", "scripts")
-        if os.path.exists(scripts_path):
-            for script_file in os.listdir(scripts_path):
-                if script_file.endswith(".yaml"):
-                    self.script_runner.run_script(os.path.join(scripts_path, script_file))
+        self.script_runner.load_scripts()
     
     def format_stat_name(self, stat_name):
         """Форматирует название статы: damage -> Damage, magic_power -> Magic Power"""
@@ -279,24 +386,36 @@ class RPGEngine:
         return 10
     
     def handle_input(self):
-        keys = pygame.key.get_pressed()
+        keys = self.input.get_keys()
         
         # Движение игрока с учетом коллизий
-        new_x, new_y = self.player["rect"].x, self.player["rect"].y
+        step = self.player_speed * self.delta_time
+        move_x = move_y = 0.0
         
         if keys[pygame.K_w]:
-            new_y -= self.player_speed
+            move_y -= step
         if keys[pygame.K_s]:
-            new_y += self.player_speed
+            move_y += step
         if keys[pygame.K_a]:
-            new_x -= self.player_speed
+            move_x -= step
         if keys[pygame.K_d]:
-            new_x += self.player_speed
+            move_x += step
+        
+        # Дробная часть шага копится до целого пикселя
+        move_x = move_x + self.player_subpixel[0] if move_x else 0.0
+        move_y = move_y + self.player_subpixel[1] if move_y else 0.0
+        whole_x = round(move_x) if abs(move_x - round(move_x)) < 1e-6 else int(move_x)
+        whole_y = round(move_y) if abs(move_y - round(move_y)) < 1e-6 else int(move_y)
+        self.player_subpixel = [move_x - whole_x, move_y - whole_y]
+        new_x = self.player["rect"].x + whole_x
+        new_y = self.player["rect"].y + whole_y
         
         # Применяем движение с проверкой коллизий
-        self.map_system.update_player_position(self.player["rect"], new_x, new_y)
+        profiler = self.profiler
+        with profiler.scope('map.movement'):
+            self.map_system.update_player_position(self.player["rect"], new_x, new_y)
         
-        self.menu_system.update_cooldowns()
+        self.menu_system.update_cooldowns(self.delta_time)
         # Взаимодействие с NPC по нажатию E
         if keys[pygame.K_e] and not self.npc_system.active_npc and not self.menu_system.active_menu:
             self.npc_system.handle_interaction()
@@ -304,7 +423,7 @@ class RPGEngine:
         # Обновляем кд клавиш
         for key in self.key_cooldowns:
             if self.key_cooldowns[key] > 0:
-                self.key_cooldowns[key] -= 1
+                self.key_cooldowns[key] -= self.delta_time
         
         # Выбор предметов с кд
         if any(self.key_cooldowns[key] <= 0 for key in self.key_cooldowns):
@@ -316,45 +435,47 @@ class RPGEngine:
                     break
         
         # Атака ЛКМ
-        mouse_buttons = pygame.mouse.get_pressed()
+        mouse_buttons = self.input.get_mouse_buttons()
         if mouse_buttons[0] and self.selected_item and self.get_current_cooldown() <= 0 and self.item_state == "idle":
             item_data = self.item_loader.get_item(self.selected_item['id'])
             if item_data and item_data.get('type', {}).get('sword'):
-                self.start_attack()
+                with profiler.scope('combat.attack'):
+                    self.start_attack()
         
         # Обновляем кд
-        self.cache_manager.update_cooldowns()
+        with profiler.scope('cache.update_cooldowns'):
+            self.cache_manager.update_cooldowns(self.delta_time)
         
         # Обновляем сущности
         player_pos = [self.player["rect"].centerx, self.player["rect"].centery]
-        self.entity_manager.update(player_pos, self.health_system, self.delta_time)
-        
-        # Обновляем квесты
-        self.quest_system.update_quests()
+        with profiler.scope('entities.update'):
+            self.entity_manager.update(player_pos, self.health_system, self.delta_time)
         
         # Обновляем NPC с позицией игрока
-        self.npc_system.update(player_pos)
+        with profiler.scope('npcs.update'):
+            self.npc_system.update(player_pos, self.delta_time)
         
         # Обновляем скрипты
-        self.script_runner.update(self.delta_time)
+        with profiler.scope('scripts.update'):
+            self.script_runner.update(self.delta_time)
         
         # Обновляем камеру
-        self.camera.update(self.player["rect"].centerx, self.player["rect"].centery)
+        self.camera.update(self.player["rect"].centerx, self.player["rect"].centery, self.delta_time)
         
         # Обработка анимации атаки
         if self.item_state == "attacking":
-            self.handle_attack_animation()
-        
-        # Проверка наведения на предметы в инвентаре
-        self.check_tooltip()
+            with profiler.scope('combat.animation'):
+                self.handle_attack_animation()
         
-        # Проверка кликов по квестам
-        self.check_quest_clicks()
+        # Проверка наведения на предметы в инвентаре и кликов по квестам
+        with profiler.scope('ui.input'):
+            self.check_tooltip()
+            self.check_quest_clicks()
         
         # Обработка кликов мыши
-        mouse_click = pygame.mouse.get_pressed()
+        mouse_click = self.input.get_mouse_buttons()
         if mouse_click[0]:
-            mouse_pos = pygame.mouse.get_pos()
+            mouse_pos = self.input.get_mouse_pos()
             
             # Сначала проверяем клик по меню
             if self.menu_system.handle_click(mouse_pos):
@@ -387,8 +508,8 @@ class RPGEngine:
                     self.start_attack()
     
     def check_quest_clicks(self):
-        mouse_pos = pygame.mouse.get_pos()
-        mouse_click = pygame.mouse.get_pressed()
+        mouse_pos = self.input.get_mouse_pos()
+        mouse_click = self.input.get_mouse_buttons()
         
         if mouse_click[0]:  # ЛКМ
             # Проверяем клик по логу квестов
@@ -414,7 +535,7 @@ class RPGEngine:
                     self.selected_quest_id = None
     
     def check_tooltip(self):
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = self.input.get_mouse_pos()
         self.show_tooltip = False
         self.tooltip_item = None
         
@@ -442,6 +563,9 @@ class RPGEngine:
     def toggle_slot(self, slot):
         item = self.inventory.get_item(slot)
         
+        self.hud.invalidate('inventory')
+        self.hud.invalidate('cooldown')
+        
         if self.selected_slot == slot:
             self.selected_slot = None
             self.selected_item = None
@@ -456,6 +580,17 @@ class RPGEngine:
             self.selected_item = item
             self.item_state = "idle"
     
+    def on_item_given(self, event):
+        """Предмет, выданный в выбранный слот, сразу оказывается в руке"""
+        if event.slot == self.selected_slot:
+            self.selected_item = self.inventory.get_item(event.slot)
+    
+    def on_quest_cancelled(self, event):
+        """Закрывает детали квеста, отмененного скриптом"""
+        if event.quest_id == self.selected_quest_id:
+            self.show_quest_details = False
+            self.selected_quest_id = None
+    
     def start_attack(self):
         self.item_state = "attacking"
         self.attack_progress = 0
@@ -473,18 +608,18 @@ class RPGEngine:
                 # Проверяем попадание по врагам
                 hits = self.entity_manager.check_attack_hit(player_center, attack_range, damage)
                 if hits:
-                    # Обновляем квесты при убийстве врагов
+                    # Квесты узнают об убийствах через шину событий
                     for enemy in hits:
-                        self.quest_system.register_kill(enemy.id)
+                        self.event_bus.emit(EntityKilled(enemy.id, enemy))
     
     def handle_attack_animation(self):
         if self.attack_direction == "down":
-            self.attack_progress += 0.15
+            self.attack_progress += self.attack_speed * self.delta_time
             if self.attack_progress >= 1:
                 self.attack_direction = "up"
                 self.attack_progress = 1
         else:
-            self.attack_progress -= 0.15
+            self.attack_progress -= self.attack_speed * self.delta_time
             if self.attack_progress <= 0:
                 self.complete_attack()
     
@@ -494,19 +629,18 @@ class RPGEngine:
             item_data = self.item_loader.get_item(self.selected_item['id'])
             if item_data:
                 cooldown = item_data.get('type', {}).get('cooldown', 1.0)
-                cooldown_frames = int(cooldown * 60)
                 
                 if self.selected_slot is not None:
-                    self.cache_manager.save_slot_cooldown(self.selected_slot, cooldown_frames)
+                    self.cache_manager.save_slot_cooldown(self.selected_slot, cooldown)
     
     def cleanup(self):
-        # Сохраняем значения
-        self.value_system.save_values()
+        # Дописываем незаконченный trace профайлера
+        if self.profiler.tracing:
+            self.profiler.stop_trace(self.trace_path)
         
-        # Очищаем кэш
-        cache_dir = "engine/cache"
-        if os.path.exists(cache_dir):
-            shutil.rmtree(cache_dir)
+        # Сбрасываем снапшот кд и сохраняем значения; engine/cache остается до следующего запуска
+        self.cache_manager.shutdown()
+        self.value_system.save_values()
         
         # Очищаем __pycache__
         pycache_dir = "engine/__pycache__"
@@ -517,23 +651,96 @@ class RPGEngine:
         if os.path.exists(pycache_dir):
             shutil.rmtree(pycache_dir)
     
+    def mark_dirty_regions(self, camera_offset, visible_rect):
+        """Собирает области всех слоев для режима dirty rects"""
+        self.presenter.begin_frame(camera_offset)
+        
+        self.map_system.mark_dirty_rects(self.presenter)
+        self.entity_manager.mark_dirty_rects(self.presenter, camera_offset, visible_rect)
+        self.npc_system.mark_dirty_rects(self.presenter, camera_offset, visible_rect)
+        
+        # Игрок вместе с предметом в руке
+        player_rect = self.get_player_render_rect().move(-camera_offset[0], -camera_offset[1])
+        selected_id = None
+        if self.selected_item:
+            selected_id = self.selected_item['id']
+            item_data = self.item_loader.get_item(selected_id)
+            if item_data:
+                world_size = item_data.get('texture', {}).get('world_size', [50, 50])
+                if not isinstance(world_size, list) or len(world_size) != 2:
+                    world_size = [50, 50]
+                offset_x, offset_y = self.calculate_item_position(item_data)
+                item_rect = pygame.Rect(0, 0, world_size[0], world_size[1])
+                item_rect.center = (player_rect.centerx + offset_x, player_rect.centery + offset_y)
+                player_rect = player_rect.union(item_rect.inflate(2, 2))
+                
+                name_text = self.font_manager.render(item_data.get('name', 'Unknown Item'), 30, (255, 255, 255))
+                self.presenter.mark('item_name', name_text.get_rect(topleft=(10, 480)), selected_id)
+        self.presenter.mark('player', player_rect, (selected_id, self.item_state, self.attack_progress))
+        
+        self.hud.mark_dirty_rects(self.presenter)
+        
+        if self.show_tooltip and self.tooltip_item:
+            self.presenter.mark('tooltip', None, (id(self.tooltip_item), self.tooltip_mouse_pos))
+        
+        if self.show_quest_details and self.selected_quest_id:
+            quest_data = self.quest_system.active_quests.get(self.selected_quest_id, {})
+            progress = tuple(task['current'] for task in quest_data.get('progress', {}).values())
+            self.presenter.mark('quest_details', (200, 100, 400, 300), (self.selected_quest_id, progress))
+        
+        self.menu_system.mark_dirty_rects(self.presenter)
+    
+    def get_culling_stats(self):
+        """Нарисовано/отсечено объектов по слоям за последний кадр"""
+        return {
+            'map': dict(self.map_system.render_stats),
+            'entities': dict(self.entity_manager.render_stats),
+            'npcs': dict(self.npc_system.render_stats)
+        }
+    
+    def get_player_render_rect(self):
+        """Rect игрока, интерполированный между прошлым и текущим тиком"""
+        rect = self.player["rect"]
+        alpha = self.interpolation
+        previous_x, previous_y = self.previous_player_pos
+        return pygame.Rect(int(previous_x + (rect.x - previous_x) * alpha),
+                           int(previous_y + (rect.y - previous_y) * alpha), rect.width, rect.height)
+    
     def render(self):
-        self.screen.fill((30, 30, 40))
+        if self.headless:
+            return
         
-        camera_offset = self.camera.get_offset()
+        camera_offset = self.camera.get_offset(self.interpolation)
+        visible_rect = self.camera.get_visible_rect(self.interpolation)
+        
+        # В режиме dirty rects неизменный кадр не рисуется вовсе
+        profiler = self.profiler
+        if self.presenter.enabled:
+            with profiler.scope('render.dirty_regions'):
+                self.mark_dirty_regions(camera_offset, visible_rect)
+                if profiler.show_overlay:
+                    self.presenter.mark('profiler', None, len(profiler.frame_times))
+            if not self.presenter.needs_redraw():
+                return
+        
+        self.screen.fill((30, 30, 40))
         
         # Отрисовываем карту
-        self.map_system.render(self.screen, camera_offset)
+        with profiler.scope('render.map'):
+            self.map_system.render(self.screen, camera_offset, visible_rect)
         
         # Отрисовка сущностей с учетом камеры
-        self.entity_manager.render(self.screen, camera_offset)
+        with profiler.scope('render.entities'):
+            self.entity_manager.render(self.screen, camera_offset, visible_rect)
         
         # Отрисовка NPC с учетом камеря
-        self.npc_system.render(self.screen, camera_offset)
+        with profiler.scope('render.npcs'):
+            self.npc_system.render(self.screen, camera_offset, visible_rect)
         
         # Отрисовка игрока с учетом камеры
-        player_x = self.player["rect"].x - camera_offset[0]
-        player_y = self.player["rect"].y - camera_offset[1]
+        player_rect = self.get_player_render_rect()
+        player_x = player_rect.x - camera_offset[0]
+        player_y = player_rect.y - camera_offset[1]
         
         if self.player["texture"]:
             self.screen.blit(self.player["texture"], (player_x, player_y))
@@ -544,48 +751,54 @@ class RPGEngine:
         if self.selected_item:
             self.render_selected_item(camera_offset)
         
-        # Отрисовка инвентаря
-        self.inventory.render(self.screen, self.item_loader, self.selected_slot)
-        
-        # Отрисовка UI здоровья
-        self.health_system.render(self.screen)
+        with profiler.scope('render.ui'):
+            # Отрисовка инвентаря
+            self.hud.render(self.screen, 'inventory')
+            
+            # Отрисовка UI здоровья
+            self.hud.render(self.screen, 'health')
+            
+            # Отображение имени выбранного предмета
+            if self.selected_item:
+                self.render_selected_item_name()
+            
+            # Отображение текущего кд
+            self.hud.render(self.screen, 'cooldown')
+            
+            # Отрисовка тултипа
+            if self.show_tooltip and self.tooltip_item:
+                self.render_tooltip()
+            
+            # Отрисовка лога квестов
+            self.hud.render(self.screen, 'quest_log')
+            
+            # Отрисовка деталей квеста если выбрано
+            if self.show_quest_details and self.selected_quest_id:
+                self.render_quest_details()
+            
+            # Отрисовка диалога NPC
+            self.npc_system.render_dialog(self.screen)
+            
+            # Отрисовка меню
+            self.menu_system.render(self.screen)
         
-        # Отображение имени выбранного предмета
-        if self.selected_item:
-            self.render_selected_item_name()
+        # График профайлера поверх всего
+        profiler.render_overlay(self.screen, self.font_manager)
         
-        # Отображение текущего кд
+        with profiler.scope('render.present'):
+            self.presenter.present()
+    
+    def render_cooldown(self, surface, pos):
         cooldown = self.get_current_cooldown()
         if cooldown > 0:
-            cooldown_font = pygame.font.Font(None, 24)
-            cooldown_text = cooldown_font.render(f"{self.localization.get('cooldown')}: {cooldown/60:.1f}s", True, (255, 0, 0))
-            self.screen.blit(cooldown_text, (10, 450))
-        
-        # Отрисовка тултипа
-        if self.show_tooltip and self.tooltip_item:
-            self.render_tooltip()
-        
-        # Отрисовка лога квестов
-        self.quest_system.render_quest_log(self.screen)
-        
-        # Отрисовка деталей квеста если выбрано
-        if self.show_quest_details and self.selected_quest_id:
-            self.render_quest_details()
-        
-        # Отрисовка диалога NPC
-        self.npc_system.render_dialog(self.screen)
-        
-        # Отрисовка меню
-        self.menu_system.render(self.screen)
-        
-        pygame.display.flip()
+            cooldown_text = self.font_manager.render(f"{self.localization.get('cooldown')}: {cooldown:.1f}s", 24, (255, 0, 0))
+            surface.blit(cooldown_text, pos)
     
     def render_selected_item_name(self):
         item_data = self.item_loader.get_item(self.selected_item['id'])
         if item_data:
             item_name = item_data.get('name', 'Unknown Item')
-            name_font = pygame.font.Font(None, 30)
-            name_text = name_font.render(item_name, True, (255, 255, 255))
+            name_text = self.font_manager.render(item_name, 30, (255, 255, 255))
             self.screen.blit(name_text, (10, 480))
     
     def render_quest_details(self):
@@ -604,18 +817,14 @@ class RPGEngine:
         pygame.draw.rect(self.screen, (40, 40, 50), details_rect)
         pygame.draw.rect(self.screen, (100, 100, 120), details_rect, 2)
         
-        # Шрифты
-        title_font = pygame.font.Font(None, 28)
-        desc_font = pygame.font.Font(None, 20)
-        section_font = pygame.font.Font(None, 22)
-        section_font.set_bold(True)
+        fonts = self.font_manager
         
         padding = 20
         y_offset = padding
         
         # Заголовок
         title = quest.get('name', 'Unknown Quest')
-        title_surface = title_font.render(title, True, (255, 215, 0))
+        title_surface = fonts.render(title, 28, (255, 215, 0))
         self.screen.blit(title_surface, (details_x + padding, details_y + y_offset))
         y_offset += 40
         
@@ -625,90 +834,47 @@ class RPGEngine:
             desc_lines = [desc_lines]
         
         for line in desc_lines:
-            desc_surface = desc_font.render(line, True, (200, 200, 200))
+            desc_surface = fonts.render(line, 20, (200, 200, 200))
             self.screen.blit(desc_surface, (details_x + padding, details_y + y_offset))
             y_offset += 25
         
         y_offset += 10
         
         # Задачи
-        task_surface = section_font.render(f"{self.localization.get('quest_task')}:", True, (255, 255, 255))
+        task_surface = fonts.render(f"{self.localization.get('quest_task')}:", 22, (255, 255, 255), bold=True)
         self.screen.blit(task_surface, (details_x + padding, details_y + y_offset))
         y_offset += 30
         
         quest_data = self.quest_system.active_quests.get(self.selected_quest_id, {})
         task_progress = quest_data.get('progress', {})
         
-        for task_id, task_info in task_progress.items():
-            if task_info['type'] == 'kill':
-                enemy_id = task_info['enemy_id']
-                required_count = task_info['required']
-                current_count = task_info['current']
-                
-                enemy_name = f"Enemy {enemy_id}"
-                enemy_template = self.entity_manager.enemy_templates.get(enemy_id)
-                if enemy_template:
-                    enemy_name = enemy_template.get('name', f"Enemy {enemy_id}")
-                
-                task_text = f"{self.localization.get('quest_kill')} {enemy_name} ({current_count}/{required_count})"
-                task_surface = desc_font.render(task_text, True, (200, 200, 200))
-                self.screen.blit(task_surface, (details_x + padding, details_y + y_offset))
-                y_offset += 25
+        for task_info in task_progress.values():
+            task_surface = fonts.render(self.quest_system.get_task_text(task_info), 20, (200, 200, 200))
+            self.screen.blit(task_surface, (details_x + padding, details_y + y_offset))
+            y_offset += 25
         
         y_offset += 10
         
         # Награды
-        reward_surface = section_font.render(f"{self.localization.get('quest_reward')}:", True, (255, 255, 255))
+        reward_surface = fonts.render(f"{self.localization.get('quest_reward')}:", 22, (255, 255, 255), bold=True)
         self.screen.blit(reward_surface, (details_x + padding, details_y + y_offset))
         y_offset += 30
         
-        rewards = quest.get('quest_reward', [])
-        for reward in rewards:
-            if reward.startswith('!quest_reward_addmaxhealth('):
-                match = re.search(r'!quest_reward_addmaxhealth\((\d+)\)', reward)
-                if match:
-                    amount = int(match.group(1))
-                    reward_text = f"+{amount} {self.localization.get('max_health')}"
-                    reward_surface = desc_font.render(reward_text, True, (0, 255, 0))
-                    self.screen.blit(reward_surface, (details_x + padding, details_y + y_offset))
-                    y_offset += 25
-            
-            elif reward.startswith('!quest_reward_giveitem('):
-                match = re.search(r'!quest_reward_giveitem\((\d+)\)', reward)
-                if match:
-                    item_id = int(match.group(1))
-                    item_data = self.item_loader.get_item(item_id)
-                    item_name = item_data.get('name', f"Item {item_id}") if item_data else f"Item {item_id}"
-                    reward_text = f"Get {item_name}"
-                    reward_surface = desc_font.render(reward_text, True, (0, 255, 0))
-                    self.screen.blit(reward_surface, (details_x + padding, details_y + y_offset))
-                    y_offset += 25
-            
-            elif reward.startswith('!quest_reward_value('):
-                match = re.search(r'!quest_reward_value\((\d+),\s*([^)]+)\)', reward)
-                if match:
-                    value_id = int(match.group(1))
-                    amount = int(match.group(2))
-                    value_name = f"Value {value_id}"
-                    if self.value_system and value_id in self.value_system.values:
-                        value_name = self.value_system.values[value_id]['name']
-                    reward_text = f"+{amount} {value_name}"
-                    reward_surface = desc_font.render(reward_text, True, (0, 255, 0))
-                    self.screen.blit(reward_surface, (details_x + padding, details_y + y_offset))
-                    y_offset += 25
+        for reward in self.quest_system.get_quest_spec(self.selected_quest_id).rewards:
+            reward_surface = fonts.render(self.quest_system.get_reward_text(reward), 20, (0, 255, 0))
+            self.screen.blit(reward_surface, (details_x + padding, details_y + y_offset))
+            y_offset += 25
         
         # Кнопка отмены квеста
         cancel_rect = pygame.Rect(details_x + details_width - 100, details_y + details_height - 40, 80, 30)
         pygame.draw.rect(self.screen, (200, 50, 50), cancel_rect)
-        cancel_font = pygame.font.Font(None, 16)
-        cancel_text = cancel_font.render("Cancel", True, (255, 255, 255))
+        cancel_text = fonts.render("Cancel", 16, (255, 255, 255))
         self.screen.blit(cancel_text, (cancel_rect.x + 20, cancel_rect.y + 8))
         
         # Кнопка закрытия (РИСУЕТСЯ ПОСЛЕДНЕЙ - ПОВЕРХ ВСЕГО)
         close_rect = pygame.Rect(details_x + details_width - 40, details_y + 10, 30, 30)
         pygame.draw.rect(self.screen, (255, 0, 0), close_rect)
-        close_font = pygame.font.Font(None, 24)
-        close_text = close_font.render("X", True, (255, 255, 255))
+        close_text = fonts.render("X", 24, (255, 255, 255))
         self.screen.blit(close_text, (close_rect.x + 10, close_rect.y + 5))
     
     def render_tooltip(self):
@@ -719,10 +885,10 @@ class RPGEngine:
         mouse_x, mouse_y = self.tooltip_mouse_pos
         
         # Шрифты
-        title_font = pygame.font.Font(None, 24)
-        desc_font = pygame.font.Font(None, 18)
-        stat_font = pygame.font.Font(None, 18)
-        stat_font.set_bold(True)
+        fonts = self.font_manager
+        title_font = fonts.get_font(24)
+        desc_font = fonts.get_font(18)
+        stat_font = fonts.get_font(18, bold=True)
         
         # Рассчитываем размер тултипа
         padding = 10
@@ -776,7 +942,7 @@ class RPGEngine:
         pygame.draw.rect(self.screen, (100, 100, 120), tooltip_rect, 2)
         
         # Заголовок
-        title_surface = title_font.render(title, True, (255, 255, 255))
+        title_surface = fonts.render(title, 24, (255, 255, 255))
         self.screen.blit(title_surface, (tooltip_x + padding, tooltip_y + padding))
         
         y_offset = padding + 30
@@ -794,16 +960,16 @@ class RPGEngine:
                             current_line = test_line
                         else:
                             if current_line:
-                                desc_surface = desc_font.render(current_line, True, (200, 200, 200))
+                                desc_surface = fonts.render(current_line, 18, (200, 200, 200))
                                 self.screen.blit(desc_surface, (tooltip_x + padding, tooltip_y + y_offset))
                                 y_offset += line_height
                             current_line = word + " "
                     if current_line:
-                        desc_surface = desc_font.render(current_line, True, (200, 200, 200))
+                        desc_surface = fonts.render(current_line, 18, (200, 200, 200))
                         self.screen.blit(desc_surface, (tooltip_x + padding, tooltip_y + y_offset))
                         y_offset += line_height
                 else:
-                    desc_surface = desc_font.render(line, True, (200, 200, 200))
+                    desc_surface = fonts.render(line, 18, (200, 200, 200))
                     self.screen.blit(desc_surface, (tooltip_x + padding, tooltip_y + y_offset))
                     y_offset += line_height
         
@@ -812,7 +978,7 @@ class RPGEngine:
             y_offset += 5
             for stat_name, stat_value in formatted_stats.items():
                 stat_text = f"{stat_name}: {stat_value}"
-                stat_surface = stat_font.render(stat_text, True, (255, 215, 0))
+                stat_surface = fonts.render(stat_text, 18, (255, 215, 0), bold=True)
                 self.screen.blit(stat_surface, (tooltip_x + padding, tooltip_y + y_offset))
                 y_offset += line_height
     
@@ -828,14 +994,13 @@ class RPGEngine:
         
         texture_name = texture_config.get('texture')
         if texture_name:
-            texture_path = os.path.join("game", "textures", texture_name)
-            if os.path.exists(texture_path):
-                item_texture = pygame.image.load(texture_path).convert_alpha()
-                item_texture = pygame.transform.scale(item_texture, (world_size[0], world_size[1]))
+            item_texture = self.texture_manager.get(texture_name, world_size)
+            if item_texture:
                 
+                player_rect = self.get_player_render_rect()
                 player_center = [
-                    self.player["rect"].centerx - camera_offset[0],
-                    self.player["rect"].centery - camera_offset[1]
+                    player_rect.centerx - camera_offset[0],
+                    player_rect.centery - camera_offset[1]
                 ]
                 
                 offset_x, offset_y = self.calculate_item_position(item_data)
@@ -856,17 +1021,84 @@ class RPGEngine:
         
         return offset_x, offset_y
     
+    def tick(self):
+        """Один шаг симуляции длиной delta_time"""
+        self.camera.begin_tick()
+        self.previous_player_pos = self.player["rect"].topleft
+        with self.profiler.scope('tick'):
+            self.handle_input()
+            # Отложенные события тика доставляются одной пачкой
+            with self.profiler.scope('events.flush'):
+                self.event_bus.flush()
+        self.tick_count += 1
+    
+    def handle_profiler_key(self, key):
+        """F3 - график профайлера, F4 - начать/закончить запись trace"""
+        if key == pygame.K_F3:
+            self.profiler.toggle_overlay()
+            self.presenter.invalidate_all()
+        elif key == pygame.K_F4:
+            if self.profiler.tracing:
+                self.profiler.stop_trace(self.trace_path)
+            else:
+                self.profiler.start_trace()
+                print("Profiler trace started")
+    
+    def run_ticks(self, count=None, tick_rate=0):
+        """Прогоняет count тиков без отрисовки (None - пока running).
+        tick_rate=0 - как можно быстрее, иначе в реальном времени с этой частотой"""
+        interval = 1.0 / tick_rate if tick_rate else 0
+        next_time = time.perf_counter()
+        done = 0
+        while self.running and (count is None or done < count):
+            self.tick()
+            self.profiler.end_frame()
+            done += 1
+            if interval:
+                next_time += interval
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        return done
+    
     def run(self):
+        if self.headless:
+            try:
+                self.run_ticks(None, self.headless_tick_rate)
+            finally:
+                self.cleanup()
+                pygame.quit()
+            return
+        
         try:
+            previous_time = time.perf_counter()
             while self.running:
-                self.delta_time = self.clock.tick(60) / 1000.0
+                # Ограничиваем только частоту отрисовки (0 - без ограничения)
+                self.clock.tick(self.render_rate)
+                current_time = time.perf_counter()
+                self.accumulator += current_time - previous_time
+                previous_time = current_time
                 
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
                         self.running = False
+                    elif event.type == pygame.KEYDOWN:
+                        self.handle_profiler_key(event.key)
+                
+                # Догоняем реальное время фиксированными тиками, но не больше max_catchup_steps за кадр
+                steps = 0
+                while self.accumulator >= self.delta_time and self.running:
+                    if steps >= self.max_catchup_steps:
+                        self.accumulator %= self.delta_time
+                        break
+                    self.tick()
+                    self.accumulator -= self.delta_time
+                    steps += 1
                 
-                self.handle_input()
-                self.render()
+                self.interpolation = self.accumulator / self.delta_time
+                with self.profiler.scope('render'):
+                    self.render()
+                self.profiler.end_frame()
         
         finally:
             self.cleanup()
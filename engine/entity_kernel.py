@@ -0,0 +1,145 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .entity_manager import Entity
+
+class EntityArrays:
+    """Struct-of-arrays хранилище врагов: каждое поле - непрерывный массив NumPy"""
+    FLOAT_FIELDS = ('x', 'y', 'spawn_x', 'spawn_y', 'health', 'max_health', 'attack_cooldown',
+                    'attack_cooldown_max', 'respawn_timer', 'respawn_time', 'aggro_range',
+                    'attack_range')
+    BOOL_FIELDS = ('alive', 'is_respawning', 'show_health_bar')
+    
+    def __init__(self, capacity=1024):
+        if np is None:
+            raise ImportError("numpy is required for the numpy entity backend")
+        self.count = 0
+        self.capacity = capacity
+        for field in self.FLOAT_FIELDS:
+            setattr(self, field, np.zeros(capacity, dtype=np.float64))
+        for field in self.BOOL_FIELDS:
+            setattr(self, field, np.zeros(capacity, dtype=bool))
+    
+    def grow(self):
+        new_capacity = self.capacity * 2
+        for field in self.FLOAT_FIELDS + self.BOOL_FIELDS:
+            old = getattr(self, field)
+            new = np.zeros(new_capacity, dtype=old.dtype)
+            new[:self.capacity] = old
+            setattr(self, field, new)
+        self.capacity = new_capacity
+    
+    def add(self, stats, behavior, spawn_x, spawn_y):
+        """Добавляет врага, возвращает его индекс"""
+        if self.count >= self.capacity:
+            self.grow()
+        index = self.count
+        self.count += 1
+        
+        self.x[index] = self.spawn_x[index] = spawn_x
+        self.y[index] = self.spawn_y[index] = spawn_y
+        self.max_health[index] = self.health[index] = stats.get('health', 100)
+        self.attack_cooldown[index] = 0
+        self.attack_cooldown_max[index] = stats.get('attack_cooldown', 1.0)
+        self.respawn_timer[index] = 0
+        self.respawn_time[index] = stats.get('respawn_time', 10.0)
+        self.aggro_range[index] = behavior.get('aggro_range', 200)
+        self.attack_range[index] = stats.get('attack_range', 70)
+        self.alive[index] = True
+        self.is_respawning[index] = False
+        self.show_health_bar[index] = False
+        return index
+    
+    def clear(self):
+        self.count = 0
+    
+    def step(self, player_position, delta_time):
+        """Один тик всех врагов пачкой. Возвращает (индексы атакующих, индексы респавнувшихся)"""
+        n = self.count
+        alive = self.alive[:n]
+        respawning = self.is_respawning[:n]
+        
+        # Запуск и отсчет респавна
+        starting = ~alive & ~respawning
+        self.respawn_timer[:n][starting] = self.respawn_time[:n][starting]
+        respawning |= starting
+        was_respawning = respawning.copy()
+        self.respawn_timer[:n][respawning] -= delta_time
+        
+        respawned = np.flatnonzero(respawning & (self.respawn_timer[:n] <= 0))
+        if respawned.size:
+            self.is_respawning[respawned] = False
+            self.alive[respawned] = True
+            self.health[respawned] = self.max_health[respawned]
+            self.x[respawned] = self.spawn_x[respawned]
+            self.y[respawned] = self.spawn_y[respawned]
+            self.show_health_bar[respawned] = False
+        
+        acting = alive & ~was_respawning
+        
+        # Кд атаки
+        cooldown = self.attack_cooldown[:n]
+        cooling = acting & (cooldown > 0)
+        cooldown[cooling] -= delta_time
+        
+        # Аггро и атака
+        distance = np.hypot(self.x[:n] - player_position[0], self.y[:n] - player_position[1])
+        in_aggro = acting & (distance <= self.aggro_range[:n])
+        self.show_health_bar[:n][acting] = in_aggro[acting]
+        
+        attackers = np.flatnonzero(in_aggro & (distance <= self.attack_range[:n]) & (cooldown <= 0))
+        cooldown[attackers] = self.attack_cooldown_max[attackers]
+        return attackers, respawned
+    
+    def hit(self, attack_position, attack_range, damage):
+        """Атака по площади пачкой. Возвращает индексы убитых"""
+        n = self.count
+        distance = np.hypot(self.x[:n] - attack_position[0], self.y[:n] - attack_position[1])
+        hit = np.flatnonzero(self.alive[:n] & ~self.is_respawning[:n] & (distance <= attack_range))
+        if not hit.size:
+            return hit
+        
+        self.health[hit] = np.maximum(0, self.health[hit] - damage)
+        self.show_health_bar[hit] = True
+        killed = hit[self.health[hit] <= 0]
+        self.alive[killed] = False
+        return killed
+
+def array_property(field):
+    def getter(self):
+        value = getattr(self.arrays, field)[self.index]
+        return value.item()
+    
+    def setter(self, value):
+        getattr(self.arrays, field)[self.index] = value
+    
+    return property(getter, setter)
+
+class EntityView(Entity):
+    """Тонкий вид на врага в EntityArrays: скрипты и квесты работают с ним как с Entity"""
+    health = array_property('health')
+    max_health = array_property('max_health')
+    attack_cooldown = array_property('attack_cooldown')
+    respawn_timer = array_property('respawn_timer')
+    respawn_time = array_property('respawn_time')
+    alive = array_property('alive')
+    is_respawning = array_property('is_respawning')
+    show_health_bar = array_property('show_health_bar')
+    spawn_x = array_property('spawn_x')
+    spawn_y = array_property('spawn_y')
+    
+    def __init__(self, arrays, data, spawn_x, spawn_y, texture_manager):
+        self.arrays = arrays
+        self.index = arrays.add(data.get('stats', {}), data.get('behavior', {}), spawn_x, spawn_y)
+        super().__init__(data, spawn_x, spawn_y, texture_manager)
+    
+    @property
+    def position(self):
+        return [self.arrays.x[self.index].item(), self.arrays.y[self.index].item()]
+    
+    @position.setter
+    def position(self, value):
+        self.arrays.x[self.index] = value[0]
+        self.arrays.y[self.index] = value[1]
\ No newline at end of file
@@ -1,17 +1,19 @@
 import pygame
-import os
-import yaml
 import math
-import time
+from .font_manager import get_shared_font_manager
+from .texture_manager import get_shared_texture_manager
+from .spatial_index import SpatialGrid, PointGrid
+from .content import YamlContent
 
 class Entity:
-    def __init__(self, data, spawn_x=0, spawn_y=0):
+    def __init__(self, data, spawn_x, spawn_y, texture_manager):
         self.name = data.get('name', 'Unknown')
         self.id = data.get('id', 0)
         self.texture_data = data.get('texture', {})
         self.stats = data.get('stats', {})
         self.behavior = data.get('behavior', {})
         self.texture = None
+        self.texture_manager = texture_manager
     
         # Позиция и респавн
         self.spawn_x = spawn_x
@@ -35,12 +37,11 @@ class Entity:
     def load_texture(self):
         texture_name = self.texture_data.get('texture')
         if texture_name:
-            texture_path = os.path.join("game", "textures", texture_name)
-            if os.path.exists(texture_path):
-                self.texture = pygame.image.load(texture_path).convert_alpha()
-                world_size = self.texture_data.get('world_size', [50, 50])
-                if isinstance(world_size, list) and len(world_size) == 2:
-                    self.texture = pygame.transform.scale(self.texture, (world_size[0], world_size[1]))
+            # Общая текстура из менеджера - одна копия на все экземпляры врага
+            world_size = self.texture_data.get('world_size', [50, 50])
+            if not isinstance(world_size, list) or len(world_size) != 2:
+                world_size = None
+            self.texture = self.texture_manager.load(texture_name, world_size)
     
     def update(self, player_position, player_health_system, delta_time):
         # Респавн
@@ -73,6 +74,10 @@ class Entity:
         else:
             self.show_health_bar = False
     
+    def is_active(self):
+        """Нужно ли обновлять врага вдали от игрока (таймеры, полоска здоровья)"""
+        return not self.alive or self.is_respawning or self.attack_cooldown > 0 or self.show_health_bar
+    
     def start_respawn(self):
         self.is_respawning = True
         self.respawn_timer = self.respawn_time
@@ -85,9 +90,13 @@ class Entity:
         self.show_health_bar = False
     
     def attack(self, health_system):
+        self.attack_player(health_system)
+        self.attack_cooldown = self.stats.get('attack_cooldown', 1.0)
+    
+    def attack_player(self, health_system):
+        """Наносит урон игроку (кд атаки выставляет вызывающий)"""
         damage = self.stats.get('damage', 5)
         health_system.damage(damage)
-        self.attack_cooldown = self.stats.get('attack_cooldown', 1.0)
     
     def take_damage(self, amount):
         if not self.alive or self.is_respawning:
@@ -102,7 +111,7 @@ class Entity:
         
         return False
     
-    def render(self, screen, camera_offset):
+    def render(self, screen, camera_offset, font_manager):
         if not self.alive or not self.texture or self.is_respawning:
             return
         
@@ -114,9 +123,20 @@ class Entity:
         
         # Отрисовка полоски здоровья если нужно
         if self.show_health_bar:
-            self.render_health_bar(screen, camera_offset)
+            self.render_health_bar(screen, camera_offset, font_manager)
+    
+    def get_world_rect(self):
+        """Мировые границы врага вместе с полоской здоровья"""
+        x, y = int(self.position[0]), int(self.position[1])
+        width, height = self.texture.get_size() if self.texture else (1, 1)
+        rect = pygame.Rect(x - width//2, y - height//2, width, height)
+        return rect.union(pygame.Rect(x - 45, y - 65, 90, 24))
+    
+    def get_screen_rect(self, camera_offset):
+        """Область экрана под врагом вместе с полоской здоровья"""
+        return self.get_world_rect().move(-camera_offset[0], -camera_offset[1])
     
-    def render_health_bar(self, screen, camera_offset):
+    def render_health_bar(self, screen, camera_offset, font_manager):
         bar_width = 90
         bar_height = 9
         x = self.position[0] - bar_width // 2 - camera_offset[0]
@@ -134,33 +154,42 @@ class Entity:
         pygame.draw.rect(screen, (100, 100, 100), (x, y, bar_width, bar_height), 1)
         
         # Текст HP
-        font = pygame.font.Font(None, 12)
-        hp_text = font.render(f"{int(self.health)}/{int(self.max_health)}", True, (255, 255, 255))
+        hp_text = font_manager.render(f"{int(self.health)}/{int(self.max_health)}", 12, (255, 255, 255))
         text_x = x + (bar_width - hp_text.get_width()) // 2
         text_y = y - 15
         screen.blit(hp_text, (text_x, text_y))
 
 class EntityManager:
-    def __init__(self, script_runner):
+    def __init__(self, script_runner, font_manager=None, texture_manager=None, backend='objects', content=None):
         self.entities = []
         self.enemy_templates = {}
         self.script_runner = script_runner
+        self.font_manager = font_manager or get_shared_font_manager()
+        self.texture_manager = texture_manager or get_shared_texture_manager()
+        self.content = content or YamlContent()
+        self.grid = SpatialGrid()  # индекс для отсечения по камере
+        self.actor_grid = PointGrid()  # индекс позиций для запросов близости
+        self.active_entities = set()  # враги с идущими таймерами вне зоны аггро
+        self.max_aggro_range = 0
+        self.spawn_counter = 0
+        self.render_stats = {'drawn': 0, 'culled': 0}
+        
+        # Векторизованный бэкенд: поля врагов в массивах NumPy
+        self.backend = backend
+        self.arrays = None
+        if backend == 'numpy':
+            try:
+                from .entity_kernel import EntityArrays, EntityView
+                self.arrays = EntityArrays()
+                self.view_class = EntityView
+            except ImportError as e:
+                print(f"NumPy entity backend unavailable ({e}), using objects")
+                self.backend = 'objects'
+        
         self.load_enemy_templates()
     
     def load_enemy_templates(self):
-        enemys_path = os.path.join("game", "enemys")
-        if os.path.exists(enemys_path):
-            for enemy_file in os.listdir(enemys_path):
-                if enemy_file.endswith(".yaml"):
-                    file_path = os.path.join(enemys_path, enemy_file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as file:
-                            enemy_data = yaml.safe_load(file)
-                            enemy_id = enemy_data.get('id')
-                            if enemy_id is not None:
-                                self.enemy_templates[enemy_id] = enemy_data
-                    except Exception as e:
-                        print(f"Error loading enemy template {enemy_file}: {e}")
+        self.enemy_templates = self.content.templates('enemys')
     
     def spawn_enemy(self, enemy_id, x, y, initialize=True):
         if enemy_id not in self.enemy_templates:
@@ -168,9 +197,22 @@ class EntityManager:
             return None
         
         if initialize:
-            enemy_data = self.enemy_templates[enemy_id].copy()
-            enemy = Entity(enemy_data, x, y)
+            # Ленивый шаблон может не прочитаться - тогда ошибка уже напечатана
+            template = self.enemy_templates.get(enemy_id)
+            if template is None:
+                return None
+            enemy_data = template.copy()
+            if self.arrays is not None:
+                enemy = self.view_class(self.arrays, enemy_data, x, y, self.texture_manager)
+            else:
+                enemy = Entity(enemy_data, x, y, self.texture_manager)
+            enemy.spawn_index = self.spawn_counter
+            enemy.indexed_position = tuple(enemy.position)
+            self.spawn_counter += 1
             self.entities.append(enemy)
+            self.grid.insert(enemy, enemy.get_world_rect())
+            self.actor_grid.insert(enemy, enemy.position[0], enemy.position[1])
+            self.max_aggro_range = max(self.max_aggro_range, enemy.behavior.get('aggro_range', 200))
             return enemy
         else:
             return {"id": enemy_id, "x": x, "y": y, "initialized": False}
@@ -178,25 +220,97 @@ class EntityManager:
     def clear_entities(self):
         """Очищает всех врагов"""
         self.entities.clear()
+        self.grid.clear()
+        self.actor_grid.clear()
+        self.active_entities.clear()
+        self.max_aggro_range = 0
+        if self.arrays is not None:
+            self.arrays.clear()
     
     def update(self, player_position, player_health_system, delta_time):
-        for entity in self.entities:
+        if self.arrays is not None:
+            self.update_arrays(player_position, player_health_system, delta_time)
+            return
+        
+        # Обновляем только врагов рядом с игроком и тех, у кого идут таймеры
+        nearby = self.actor_grid.query_radius(player_position[0], player_position[1], self.max_aggro_range)
+        candidates = self.active_entities.union(nearby)
+        
+        for entity in sorted(candidates, key=lambda entity: entity.spawn_index):
             entity.update(player_position, player_health_system, delta_time)
+            
+            if entity.is_active():
+                self.active_entities.add(entity)
+            else:
+                self.active_entities.discard(entity)
+            
+            # Переиндексируем только сдвинувшихся врагов
+            position = tuple(entity.position)
+            if position != entity.indexed_position:
+                entity.indexed_position = position
+                self.grid.update(entity, entity.get_world_rect())
+                self.actor_grid.move(entity, position[0], position[1])
+    
+    def update_arrays(self, player_position, player_health_system, delta_time):
+        """Тик всех врагов одной пачкой операций над массивами"""
+        attackers, respawned = self.arrays.step(player_position, delta_time)
+        
+        for index in attackers:
+            self.entities[index].attack_player(player_health_system)
+        
+        for index in respawned:
+            entity = self.entities[index]
+            position = tuple(entity.position)
+            if position != entity.indexed_position:
+                entity.indexed_position = position
+                self.grid.update(entity, entity.get_world_rect())
+                self.actor_grid.move(entity, position[0], position[1])
+    
+    def get_enemies_in_radius(self, position, radius):
+        """Враги не дальше radius от позиции"""
+        return self.actor_grid.query_radius(position[0], position[1], radius)
+    
+    def get_nearest_enemies(self, position, k=1, max_radius=None):
+        """k ближайших врагов: список (distance, entity)"""
+        return self.actor_grid.query_nearest(position[0], position[1], k, max_radius)
     
-    def render(self, screen, camera_offset):
-        for entity in self.entities:
-            entity.render(screen, camera_offset)
+    def get_visible(self, visible_rect):
+        """Враги в видимой области в порядке появления"""
+        visible = self.grid.query_rect(visible_rect)
+        visible.sort(key=lambda entity: entity.spawn_index)
+        return visible
+    
+    def render(self, screen, camera_offset, visible_rect=None):
+        if visible_rect is None:
+            visible_rect = pygame.Rect(camera_offset, screen.get_size())
+        
+        visible = self.get_visible(visible_rect)
+        for entity in visible:
+            entity.render(screen, camera_offset, self.font_manager)
+        
+        self.render_stats['drawn'] = len(visible)
+        self.render_stats['culled'] = len(self.entities) - len(visible)
+    
+    def mark_dirty_rects(self, presenter, camera_offset, visible_rect):
+        """Сообщает презентеру области видимых врагов"""
+        for entity in self.grid.query_rect(visible_rect):
+            if entity.alive and entity.texture and not entity.is_respawning:
+                presenter.mark(('entity', id(entity)), entity.get_screen_rect(camera_offset),
+                               (entity.show_health_bar, int(entity.health)))
     
     def check_attack_hit(self, attack_position, attack_range, damage):
         """Проверяет попадание атаки игрока по врагам"""
+        if self.arrays is not None:
+            killed = self.arrays.hit(attack_position, attack_range, damage)
+            return [self.entities[index] for index in killed]
+        
         hits = []
-        for entity in self.entities:
+        in_range = self.get_enemies_in_radius(attack_position, attack_range)
+        for entity in sorted(in_range, key=lambda entity: entity.spawn_index):
             if not entity.alive or entity.is_respawning:
                 continue
-                
-            distance = math.sqrt((entity.position[0] - attack_position[0])**2 + 
-                                (entity.position[1] - attack_position[1])**2)
-            if distance <= attack_range:
-                if entity.take_damage(damage):
-                    hits.append(entity)
+            
+            if entity.take_damage(damage):
+                hits.append(entity)
+            self.active_entities.add(entity)
         return hits
\ No newline at end of file
@@ -0,0 +1,74 @@
+from collections import namedtuple
+
+# Типы событий: тип события - это его класс
+EntityKilled = namedtuple('EntityKilled', ['entity_id', 'entity'])
+ItemGiven = namedtuple('ItemGiven', ['item_id', 'slot'])
+ValueChanged = namedtuple('ValueChanged', ['value_id', 'value'])
+MapSet = namedtuple('MapSet', ['map_id'])
+QuestGiven = namedtuple('QuestGiven', ['quest_id'])
+QuestCancelled = namedtuple('QuestCancelled', ['quest_id'])
+DialogOpened = namedtuple('DialogOpened', ['npc_id'])
+
+EVENT_TYPES = (EntityKilled, ItemGiven, ValueChanged, MapSet, QuestGiven, QuestCancelled, DialogOpened)
+
+class EventBus:
+    """Шина событий движка: синхронные обработчики вызываются сразу в emit,
+    отложенные - пачкой в flush в конце тика"""
+    def __init__(self, max_flush_rounds=16):
+        self.handlers = {}  # тип события -> кортеж синхронных обработчиков
+        self.deferred_handlers = {}  # тип события -> кортеж отложенных обработчиков
+        self.queue = []  # (обработчики, событие) до конца тика
+        self.counters = {event_type.__name__: 0 for event_type in EVENT_TYPES}
+        self.max_flush_rounds = max_flush_rounds  # защита от событий, которые бесконечно порождают новые
+    
+    def subscribe(self, event_type, handler, deferred=False):
+        """Подписывает handler(event) на тип события"""
+        table = self.deferred_handlers if deferred else self.handlers
+        table[event_type] = table.get(event_type, ()) + (handler,)
+    
+    def unsubscribe(self, event_type, handler, deferred=False):
+        table = self.deferred_handlers if deferred else self.handlers
+        handlers = tuple(h for h in table.get(event_type, ()) if h != handler)
+        if handlers:
+            table[event_type] = handlers
+        else:
+            table.pop(event_type, None)
+    
+    def emit(self, event):
+        """Публикует событие: синхронные обработчики - сейчас, отложенные - в flush"""
+        event_type = type(event)
+        name = event_type.__name__
+        self.counters[name] = self.counters.get(name, 0) + 1
+        
+        deferred = self.deferred_handlers.get(event_type)
+        if deferred:
+            self.queue.append((deferred, event))
+        
+        handlers = self.handlers.get(event_type)
+        if handlers:
+            for handler in handlers:
+                try:
+                    handler(event)
+                except Exception as e:
+                    print(f"Error handling {name}: {e}")
+    
+    def flush(self):
+        """Доставляет отложенные события; события из обработчиков доставляются в этом же flush"""
+        rounds = 0
+        while self.queue and rounds < self.max_flush_rounds:
+            queue = self.queue
+            self.queue = []
+            for handlers, event in queue:
+                for handler in handlers:
+                    try:
+                        handler(event)
+                    except Exception as e:
+                        print(f"Error handling {type(event).__name__}: {e}")
+            rounds += 1
+        if self.queue:
+            # Остаток доставим в следующем тике
+            print(f"Error flushing events: {len(self.queue)} events left after {rounds} rounds")
+    
+    def get_stats(self):
+        """Сколько событий каждого типа опубликовано"""
+        return dict(self.counters)
\ No newline at end of file
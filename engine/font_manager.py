@@ -0,0 +1,71 @@
+import pygame
+from collections import OrderedDict
+
+class FontManager:
+    def __init__(self, max_text_cache=1024):
+        self.fonts = {}  # (face, size, bold) -> pygame.font.Font
+        self.text_cache = OrderedDict()  # (text, font_key, color, antialias) -> Surface
+        self.max_text_cache = max_text_cache
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+    
+    def get_font(self, size, face=None, bold=False):
+        """Возвращает общий шрифт по (face, size, bold)"""
+        font_key = (face, size, bold)
+        font = self.fonts.get(font_key)
+        if font is None:
+            font = pygame.font.Font(face, size)
+            if bold:
+                font.set_bold(True)
+            self.fonts[font_key] = font
+        return font
+    
+    def render(self, text, size, color, antialias=True, face=None, bold=False):
+        """Рендерит текст через LRU кэш. Поверхность общая - не изменять!"""
+        font_key = (face, size, bold)
+        cache_key = (text, font_key, tuple(color), antialias)
+        
+        surface = self.text_cache.get(cache_key)
+        if surface is not None:
+            self.text_cache.move_to_end(cache_key)
+            self.stats['hits'] += 1
+            return surface
+        
+        self.stats['misses'] += 1
+        surface = self.get_font(size, face, bold).render(text, antialias, color)
+        self.text_cache[cache_key] = surface
+        
+        # Выкидываем самые старые строки
+        while len(self.text_cache) > self.max_text_cache:
+            self.text_cache.popitem(last=False)
+            self.stats['evictions'] += 1
+        
+        return surface
+    
+    def get_stats(self):
+        """Возвращает счетчики кэша текста"""
+        total = self.stats['hits'] + self.stats['misses']
+        return {
+            'hits': self.stats['hits'],
+            'misses': self.stats['misses'],
+            'evictions': self.stats['evictions'],
+            'hit_rate': self.stats['hits'] / total if total else 0.0,
+            'cached_texts': len(self.text_cache),
+            'fonts': len(self.fonts)
+        }
+    
+    def clear(self):
+        """Очищает кэш текста (шрифты остаются)"""
+        self.text_cache.clear()
+
+shared_font_manager = None
+
+def get_shared_font_manager():
+    """Общий менеджер шрифтов по умолчанию для систем, созданных без менеджера движка"""
+    global shared_font_manager
+    if shared_font_manager is None:
+        shared_font_manager = FontManager()
+    return shared_font_manager
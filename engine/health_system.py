@@ -1,12 +1,17 @@
 import pygame
 import os
 import yaml
+from .font_manager import get_shared_font_manager
+from .texture_manager import TextureManager, get_shared_texture_manager
 
 class HealthSystem:
-    def __init__(self, config_path="game/config/game_config.yaml"):
+    def __init__(self, config_path="game/config/game_config.yaml", font_manager=None, texture_manager=None):
         self.health = 100
         self.max_health = 100
         self.health_texture = None
+        self.font_manager = font_manager or get_shared_font_manager()
+        self.texture_manager = texture_manager or get_shared_texture_manager()
+        self.hud = None
         self.load_config(config_path)
         self.load_textures()
     
@@ -19,21 +24,22 @@ class HealthSystem:
                 self.max_health = defaults.get('max_health', 100)
     
     def load_textures(self):
-        health_ui_path = os.path.join("game", "textures", "health_ui.png")
-        if os.path.exists(health_ui_path):
-            self.health_texture = pygame.image.load(health_ui_path).convert_alpha()
-            self.health_texture = pygame.transform.scale(self.health_texture, (32, 32))
+        self.health_texture = self.texture_manager.load("health_ui.png", (32, 32), scope=TextureManager.GLOBAL_SCOPE)
     
     def damage(self, amount):
         self.health = max(0, self.health - amount)
+        if self.hud:
+            self.hud.invalidate('health')
         return self.health <= 0
     
     def heal(self, amount):
         self.health = min(self.max_health, self.health + amount)
+        if self.hud:
+            self.hud.invalidate('health')
     
-    def render(self, screen):
+    def render(self, screen, pos=(20, 20)):
         # Позиция UI здоровья
-        ui_x, ui_y = 20, 20
+        ui_x, ui_y = pos
         
         # Отрисовка иконки если есть
         if self.health_texture:
@@ -58,8 +64,7 @@ class HealthSystem:
         pygame.draw.rect(screen, (100, 100, 120), bg_rect, border_width)
         
         # Текст здоровья
-        font = pygame.font.Font(None, 16)
-        health_text = font.render(f"{self.health} / {self.max_health}", True, (255, 255, 255))
+        health_text = self.font_manager.render(f"{self.health} / {self.max_health}", 16, (255, 255, 255))
         text_rect = health_text.get_rect(center=(ui_x + bar_width//2, ui_y + bar_height//2))
         screen.blit(health_text, text_rect)
     
@@ -0,0 +1,61 @@
+import pygame
+
+class HUDPanel:
+    def __init__(self, name, rect, draw_callback):
+        self.name = name
+        self.rect = pygame.Rect(rect)
+        self.draw_callback = draw_callback  # draw_callback(surface, (x, y)) рисует в локальных координатах
+        self.surface = None
+        self.dirty = True
+        self.version = 0  # растет при каждой инвалидации (для dirty rect режима)
+    
+    def redraw(self):
+        """Перерисовывает кэшированную поверхность панели"""
+        if self.surface is None or self.surface.get_size() != self.rect.size:
+            self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.surface.fill((0, 0, 0, 0))
+        self.draw_callback(self.surface, (0, 0))
+        self.dirty = False
+
+class HUDSystem:
+    def __init__(self):
+        self.panels = {}
+        self.stats = {
+            'redraws': 0,
+            'blits': 0
+        }
+    
+    def add_panel(self, name, rect, draw_callback):
+        """Регистрирует панель HUD"""
+        panel = HUDPanel(name, rect, draw_callback)
+        self.panels[name] = panel
+        return panel
+    
+    def invalidate(self, name=None):
+        """Помечает панель (или все панели) для перерисовки"""
+        if name is None:
+            for panel in self.panels.values():
+                panel.dirty = True
+                panel.version += 1
+        elif name in self.panels:
+            self.panels[name].dirty = True
+            self.panels[name].version += 1
+    
+    def render(self, screen, name=None):
+        """Блитит панель (или все панели), перерисовывая только грязные"""
+        panels = self.panels.values() if name is None else [self.panels[name]]
+        for panel in panels:
+            if panel.dirty:
+                panel.redraw()
+                self.stats['redraws'] += 1
+            screen.blit(panel.surface, panel.rect.topleft)
+            self.stats['blits'] += 1
+    
+    def mark_dirty_rects(self, presenter):
+        """Сообщает презентеру области панелей"""
+        for name, panel in self.panels.items():
+            presenter.mark(('hud', name), panel.rect, panel.version)
+    
+    def get_stats(self):
+        """Возвращает счетчики перерисовок HUD"""
+        return dict(self.stats)
\ No newline at end of file
@@ -0,0 +1,53 @@
+import pygame
+
+class PygameInput:
+    """Ввод с реальных клавиатуры и мыши"""
+    def get_keys(self):
+        return pygame.key.get_pressed()
+    
+    def get_mouse_buttons(self):
+        return pygame.mouse.get_pressed()
+    
+    def get_mouse_pos(self):
+        return pygame.mouse.get_pos()
+
+class KeyState:
+    """Замена pygame.key.get_pressed(): индексируется константами pygame.K_*"""
+    def __init__(self, pressed):
+        self.pressed = pressed
+    
+    def __getitem__(self, key):
+        return key in self.pressed
+
+class InjectedInput:
+    """Программный ввод для headless режима, ботов и тестов контента"""
+    def __init__(self):
+        self.pressed = set()
+        self.mouse_buttons = [False, False, False]
+        self.mouse_pos = (0, 0)
+    
+    def press(self, *keys):
+        self.pressed.update(keys)
+    
+    def release(self, *keys):
+        self.pressed.difference_update(keys)
+    
+    def set_mouse(self, pos=None, buttons=None):
+        """Двигает мышь и/или задает нажатые кнопки (список из трех bool)"""
+        if pos is not None:
+            self.mouse_pos = tuple(pos)
+        if buttons is not None:
+            self.mouse_buttons = list(buttons)
+    
+    def clear(self):
+        self.pressed.clear()
+        self.mouse_buttons = [False, False, False]
+    
+    def get_keys(self):
+        return KeyState(self.pressed)
+    
+    def get_mouse_buttons(self):
+        return tuple(self.mouse_buttons)
+    
+    def get_mouse_pos(self):
+        return self.mouse_pos
\ No newline at end of file
@@ -1,14 +1,17 @@
 import pygame
-import os
+from .font_manager import get_shared_font_manager
+from .texture_manager import get_shared_texture_manager
+from .event_bus import ItemGiven
 
 class Inventory:
-    def __init__(self, cache_manager, slots=9):
+    def __init__(self, cache_manager, slots=9, font_manager=None, texture_manager=None):
         self.slots = [None] * slots
         self.cache_manager = cache_manager
-        self.font = pygame.font.Font(None, 24)
-        self.cooldown_font = pygame.font.Font(None, 18)
+        self.font_manager = font_manager or get_shared_font_manager()
+        self.texture_manager = texture_manager or get_shared_texture_manager()
         self.slot_size = 60
-        self.inventory_textures = {}
+        self.hud = None
+        self.event_bus = None
     
     def give_item(self, item_id, slot):
         if 0 <= slot < len(self.slots):
@@ -16,6 +19,10 @@ class Inventory:
                 'id': item_id,
                 'count': 1
             }
+            if self.hud:
+                self.hud.invalidate('inventory')
+            if self.event_bus:
+                self.event_bus.emit(ItemGiven(item_id, slot))
             return True
         return False
     
@@ -24,15 +31,15 @@ class Inventory:
             return self.slots[slot]
         return None
     
-    def render(self, screen, item_loader, selected_slot=None):
+    def render(self, screen, item_loader, selected_slot=None, pos=(10, 500)):
         # Отрисовка фона инвентаря
-        inventory_bg = pygame.Rect(10, 500, self.slot_size * len(self.slots) + 20, self.slot_size + 20)
+        inventory_bg = pygame.Rect(pos[0], pos[1], self.slot_size * len(self.slots) + 20, self.slot_size + 20)
         pygame.draw.rect(screen, (50, 50, 60), inventory_bg)
         pygame.draw.rect(screen, (100, 100, 120), inventory_bg, 2)
         
         # Отрисовка слотов и предметов
         for i, item in enumerate(self.slots):
-            slot_rect = pygame.Rect(20 + i * self.slot_size, 510, self.slot_size - 10, self.slot_size - 10)
+            slot_rect = pygame.Rect(pos[0] + 10 + i * self.slot_size, pos[1] + 10, self.slot_size - 10, self.slot_size - 10)
             
             # Фон слота (выделение выбранного)
             if i == selected_slot:
@@ -43,7 +50,7 @@ class Inventory:
             pygame.draw.rect(screen, (120, 120, 140), slot_rect, 2)
             
             # Номер слота
-            slot_text = self.font.render(str(i+1), True, (200, 200, 200))
+            slot_text = self.font_manager.render(str(i+1), 24, (200, 200, 200))
             screen.blit(slot_text, (slot_rect.x + 5, slot_rect.y + 5))
             
             # Предмет (только текстура, без имени)
@@ -62,21 +69,12 @@ class Inventory:
         texture_name = texture_config.get('texture')
         
         if texture_name:
-            if texture_name not in self.inventory_textures:
-                texture_path = os.path.join("game", "textures", texture_name)
-                if os.path.exists(texture_path):
-                    texture = pygame.image.load(texture_path).convert_alpha()
-                    
-                    inventory_size = texture_config.get('inventory_size', [self.slot_size - 20, self.slot_size - 20])
-                    if isinstance(inventory_size, list) and len(inventory_size) == 2:
-                        texture = pygame.transform.scale(texture, (inventory_size[0], inventory_size[1]))
-                    else:
-                        texture = pygame.transform.scale(texture, (self.slot_size - 20, self.slot_size - 20))
-                    
-                    self.inventory_textures[texture_name] = texture
+            inventory_size = texture_config.get('inventory_size', [self.slot_size - 20, self.slot_size - 20])
+            if not isinstance(inventory_size, list) or len(inventory_size) != 2:
+                inventory_size = [self.slot_size - 20, self.slot_size - 20]
             
-            if texture_name in self.inventory_textures:
-                texture = self.inventory_textures[texture_name]
+            texture = self.texture_manager.get(texture_name, inventory_size)
+            if texture:
                 texture_rect = texture.get_rect(center=slot_rect.center)
                 screen.blit(texture, texture_rect)
     
@@ -85,7 +83,6 @@ class Inventory:
         overlay.fill((0, 0, 0, 180))
         screen.blit(overlay, slot_rect)
         
-        seconds = cooldown / 60
-        cooldown_text = self.cooldown_font.render(f"{seconds:.1f}", True, (255, 0, 0))
+        cooldown_text = self.font_manager.render(f"{cooldown:.1f}", 18, (255, 0, 0))
         text_rect = cooldown_text.get_rect(center=slot_rect.center)
         screen.blit(cooldown_text, text_rect)
\ No newline at end of file
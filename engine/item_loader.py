@@ -1,23 +1,40 @@
 import yaml
 import os
 import re
+from .content import YamlContent
 
 class ItemLoader:
-    def __init__(self):
+    def __init__(self, content=None):
         self.items = {}
+        self.content = content or YamlContent()
+    
+    def load_items(self):
+        """Загружает все предметы; из пака берутся с уже раскрытыми динамическими значениями"""
+        resolved = self.content.get_resolved('items')
+        if resolved is not None:
+            self.items.update(resolved)
+            return
+        
+        for item_file, item_data in self.content.load('items'):
+            try:
+                self.add_item(item_data)
+            except Exception as e:
+                print(f"Error loading item {item_file}: {e}")
     
     def load_item(self, file_path):
         with open(file_path, 'r', encoding='utf-8') as file:
             item_data = yaml.safe_load(file)
-            
-            # Обработка динамических значений
-            self.process_dynamic_values(item_data)
-            
-            item_id = item_data.get('id')
-            if item_id is not None:
-                self.items[item_id] = item_data
-            
-            return item_data
+            return self.add_item(item_data)
+    
+    def add_item(self, item_data):
+        # Обработка динамических значений
+        self.process_dynamic_values(item_data)
+        
+        item_id = item_data.get('id')
+        if item_id is not None:
+            self.items[item_id] = item_data
+        
+        return item_data
     
     def process_dynamic_values(self, data):
         if isinstance(data, dict):
@@ -1,16 +1,21 @@
 import pygame
-import os
-import yaml
+from .texture_manager import get_shared_texture_manager
+from .spatial_index import CollisionGrid
+from .content import YamlContent
+from .event_bus import MapSet
 
 class MapObject:
-    def __init__(self, object_data):
+    def __init__(self, object_data, texture_manager, name=None):
+        self.name = name
         self.layer = object_data.get('layer', 0)
         self.collision = object_data.get('collision', False)
+        self.collision_layer = object_data.get('collision_layer', 1)  # битовая маска
         self.world_size = object_data.get('world_size', [64, 64])
         self.world_pos = object_data.get('world_pos', [0, 0])
         self.texture_config = object_data.get('texture', {})
         self.object_type = object_data.get('type', 'object')
         self.texture = None
+        self.texture_manager = texture_manager
         self.rect = pygame.Rect(self.world_pos[0], self.world_pos[1], 
                                self.world_size[0], self.world_size[1])
         
@@ -22,15 +27,10 @@ class MapObject:
         color = self.texture_config.get('color')
         
         if use_texture and texture_name:
-            texture_path = os.path.join("game", "textures", texture_name)
-            if os.path.exists(texture_path):
-                self.texture = pygame.image.load(texture_path).convert_alpha()
-                self.texture = pygame.transform.scale(self.texture, 
-                                                    (self.world_size[0], self.world_size[1]))
+            self.texture = self.texture_manager.load(texture_name, self.world_size)
         elif color:
             if isinstance(color, list) and len(color) == 3:
-                self.texture = pygame.Surface((self.world_size[0], self.world_size[1]))
-                self.texture.fill(color)
+                self.texture = self.texture_manager.load_color(color, self.world_size)
     
     def check_collision(self, player_rect):
         """Проверяет коллизию с игроком"""
@@ -49,45 +49,57 @@ class MapObject:
         screen.blit(self.texture, (render_x, render_y))
 
 class MapSystem:
-    def __init__(self, entity_manager, npc_system):
+    def __init__(self, entity_manager, npc_system, texture_manager=None, content=None):
         self.maps = {}
         self.current_map = None
         self.map_objects = []
         self.entity_manager = entity_manager
         self.npc_system = npc_system
+        self.texture_manager = texture_manager or get_shared_texture_manager()
+        self.content = content or YamlContent()
+        self.event_bus = None
+        self.map_version = 0  # растет при каждой смене карты
+        self.collision_grid = CollisionGrid()  # broadphase статичных коллизий
+        
+        # Запеченные слои: статичные объекты отрисованы в чанки фиксированного размера
+        self.chunk_size = 512
+        self.chunks = {}  # layer -> {(chunk_x, chunk_y): Surface}
+        self.chunk_objects = {}  # (layer, chunk_x, chunk_y) -> объекты в порядке отрисовки
+        self.dirty_chunks = set()
+        self.objects_by_name = {}
+        self.original_draw_index = {}  # имя объекта -> место в порядке отрисовки при загрузке карты
+        self.next_draw_index = 0
+        self.prebake = True  # запекать чанки сразу при загрузке карты, иначе при первой отрисовке
+        self.render_stats = {'drawn': 0, 'culled': 0}
         self.load_maps()
     
     def load_maps(self):
         """Загружает все карты из папки maps"""
-        maps_path = os.path.join("game", "maps")
-        if os.path.exists(maps_path):
-            for map_file in os.listdir(maps_path):
-                if map_file.endswith(".yaml"):
-                    file_path = os.path.join(maps_path, map_file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as file:
-                            map_data = yaml.safe_load(file)
-                            map_id = map_data.get('id')
-                            if map_id is not None:
-                                self.maps[map_id] = map_data
-                    except Exception as e:
-                        print(f"Error loading map {map_file}: {e}")
+        self.maps = self.content.templates('maps')
     
     def set_map(self, map_id):
         """Устанавливает текущую карту"""
-        if map_id in self.maps:
-            map_data = self.maps[map_id]
+        map_data = self.maps.get(map_id)
+        if map_data is not None:
+            
+            # Текстуры прошлой карты больше не нужны - снимаем ее ссылки
+            if self.current_map is not None:
+                self.texture_manager.release_scope(f"map_{self.current_map.get('id')}")
+            self.texture_manager.set_scope(f"map_{map_id}")
+            
             self.current_map = map_data
             self.map_objects = []
+            self.map_version += 1
             
             # Очищаем текущих врагов и NPC
             self.entity_manager.clear_entities()
             self.npc_system.npcs.clear()
+            self.npc_system.clear_index()
             
             # Создаем объекты карты
             map_objects = map_data.get('map', {})
             for obj_name, obj_data in map_objects.items():
-                map_object = MapObject(obj_data)
+                map_object = MapObject(obj_data, self.texture_manager, obj_name)
                 self.map_objects.append(map_object)
                 
                 # Если это враг - спавним его
@@ -101,12 +113,126 @@ class MapSystem:
             # Сортируем объекты по слоям
             self.map_objects.sort(key=lambda x: x.layer)
             
+            # Индексируем коллизии и запекаем статичные слои в чанки
+            self.collision_grid.clear()
+            self.chunks = {}
+            self.texture_manager.track('map_chunks', 0)
+            self.chunk_objects = {}
+            self.dirty_chunks = set()
+            self.objects_by_name = {}
+            self.original_draw_index = {}
+            for draw_index, map_object in enumerate(self.map_objects):
+                map_object.draw_index = draw_index
+                self.original_draw_index[map_object.name] = draw_index
+                self.index_object(map_object)
+            self.next_draw_index = len(self.map_objects)
+            if self.prebake:
+                self.rebuild_dirty_chunks()
+            
+            # Укладываемся в бюджет памяти текстур
+            self.texture_manager.trim()
+            
             print(f"Map '{map_data.get('name')}' loaded successfully!")
+            if self.event_bus:
+                self.event_bus.emit(MapSet(map_id))
             return True
         else:
             print(f"Map with id {map_id} not found!")
             return False
     
+    def get_object_chunks(self, map_object):
+        """Ключи чанков, которые перекрывает объект"""
+        rect = map_object.rect
+        size = self.chunk_size
+        for chunk_x in range(rect.left // size, (rect.right - 1) // size + 1):
+            for chunk_y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield (map_object.layer, chunk_x, chunk_y)
+    
+    def index_object(self, map_object):
+        if map_object.name is not None:
+            self.objects_by_name[map_object.name] = map_object
+        if map_object.collision:
+            self.collision_grid.insert(map_object, map_object.rect, map_object.collision_layer)
+        if map_object.texture:
+            for chunk_key in self.get_object_chunks(map_object):
+                objects = self.chunk_objects.setdefault(chunk_key, [])
+                objects.append(map_object)
+                # Восстановленный объект встает на свое старое место в порядке отрисовки
+                if len(objects) > 1 and objects[-2].draw_index > map_object.draw_index:
+                    objects.sort(key=lambda x: x.draw_index)
+                self.dirty_chunks.add(chunk_key)
+    
+    def rebuild_dirty_chunks(self):
+        """Перерисовывает только измененные чанки"""
+        size = self.chunk_size
+        for chunk_key in self.dirty_chunks:
+            layer, chunk_x, chunk_y = chunk_key
+            objects = self.chunk_objects.get(chunk_key)
+            layer_chunks = self.chunks.setdefault(layer, {})
+            if not objects:
+                self.chunk_objects.pop(chunk_key, None)
+                layer_chunks.pop((chunk_x, chunk_y), None)
+                continue
+            
+            chunk = pygame.Surface((size, size), pygame.SRCALPHA)
+            origin = (chunk_x * size, chunk_y * size)
+            for map_object in objects:
+                map_object.render(chunk, origin)
+            if self.texture_manager.convert:
+                # Чанк в формате экрана, иначе каждый blit идет медленным путем
+                chunk = chunk.convert_alpha()
+            layer_chunks[(chunk_x, chunk_y)] = chunk
+        
+        self.dirty_chunks.clear()
+        self.chunks = {layer: self.chunks[layer] for layer in sorted(self.chunks) if self.chunks[layer]}
+        
+        # Чанки занимают память текстур: учитываем их в бюджете
+        chunk_bytes = sum(chunk.get_width() * chunk.get_height() * chunk.get_bytesize()
+                          for layer_chunks in self.chunks.values() for chunk in layer_chunks.values())
+        self.texture_manager.track('map_chunks', chunk_bytes)
+        self.texture_manager.trim()
+    
+    def add_map_object(self, name, obj_data, draw_index=None):
+        """Добавляет объект на текущую карту; перепекаются только задетые чанки.
+        Без draw_index объект рисуется поверх всех объектов своего слоя"""
+        self.remove_map_object(name)
+        map_object = MapObject(obj_data, self.texture_manager, name)
+        if draw_index is None:
+            draw_index = self.next_draw_index
+            self.next_draw_index += 1
+        map_object.draw_index = draw_index
+        self.map_objects.append(map_object)
+        self.map_objects.sort(key=lambda x: (x.layer, x.draw_index))
+        self.index_object(map_object)
+        self.map_version += 1
+        return map_object
+    
+    def remove_map_object(self, name):
+        """Убирает объект с текущей карты по имени"""
+        map_object = self.objects_by_name.pop(name, None)
+        if map_object is None:
+            return False
+        
+        self.map_objects.remove(map_object)
+        self.collision_grid.remove(map_object)
+        for chunk_key in self.get_object_chunks(map_object):
+            objects = self.chunk_objects.get(chunk_key)
+            if objects and map_object in objects:
+                objects.remove(map_object)
+                self.dirty_chunks.add(chunk_key)
+        self.map_version += 1
+        return True
+    
+    def restore_map_object(self, name):
+        """Возвращает объект из данных текущей карты"""
+        if not self.current_map:
+            return None
+        obj_data = self.current_map.get('map', {}).get(name)
+        if obj_data is None:
+            print(f"Map object '{name}' not found!")
+            return None
+        return self.add_map_object(name, obj_data, self.original_draw_index.get(name))
+    
     def spawn_enemy_from_map(self, enemy_data):
         """Спавнит врага из данных карты"""
         if not self.entity_manager:
@@ -133,31 +259,45 @@ class MapSystem:
             # Спавним NPC через npc_system
             self.npc_system.spawn_npc(npc_id, x, y, True)
     
-    def check_collisions(self, player_rect):
+    def check_collisions(self, player_rect, mask=CollisionGrid.ALL_LAYERS):
         """Проверяет коллизии игрока с объектами карты"""
-        collisions = []
-        for obj in self.map_objects:
-            if obj.check_collision(player_rect):
-                collisions.append(obj)
-        return collisions
+        return self.collision_grid.query_colliders(player_rect, mask)
+    
+    def move_actor(self, rect, dx, dy, mask=CollisionGrid.ALL_LAYERS):
+        """Двигает любой rect с учетом статичных коллизий, возвращает (blocked_x, blocked_y)"""
+        return self.collision_grid.move_rect(rect, dx, dy, mask)
     
     def update_player_position(self, player_rect, new_x, new_y):
-        """Обновляет позицию игрока с учетом коллизий"""
-        temp_rect = player_rect.copy()
-        temp_rect.x = new_x
-        temp_rect.y = new_y
+        """Обновляет позицию игрока с учетом коллизий (скольжение вдоль стен)"""
+        blocked_x, blocked_y = self.move_actor(player_rect, new_x - player_rect.x, new_y - player_rect.y)
+        return not (blocked_x or blocked_y)
+    
+    def mark_dirty_rects(self, presenter):
+        """Статичная карта меняется только целиком"""
+        presenter.mark('map', None, self.map_version)
+    
+    def render(self, screen, camera_offset, visible_rect=None):
+        """Отрисовывает видимые чанки карты по слоям"""
+        if visible_rect is None:
+            visible_rect = pygame.Rect(camera_offset, screen.get_size())
         
-        # Проверяем коллизии
-        collisions = self.check_collisions(temp_rect)
+        if self.dirty_chunks:
+            self.rebuild_dirty_chunks()
         
-        if collisions:
-            return False
-        else:
-            player_rect.x = new_x
-            player_rect.y = new_y
-            return True
-    
-    def render(self, screen, camera_offset):
-        """Отрисовывает все объекты карты"""
-        for obj in self.map_objects:
-            obj.render(screen, camera_offset)
\ No newline at end of file
+        size = self.chunk_size
+        min_x, min_y = visible_rect.left // size, visible_rect.top // size
+        max_x, max_y = (visible_rect.right - 1) // size, (visible_rect.bottom - 1) // size
+        
+        drawn = 0
+        total = 0
+        for layer_chunks in self.chunks.values():
+            total += len(layer_chunks)
+            for chunk_x in range(min_x, max_x + 1):
+                for chunk_y in range(min_y, max_y + 1):
+                    chunk = layer_chunks.get((chunk_x, chunk_y))
+                    if chunk:
+                        screen.blit(chunk, (chunk_x * size - camera_offset[0], chunk_y * size - camera_offset[1]))
+                        drawn += 1
+        
+        self.render_stats['drawn'] = drawn
+        self.render_stats['culled'] = total - drawn
\ No newline at end of file
@@ -1,39 +1,41 @@
 import pygame
-import os
-import yaml
-import re
-import time
+from .font_manager import get_shared_font_manager
+from .texture_manager import get_shared_texture_manager
+from .content import YamlContent
+from .event_bus import ValueChanged
 
 class MenuSystem:
-    def __init__(self, script_runner, value_system):
+    def __init__(self, script_runner, value_system, font_manager=None, texture_manager=None, content=None):
         self.script_runner = script_runner
         self.value_system = value_system
+        self.font_manager = font_manager or get_shared_font_manager()
+        self.texture_manager = texture_manager or get_shared_texture_manager()
+        self.content = content or YamlContent()
         self.menus = {}
         self.active_menu = None
         self.button_cooldowns = {}  # Кд для кнопок меню
-        self.button_cooldown_duration = 10  # Кд в кадрах
+        self.button_cooldown_duration = 1 / 6  # Кд в секундах
+        self.values_version = 0  # растет при каждом ValueChanged
+        self.event_bus = None
         self.load_menus()
     
     def load_menus(self):
         """Загружает все меню из папки menus"""
-        menus_path = os.path.join("game", "menus")
-        if os.path.exists(menus_path):
-            for menu_file in os.listdir(menus_path):
-                if menu_file.endswith(".yaml"):
-                    file_path = os.path.join(menus_path, menu_file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as file:
-                            menu_data = yaml.safe_load(file)
-                            menu_id = menu_data.get('id')
-                            if menu_id is not None:
-                                self.menus[menu_id] = menu_data
-                    except Exception as e:
-                        print(f"Error loading menu {menu_file}: {e}")
+        self.menus = self.content.templates('menus')
+    
+    def set_event_bus(self, event_bus):
+        """Подписывается на изменения значений, чтобы не сравнивать их каждый кадр"""
+        self.event_bus = event_bus
+        event_bus.subscribe(ValueChanged, self.on_value_changed)
+    
+    def on_value_changed(self, event):
+        self.values_version += 1
     
     def open_menu(self, menu_id):
         """Открывает меню по ID"""
-        if menu_id in self.menus:
-            self.active_menu = self.menus[menu_id]
+        menu = self.menus.get(menu_id)
+        if menu is not None:
+            self.active_menu = menu
             return True
         return False
     
@@ -41,11 +43,11 @@ class MenuSystem:
         """Закрывает текущее меню"""
         self.active_menu = None
     
-    def update_cooldowns(self):
+    def update_cooldowns(self, delta_time):
         """Обновляет кд кнопок"""
         for button_name in list(self.button_cooldowns.keys()):
             if self.button_cooldowns[button_name] > 0:
-                self.button_cooldowns[button_name] -= 1
+                self.button_cooldowns[button_name] -= delta_time
                 if self.button_cooldowns[button_name] <= 0:
                     del self.button_cooldowns[button_name]
     
@@ -54,9 +56,6 @@ class MenuSystem:
         if not self.active_menu:
             return False
         
-        # Обновляем кд
-        self.update_cooldowns()
-        
         ui_elements = self.active_menu.get('menu', {}).get('ui', {})
         
         for element_name, element_data in ui_elements.items():
@@ -93,10 +92,17 @@ class MenuSystem:
         return False
     
     def execute_menu_script(self, script_lines):
-        """Выполняет скрипт меню"""
-        for line in script_lines:
-            if line.strip() and not line.strip().startswith('#'):
-                self.script_runner.execute_command(line.strip())
+        """Выполняет скрипт меню; изменения значений за каждый запуск задачи сохраняются одной транзакцией"""
+        self.script_runner.execute_block(script_lines, "menu script", batch_values=True)
+    
+    def mark_dirty_rects(self, presenter):
+        """Меню перерисовывается целиком при открытии или изменении значений"""
+        if self.active_menu:
+            if self.event_bus:
+                values = self.values_version
+            else:
+                values = tuple((value_id, value_data['value']) for value_id, value_data in self.value_system.values.items())
+            presenter.mark('menu', None, (id(self.active_menu), values))
     
     def render(self, screen):
         """Отрисовывает активное меню"""
@@ -118,8 +124,7 @@ class MenuSystem:
         pygame.draw.rect(screen, (100, 100, 120), menu_rect, 2)
         
         # Заголовок
-        title_font = pygame.font.Font(None, 32)
-        title_text = title_font.render(menu_config.get('title', 'Menu'), True, (255, 215, 0))
+        title_text = self.font_manager.render(menu_config.get('title', 'Menu'), 32, (255, 215, 0))
         screen.blit(title_text, (menu_x + 20, menu_y + 20))
         
         # Кнопка закрытия (рисуется поверх всего)
@@ -129,8 +134,7 @@ class MenuSystem:
             pygame.draw.rect(screen, (80, 80, 100), cross_rect)
             pygame.draw.rect(screen, (120, 120, 140), cross_rect, 2)
             
-            cross_font = pygame.font.Font(None, 20)
-            cross_text = cross_font.render("X", True, (255, 0, 0))  # Красный крестик
+            cross_text = self.font_manager.render("X", 20, (255, 0, 0))  # Красный крестик
             screen.blit(cross_text, (cross_rect.x + 6, cross_rect.y + 2))
         
         # Отрисовка UI элементов
@@ -156,8 +160,7 @@ class MenuSystem:
             if element_data.get('frame', True):
                 pygame.draw.rect(screen, (120, 120, 140), button_rect, 2)
             
-            font = pygame.font.Font(None, 20)
-            text_surface = font.render(text, True, (255, 255, 255))
+            text_surface = self.font_manager.render(text, 20, (255, 255, 255))
             text_x = pos[0] + (size[0] - text_surface.get_width()) // 2
             text_y = pos[1] + (size[1] - text_surface.get_height()) // 2
             screen.blit(text_surface, (text_x, text_y))
@@ -170,8 +173,7 @@ class MenuSystem:
             
             text_size = element_data.get('text_size', 20)
             
-            font = pygame.font.Font(None, text_size)
-            text_surface = font.render(text, True, (255, 255, 255))
+            text_surface = self.font_manager.render(text, text_size, (255, 255, 255))
             screen.blit(text_surface, (pos[0], pos[1]))
         
         elif element_type == 'icon':
@@ -179,10 +181,8 @@ class MenuSystem:
             icon_size = element_data.get('icon_size', [64, 64])
             
             if texture_name:
-                texture_path = os.path.join("game", "textures", texture_name)
-                if os.path.exists(texture_path):
-                    texture = pygame.image.load(texture_path).convert_alpha()
-                    texture = pygame.transform.scale(texture, (icon_size[0], icon_size[1]))
+                texture = self.texture_manager.get(texture_name, icon_size)
+                if texture:
                     screen.blit(texture, (pos[0], pos[1]))
             
             if element_data.get('frame', True):
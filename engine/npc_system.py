@@ -1,16 +1,19 @@
 import pygame
-import os
-import yaml
-import time
 import math
+from .font_manager import get_shared_font_manager
+from .texture_manager import get_shared_texture_manager
+from .spatial_index import SpatialGrid, PointGrid
+from .content import YamlContent
+from .event_bus import DialogOpened
 
 class NPC:
-    def __init__(self, data, spawn_x=0, spawn_y=0):
+    def __init__(self, data, spawn_x, spawn_y, texture_manager):
         self.name = data.get('name', 'Unknown NPC')
         self.id = data.get('id', 0)
         self.texture_name = data.get('texture')
         self.npc_data = data.get('npc', {})
         self.texture = None
+        self.texture_manager = texture_manager
         self.position = [spawn_x, spawn_y]
         
         # World size для масштабирования текстуры
@@ -28,18 +31,14 @@ class NPC:
         self.current_dialog = None
         self.dialog_index = 0
         self.char_index = 0
-        self.last_char_time = 0
+        self.char_timer = 0.0  # игровое время с последнего показанного символа
         self.base_char_delay = 0.05
         self.char_delay = self.base_char_delay
         self.show_buttons = False
         
     def load_texture(self):
         if self.texture_name:
-            texture_path = os.path.join("game", "textures", self.texture_name)
-            if os.path.exists(texture_path):
-                self.texture = pygame.image.load(texture_path).convert_alpha()
-                self.texture = pygame.transform.scale(self.texture, 
-                                                    (self.world_size[0], self.world_size[1]))
+            self.texture = self.texture_manager.load(self.texture_name, self.world_size)
     
     def check_interaction(self, player_position):
         """Проверяет, может ли игрок взаимодействовать с NPC"""
@@ -53,7 +52,7 @@ class NPC:
         self.current_dialog = self.npc_data.get('dialog')
         self.dialog_index = 0
         self.char_index = 0
-        self.last_char_time = time.time()
+        self.char_timer = 0.0
         self.show_buttons = False
         self.show_interact_prompt = False
         
@@ -78,8 +77,8 @@ class NPC:
         elif speed_level == 4:
             self.char_delay = 0
     
-    def update_dialog(self):
-        """Обновляет анимацию текста диалога"""
+    def update_dialog(self, delta_time):
+        """Обновляет анимацию текста диалога по игровому времени тика"""
         if not self.current_dialog or self.show_buttons:
             return
         
@@ -94,8 +93,8 @@ class NPC:
                 self.show_buttons = True
             return
         
-        current_time = time.time()
-        if current_time - self.last_char_time >= self.char_delay:
+        self.char_timer += delta_time
+        if self.char_timer >= self.char_delay:
             messages = self.current_dialog.get('message', [])
             if self.dialog_index < len(messages):
                 current_message = messages[self.dialog_index]
@@ -103,13 +102,19 @@ class NPC:
                     current_message = "\n".join(current_message)
                 
                 if self.char_index < len(current_message):
-                    self.char_index += 1
-                    self.last_char_time = current_time
+                    # За длинный тик может появиться несколько символов
+                    steps = int(self.char_timer / self.char_delay)
+                    self.char_index = min(len(current_message), self.char_index + steps)
+                    self.char_timer -= steps * self.char_delay
                 else:
                     self.show_buttons = True
     
     def get_current_text(self):
         """Возвращает текущий текст с анимацией"""
+        return self.get_full_text()[:self.char_index]
+    
+    def get_full_text(self):
+        """Текущее сообщение целиком, без учета анимации"""
         if not self.current_dialog:
             return ""
         
@@ -119,9 +124,8 @@ class NPC:
             
             # Если сообщение - список строк (многострочный диалог)
             if isinstance(current_message, list):
-                return "\n".join(current_message)[:self.char_index]
-            else:
-                return current_message[:self.char_index]
+                return "\n".join(current_message)
+            return str(current_message)
         return ""
     
     def handle_button_click(self, button_key, script_runner):
@@ -133,13 +137,12 @@ class NPC:
         if button_key in buttons:
             button_data = buttons[button_key]
             
-            # Выполняем скрипт кнопки
+            # Выполняем скрипт кнопки; @close закрывает диалог, команды после него не выполняются
             script = button_data.get('script', [])
-            for command in script:
-                if command == "@close":
-                    return False
-                else:
-                    script_runner.execute_command(command)
+            if "@close" in script:
+                script_runner.execute_block(script[:script.index("@close")], "dialog script")
+                return False
+            script_runner.execute_block(script, "dialog script")
             
             if button_data.get('nextdialog', False):
                 next_dialog = button_data.get('dialog')
@@ -147,6 +150,7 @@ class NPC:
                     self.current_dialog = next_dialog
                     self.dialog_index = 0
                     self.char_index = 0
+                    self.char_timer = 0.0
                     self.show_buttons = False
                     
                     # Устанавливаем скорость для следующего диалога
@@ -158,7 +162,23 @@ class NPC:
             return False
         return True
     
-    def render(self, screen, camera_offset):
+    def get_world_rect(self, font_manager):
+        """Мировые границы NPC вместе с именем и подсказкой"""
+        x, y = int(self.position[0]), int(self.position[1])
+        width, height = self.texture.get_size() if self.texture else (1, 1)
+        rect = pygame.Rect(x - width//2, y - height//2, width, height)
+        
+        name_width = font_manager.render(self.name, 16, (255, 255, 255)).get_width()
+        prompt_width = font_manager.render("Press E to talk", 20, (255, 255, 0)).get_width()
+        label_width = max(name_width, prompt_width)
+        label_y = y - self.world_size[1]//2 - 40
+        return rect.union(pygame.Rect(x - label_width//2 - 1, label_y, label_width + 2, 40))
+    
+    def get_screen_rect(self, camera_offset, font_manager):
+        """Область экрана под NPC вместе с именем и подсказкой"""
+        return self.get_world_rect(font_manager).move(-camera_offset[0], -camera_offset[1])
+    
+    def render(self, screen, camera_offset, font_manager):
         """Отрисовывает NPC"""
         if not self.texture:
             return
@@ -169,42 +189,38 @@ class NPC:
         screen.blit(self.texture, (render_x, render_y))
         
         # Имя NPC
-        font = pygame.font.Font(None, 16)
-        name_text = font.render(self.name, True, (255, 255, 255))
+        name_text = font_manager.render(self.name, 16, (255, 255, 255))
         name_x = self.position[0] - name_text.get_width()//2 - camera_offset[0]
         name_y = self.position[1] - self.world_size[1]//2 - 20 - camera_offset[1]
         screen.blit(name_text, (name_x, name_y))
         
         # Подсказка взаимодействия
         if self.show_interact_prompt:
-            prompt_font = pygame.font.Font(None, 20)
-            prompt_text = prompt_font.render("Press E to talk", True, (255, 255, 0))
+            prompt_text = font_manager.render("Press E to talk", 20, (255, 255, 0))
             prompt_x = self.position[0] - prompt_text.get_width()//2 - camera_offset[0]
             prompt_y = name_y - 20
             screen.blit(prompt_text, (prompt_x, prompt_y))
 
 class NPCSystem:
-    def __init__(self, script_runner):
+    def __init__(self, script_runner, font_manager=None, texture_manager=None, content=None):
         self.npcs = []
         self.npc_templates = {}
         self.script_runner = script_runner
+        self.font_manager = font_manager or get_shared_font_manager()
+        self.texture_manager = texture_manager or get_shared_texture_manager()
+        self.content = content or YamlContent()
+        self.grid = SpatialGrid()  # индекс для отсечения по камере
+        self.actor_grid = PointGrid()  # индекс позиций для проверки взаимодействия
+        self.interactable = set()  # NPC, рядом с которыми был игрок
+        self.max_interaction_range = 0
+        self.render_stats = {'drawn': 0, 'culled': 0}
         self.active_npc = None
+        self.last_player_position = None  # позиция, для которой посчитаны подсказки
+        self.event_bus = None
         self.load_npc_templates()
     
     def load_npc_templates(self):
-        npcs_path = os.path.join("game", "npcs")
-        if os.path.exists(npcs_path):
-            for npc_file in os.listdir(npcs_path):
-                if npc_file.endswith(".yaml"):
-                    file_path = os.path.join(npcs_path, npc_file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as file:
-                            npc_data = yaml.safe_load(file)
-                            npc_id = npc_data.get('id')
-                            if npc_id is not None:
-                                self.npc_templates[npc_id] = npc_data
-                    except Exception as e:
-                        print(f"Error loading NPC template {npc_file}: {e}")
+        self.npc_templates = self.content.templates('npcs')
     
     def spawn_npc(self, npc_id, x, y, initialize=True):
         if npc_id not in self.npc_templates:
@@ -212,9 +228,17 @@ class NPCSystem:
             return None
         
         if initialize:
-            npc_data = self.npc_templates[npc_id].copy()
-            npc = NPC(npc_data, x, y)
+            template = self.npc_templates.get(npc_id)
+            if template is None:
+                return None
+            npc_data = template.copy()
+            npc = NPC(npc_data, x, y, self.texture_manager)
+            npc.spawn_index = len(self.npcs)
             self.npcs.append(npc)
+            self.grid.insert(npc, npc.get_world_rect(self.font_manager))
+            self.actor_grid.insert(npc, npc.position[0], npc.position[1])
+            self.max_interaction_range = max(self.max_interaction_range, npc.interaction_range)
+            self.last_player_position = None
             return npc
         else:
             return {"id": npc_id, "x": x, "y": y, "initialized": False}
@@ -222,33 +246,61 @@ class NPCSystem:
     def clear_npcs(self):
         """Очищает всех NPC"""
         self.npcs.clear()
+        self.clear_index()
         self.active_npc = None
     
-    def update(self, player_position):
+    def clear_index(self):
+        """Очищает пространственные индексы NPC"""
+        self.grid.clear()
+        self.actor_grid.clear()
+        self.interactable.clear()
+        self.max_interaction_range = 0
+        self.last_player_position = None
+    
+    def update(self, player_position, delta_time=1/60):
         """Обновляет взаимодействие и анимацию диалога"""
-        # Проверяем взаимодействие со всеми NPC
-        for npc in self.npcs:
-            npc.show_interact_prompt = npc.check_interaction(player_position)
+        # Подсказки меняются, только если игрок сдвинулся, NPC заспавнились или открылся диалог
+        if player_position != self.last_player_position:
+            self.last_player_position = list(player_position)
+            self.update_prompts(player_position)
         
         # Обновляем анимацию диалога активного NPC
         if self.active_npc:
-            self.active_npc.update_dialog()
+            self.active_npc.update_dialog(delta_time)
+    
+    def update_prompts(self, player_position):
+        """Пересчитывает подсказки взаимодействия"""
+        # Проверяем только NPC рядом с игроком и тех, у кого горит подсказка
+        nearby = self.actor_grid.query_radius(player_position[0], player_position[1], self.max_interaction_range)
+        for npc in self.interactable.union(nearby):
+            npc.show_interact_prompt = npc.check_interaction(player_position)
+            if npc.can_interact:
+                self.interactable.add(npc)
+            else:
+                self.interactable.discard(npc)
     
     def handle_interaction(self):
         """Обрабатывает нажатие E для взаимодействия"""
-        for npc in self.npcs:
+        for npc in sorted(self.interactable, key=lambda npc: npc.spawn_index):
             if npc.can_interact and not self.active_npc:
                 if npc.start_dialog():
-                    self.active_npc = npc
+                    self.open_dialog(npc)
                     return True
         return False
     
+    def open_dialog(self, npc):
+        """Делает NPC активным и сообщает об открытом диалоге"""
+        self.active_npc = npc
+        self.last_player_position = None  # start_dialog прячет подсказку
+        if self.event_bus:
+            self.event_bus.emit(DialogOpened(npc.id))
+    
     def start_dialog(self, npc_id):
         """Начинает диалог с NPC по ID"""
         for npc in self.npcs:
             if npc.id == npc_id:
                 if npc.start_dialog():
-                    self.active_npc = npc
+                    self.open_dialog(npc)
                     return True
         return False
     
@@ -287,10 +339,35 @@ class NPCSystem:
         
         return False
     
-    def render(self, screen, camera_offset):
-        """Отрисовывает всех NPC"""
-        for npc in self.npcs:
-            npc.render(screen, camera_offset)
+    def get_visible(self, visible_rect):
+        """NPC в видимой области в порядке появления"""
+        visible = self.grid.query_rect(visible_rect)
+        visible.sort(key=lambda npc: npc.spawn_index)
+        return visible
+    
+    def render(self, screen, camera_offset, visible_rect=None):
+        """Отрисовывает видимых NPC"""
+        if visible_rect is None:
+            visible_rect = pygame.Rect(camera_offset, screen.get_size())
+        
+        visible = self.get_visible(visible_rect)
+        for npc in visible:
+            npc.render(screen, camera_offset, self.font_manager)
+        
+        self.render_stats['drawn'] = len(visible)
+        self.render_stats['culled'] = len(self.npcs) - len(visible)
+    
+    def mark_dirty_rects(self, presenter, camera_offset, visible_rect):
+        """Сообщает презентеру области NPC и диалога"""
+        for npc in self.grid.query_rect(visible_rect):
+            if npc.texture:
+                presenter.mark(('npc', id(npc)), npc.get_screen_rect(camera_offset, self.font_manager),
+                               npc.show_interact_prompt)
+        
+        if self.active_npc:
+            presenter.mark('dialog', (150, 280, 500, 180),
+                           (id(self.active_npc), id(self.active_npc.current_dialog),
+                            self.active_npc.char_index, self.active_npc.show_buttons))
     
     def render_dialog(self, screen):
         """Отрисовывает диалог активного NPC"""
@@ -309,26 +386,34 @@ class NPCSystem:
         pygame.draw.rect(screen, (100, 100, 120), dialog_rect, 2)
         
         # Имя NPC
-        title_font = pygame.font.Font(None, 24)
-        title_text = title_font.render(self.active_npc.name, True, (255, 215, 0))
+        title_text = self.font_manager.render(self.active_npc.name, 24, (255, 215, 0))
         screen.blit(title_text, (dialog_x + 10, dialog_y + 10))
         
-        # Текст диалога
-        text_font = pygame.font.Font(None, 20)
-        dialog_text = self.active_npc.get_current_text()
-        
-        # Разделяем на строки
-        lines = []
-        if isinstance(dialog_text, str):
-            lines = dialog_text.split('\n')
+        # Текст диалога: в кэш попадают только целые строки, набираемая строка
+        # рисуется обрезкой целой, чтобы каждый кадр анимации не занимал место в LRU
+        remaining = self.active_npc.char_index
         
         # Отрисовка строк текста
         text_x = dialog_x + 10
         text_y = dialog_y + 40
         
-        for i, line in enumerate(lines):
-            if line.strip():
-                text_surface = text_font.render(line, True, (255, 255, 255))
+        for i, line in enumerate(self.active_npc.get_full_text().split('\n')):
+            if remaining <= 0:
+                break
+            visible = line[:remaining]
+            remaining -= len(line) + 1
+            if not visible.strip():
+                continue
+            
+            text_surface = self.font_manager.render(line, 20, (255, 255, 255))
+            if len(visible) < len(line):
+                # Обрезаем там, где в целой строке начинается следующая буква
+                font = self.font_manager.get_font(20)
+                next_char = line[len(visible)]
+                visible_width = font.size(visible + next_char)[0] - font.size(next_char)[0]
+                screen.blit(text_surface, (text_x, text_y + i * 25),
+                            pygame.Rect(0, 0, visible_width, text_surface.get_height()))
+            else:
                 screen.blit(text_surface, (text_x, text_y + i * 25))
         
         # Кнопки справа от текста
@@ -356,7 +441,7 @@ class NPCSystem:
                 
                 # Текст кнопки
                 button_text = button_data.get('text', 'Button')
-                text_surface = text_font.render(button_text, True, (255, 255, 255))
+                text_surface = self.font_manager.render(button_text, 20, (255, 255, 255))
                 text_x = button_rect.x + (button_width - text_surface.get_width()) // 2
                 text_y = button_rect.y + (button_height - text_surface.get_height()) // 2
                 screen.blit(text_surface, (text_x, text_y))
\ No newline at end of file
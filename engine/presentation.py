@@ -0,0 +1,106 @@
+import pygame
+
+class DirtyRectPresenter:
+    def __init__(self, screen_size, enabled=False):
+        self.screen_rect = pygame.Rect(0, 0, screen_size[0], screen_size[1])
+        self.enabled = enabled
+        self.previous = {}  # ключ -> (rect, signature) прошлого кадра
+        self.current = {}
+        self.force_full = True
+        self.last_camera_offset = None
+        self.dirty_rects = []
+        self.stats = {
+            'frames': 0,
+            'full_frames': 0,
+            'skipped_frames': 0,
+            'dirty_area': 0,
+            'screen_area': 0,
+            'last_dirty_area': 0
+        }
+    
+    def begin_frame(self, camera_offset):
+        """Начинает кадр; сдвиг камеры меняет весь экран"""
+        self.current = {}
+        if camera_offset != self.last_camera_offset:
+            self.force_full = True
+            self.last_camera_offset = camera_offset
+    
+    def mark(self, key, rect, signature=None):
+        """Регистрирует элемент кадра. rect=None - при изменении перерисовать весь экран"""
+        self.current[key] = (pygame.Rect(rect) if rect is not None else None, signature)
+    
+    def invalidate_all(self):
+        """Следующий кадр выводится целиком"""
+        self.force_full = True
+    
+    def needs_redraw(self):
+        """Считает измененные области. False - кадр не изменился и его можно не рисовать"""
+        if not self.enabled:
+            return True
+        
+        self.dirty_rects = []
+        if not self.force_full:
+            for key, (rect, signature) in self.current.items():
+                previous = self.previous.get(key)
+                if previous == (rect, signature):
+                    continue
+                if rect is None or (previous and previous[0] is None):
+                    self.force_full = True
+                    break
+                self.dirty_rects.append(rect)
+                if previous:
+                    self.dirty_rects.append(previous[0])
+        
+        if not self.force_full:
+            for key, (rect, signature) in self.previous.items():
+                if key in self.current:
+                    continue
+                if rect is None:
+                    self.force_full = True
+                    break
+                self.dirty_rects.append(rect)
+        
+        if self.force_full or self.dirty_rects:
+            return True
+        
+        # Ничего не поменялось - кадр остается на экране
+        self.previous = self.current
+        self.stats['frames'] += 1
+        self.stats['skipped_frames'] += 1
+        self.stats['screen_area'] += self.screen_rect.width * self.screen_rect.height
+        self.stats['last_dirty_area'] = 0
+        return False
+    
+    def present(self):
+        """Выводит кадр: flip целиком или update только измененных областей"""
+        screen_area = self.screen_rect.width * self.screen_rect.height
+        self.stats['frames'] += 1
+        self.stats['screen_area'] += screen_area
+        
+        if not self.enabled or self.force_full:
+            pygame.display.flip()
+            self.stats['full_frames'] += 1
+            dirty_area = screen_area
+        else:
+            rects = [rect.clip(self.screen_rect) for rect in self.dirty_rects]
+            rects = [rect for rect in rects if rect.width and rect.height]
+            pygame.display.update(rects)
+            dirty_area = min(screen_area, sum(rect.width * rect.height for rect in rects))
+        
+        self.stats['dirty_area'] += dirty_area
+        self.stats['last_dirty_area'] = dirty_area
+        self.previous = self.current
+        self.force_full = False
+    
+    def get_stats(self):
+        """Возвращает статистику: площадь измененных областей против полного экрана"""
+        screen_area = self.stats['screen_area']
+        return {
+            'enabled': self.enabled,
+            'frames': self.stats['frames'],
+            'full_frames': self.stats['full_frames'],
+            'skipped_frames': self.stats['skipped_frames'],
+            'last_dirty_area': self.stats['last_dirty_area'],
+            'screen_area': self.screen_rect.width * self.screen_rect.height,
+            'dirty_ratio': self.stats['dirty_area'] / screen_area if screen_area else 0.0
+        }
\ No newline at end of file
@@ -0,0 +1,204 @@
+import pygame
+import json
+import time
+from collections import deque
+
+class NullScope:
+    """Пустой scope для выключенного профайлера - почти ничего не стоит"""
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NULL_SCOPE = NullScope()
+
+class ProfileScope:
+    __slots__ = ('profiler', 'name', 'start')
+    
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+class Profiler:
+    def __init__(self, enabled=False, window=300, trace_limit=200000):
+        self.enabled = enabled
+        self.window = window  # сколько последних замеров держим для перцентилей
+        self.samples = {}  # имя scope -> deque длительностей за кадр (сек)
+        self.frame_totals = {}  # имя scope -> сумма за текущий кадр
+        self.frame_times = deque(maxlen=window)
+        self.frame_start = time.perf_counter()
+        self.show_overlay = False
+        
+        # Chrome trace events
+        self.tracing = False
+        self.trace_events = []
+        self.trace_limit = trace_limit
+        self.trace_origin = 0.0
+        
+        self.overlay_lines = []
+        self.overlay_counter = 0
+    
+    def scope(self, name):
+        """Контекстный менеджер замера: with profiler.scope('entities.update'): ..."""
+        if not self.enabled:
+            return NULL_SCOPE
+        return ProfileScope(self, name)
+    
+    def record(self, name, start, end):
+        self.frame_totals[name] = self.frame_totals.get(name, 0.0) + (end - start)
+        if self.tracing and len(self.trace_events) < self.trace_limit:
+            self.trace_events.append({
+                'name': name,
+                'cat': name.split('.')[0],
+                'ph': 'X',
+                'ts': (start - self.trace_origin) * 1000000,
+                'dur': (end - start) * 1000000,
+                'pid': 1,
+                'tid': 1
+            })
+    
+    def end_frame(self):
+        """Закрывает кадр: время кадра и суммы scope попадают в скользящее окно"""
+        now = time.perf_counter()
+        if not self.enabled:
+            self.frame_start = now
+            return
+        
+        self.frame_times.append(now - self.frame_start)
+        if self.tracing and len(self.trace_events) < self.trace_limit:
+            self.trace_events.append({
+                'name': 'frame',
+                'cat': 'frame',
+                'ph': 'X',
+                'ts': (self.frame_start - self.trace_origin) * 1000000,
+                'dur': (now - self.frame_start) * 1000000,
+                'pid': 1,
+                'tid': 0
+            })
+        self.frame_start = now
+        
+        for name, total in self.frame_totals.items():
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(total)
+        self.frame_totals = {}
+    
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.frame_totals = {}
+        self.frame_start = time.perf_counter()
+    
+    def toggle_overlay(self):
+        """Показывает/прячет график; профайлер включается вместе с ним"""
+        self.show_overlay = not self.show_overlay
+        if self.show_overlay and not self.enabled:
+            self.set_enabled(True)
+    
+    def start_trace(self):
+        """Начинает запись trace events"""
+        if not self.enabled:
+            self.set_enabled(True)
+        self.tracing = True
+        self.trace_events = []
+        self.trace_origin = time.perf_counter()
+    
+    def stop_trace(self, file_path=None):
+        """Останавливает запись; если задан путь - сохраняет trace"""
+        self.tracing = False
+        if file_path:
+            return self.export_trace(file_path)
+        return None
+    
+    def export_trace(self, file_path):
+        """Сохраняет Chrome trace-event JSON (chrome://tracing, Perfetto)"""
+        trace = {
+            'traceEvents': [
+                {'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'TimeEngine'}},
+                {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 0, 'args': {'name': 'frames'}},
+                {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': 'main'}}
+            ] + self.trace_events,
+            'displayTimeUnit': 'ms'
+        }
+        try:
+            with open(file_path, 'w', encoding='utf-8') as file:
+                json.dump(trace, file)
+            print(f"Profiler trace saved to {file_path} ({len(self.trace_events)} events)")
+            return file_path
+        except Exception as e:
+            print(f"Error saving profiler trace: {e}")
+            return None
+    
+    def get_percentiles(self, samples):
+        """p50/p95/p99 в миллисекундах"""
+        if not samples:
+            return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+        ordered = sorted(samples)
+        last = len(ordered) - 1
+        return {
+            'p50': ordered[min(last, int(len(ordered) * 0.50))] * 1000,
+            'p95': ordered[min(last, int(len(ordered) * 0.95))] * 1000,
+            'p99': ordered[min(last, int(len(ordered) * 0.99))] * 1000
+        }
+    
+    def get_stats(self):
+        """Скользящие перцентили времени кадра и каждого scope"""
+        stats = {'frame': self.get_percentiles(self.frame_times)}
+        for name, samples in self.samples.items():
+            stats[name] = self.get_percentiles(samples)
+        return stats
+    
+    def render_overlay(self, screen, font_manager, rect=(10, 110, 300, 200)):
+        """График времени кадров и самые дорогие scope по p95"""
+        if not self.show_overlay:
+            return
+        
+        rect = pygame.Rect(rect)
+        background = pygame.Surface(rect.size, pygame.SRCALPHA)
+        background.fill((0, 0, 0, 170))
+        screen.blit(background, rect.topleft)
+        
+        # График: столбец на кадр, линии 16.7 и 33.3 мс
+        graph_height = 80
+        graph_bottom = rect.top + graph_height
+        scale = graph_height / 33.3
+        for budget, color in ((16.7, (0, 160, 0)), (33.3, (160, 0, 0))):
+            y = graph_bottom - int(budget * scale)
+            pygame.draw.line(screen, color, (rect.left, y), (rect.right - 1, y))
+        
+        frames = list(self.frame_times)[-rect.width:]
+        x = rect.right - len(frames)
+        for frame_time in frames:
+            ms = frame_time * 1000
+            height = min(graph_height, int(ms * scale))
+            color = (0, 220, 0) if ms <= 16.7 else (230, 200, 0) if ms <= 33.3 else (230, 0, 0)
+            pygame.draw.line(screen, color, (x, graph_bottom), (x, graph_bottom - height))
+            x += 1
+        
+        # Текст пересчитываем раз в 30 кадров
+        self.overlay_counter += 1
+        if self.overlay_counter >= 30 or not self.overlay_lines:
+            self.overlay_counter = 0
+            stats = self.get_stats()
+            frame = stats.pop('frame')
+            self.overlay_lines = [f"frame p50 {frame['p50']:.1f} p95 {frame['p95']:.1f} p99 {frame['p99']:.1f} ms"]
+            slowest = sorted(stats.items(), key=lambda item: item[1]['p95'], reverse=True)
+            for name, values in slowest[:7]:
+                self.overlay_lines.append(f"{name}: {values['p50']:.2f} / {values['p95']:.2f} / {values['p99']:.2f}")
+            if self.tracing:
+                self.overlay_lines.append(f"tracing: {len(self.trace_events)} events")
+        
+        y = graph_bottom + 4
+        for line in self.overlay_lines:
+            text = font_manager.render(line, 16, (230, 230, 230))
+            screen.blit(text, (rect.left + 4, y))
+            y += 13
\ No newline at end of file
@@ -0,0 +1,76 @@
+import re
+from collections import namedtuple
+
+# Задача квеста: вид, цель (id врага и т.п.), сколько нужно, отображаемое имя цели
+QuestTask = namedtuple('QuestTask', ['kind', 'target', 'required', 'name'])
+
+# Награда квеста: вид, цель (id предмета/значения или None), количество, отображаемое имя цели
+QuestReward = namedtuple('QuestReward', ['kind', 'target', 'amount', 'name'])
+
+# Разобранный квест; errors - QuestSpecError строк, которые не удалось разобрать
+QuestSpec = namedtuple('QuestSpec', ['tasks', 'rewards', 'errors'])
+
+class QuestSpecError(Exception):
+    def __init__(self, text, message):
+        super().__init__(f"{message} ({text})")
+        self.text = text
+        self.message = message
+    
+    def __reduce__(self):
+        return (QuestSpecError, (self.text, self.message))
+
+# Виды задач и наград: префикс строки -> (вид, шаблон, разбор групп в (цель, число))
+TASK_KINDS = {}
+REWARD_KINDS = {}
+
+def register_task_kind(prefix, kind, pattern, decode):
+    """Добавляет вид задачи: '!quest_kill(0, 5)' -> QuestTask('kill', 0, 5, None)"""
+    TASK_KINDS[prefix] = (kind, re.compile(pattern), decode)
+
+def register_reward_kind(prefix, kind, pattern, decode):
+    """Добавляет вид награды: '!quest_reward_value(0, 50)' -> QuestReward('value', 0, 50, None)"""
+    REWARD_KINDS[prefix] = (kind, re.compile(pattern), decode)
+
+register_task_kind('!quest_kill', 'kill', r'!quest_kill\((\d+),\s*(\d+)\)',
+                   lambda m: (int(m.group(1)), int(m.group(2))))
+
+register_reward_kind('!quest_reward_addmaxhealth', 'addmaxhealth', r'!quest_reward_addmaxhealth\((\d+)\)',
+                     lambda m: (None, int(m.group(1))))
+register_reward_kind('!quest_reward_giveitem', 'giveitem', r'!quest_reward_giveitem\((\d+)\)',
+                     lambda m: (int(m.group(1)), 1))
+register_reward_kind('!quest_reward_value', 'value', r'!quest_reward_value\((\d+),\s*([^)]+)\)',
+                     lambda m: (int(m.group(1)), int(m.group(2))))
+
+def compile_entry(text, kinds):
+    """(вид, цель, число) одной строки по таблице видов"""
+    text = str(text).strip()
+    prefix = text.split('(', 1)[0]
+    if prefix not in kinds:
+        raise ValueError("unknown kind")
+    kind, pattern, decode = kinds[prefix]
+    match = pattern.search(text)
+    if not match:
+        raise ValueError(f"bad arguments for {prefix}")
+    return (kind,) + decode(match)
+
+def compile_quest(quest):
+    """Разбирает quest_task и quest_reward один раз; имена целей заполняются позже"""
+    tasks = []
+    rewards = []
+    errors = []
+    
+    for text in quest.get('quest_task', []) or []:
+        try:
+            kind, target, required = compile_entry(text, TASK_KINDS)
+            tasks.append(QuestTask(kind, target, required, None))
+        except ValueError as e:
+            errors.append(QuestSpecError(text, str(e)))
+    
+    for text in quest.get('quest_reward', []) or []:
+        try:
+            kind, target, amount = compile_entry(text, REWARD_KINDS)
+            rewards.append(QuestReward(kind, target, amount, None))
+        except ValueError as e:
+            errors.append(QuestSpecError(text, str(e)))
+    
+    return QuestSpec(tuple(tasks), tuple(rewards), errors)
\ No newline at end of file
@@ -1,10 +1,12 @@
 import pygame
-import os
-import yaml
-import re
+from .font_manager import get_shared_font_manager
+from .content import YamlContent
+from .event_bus import EntityKilled, QuestGiven, QuestCancelled
+from .quest_specs import compile_quest
 
 class QuestSystem:
-    def __init__(self, entity_manager, inventory, health_system, item_loader, localization, script_runner, value_system):
+    def __init__(self, entity_manager, inventory, health_system, item_loader, localization, script_runner, value_system,
+                 font_manager=None, content=None):
         self.entity_manager = entity_manager
         self.inventory = inventory
         self.health_system = health_system
@@ -12,54 +14,124 @@ class QuestSystem:
         self.localization = localization
         self.script_runner = script_runner
         self.value_system = value_system
+        self.font_manager = font_manager or get_shared_font_manager()
+        self.content = content or YamlContent()
+        self.hud = None
         self.quests = {}
+        self.packed_specs = {}  # quest_id -> QuestSpec из пака, имена целей еще не заполнены
+        self.quest_specs = {}  # quest_id -> QuestSpec с заполненными именами целей
         self.active_quests = {}
         self.completed_quests = set()
         self.kill_counter = {}  # Счетчик убийств по ID врагов
         self.quest_progress = {}  # Отдельный прогресс для каждого квеста
+        self.pending_completion = set()  # квесты, у которых не осталось невыполненных задач
+        self.task_index = {}  # (вид, цель) -> {(quest_id, task_id): прогресс задачи} для невыполненных задач
+        self.event_bus = None
+        
+        # Имена целей по виду задачи/награды; новые виды добавляются сюда и в quest_specs
+        self.target_names = {
+            'kill': self.get_enemy_name,
+            'giveitem': self.get_item_name,
+            'value': self.get_value_name
+        }
+        self.task_texts = {
+            'kill': lambda task: f"{self.localization.get('quest_kill')} {task.name}"
+        }
+        self.reward_handlers = {
+            'addmaxhealth': self.reward_add_max_health,
+            'giveitem': self.reward_give_item,
+            'value': self.reward_value
+        }
+        self.reward_texts = {
+            'addmaxhealth': lambda reward: f"+{reward.amount} {self.localization.get('max_health')}",
+            'giveitem': lambda reward: f"Get {reward.name}",
+            'value': lambda reward: f"+{reward.amount} {reward.name}"
+        }
         self.load_quests()
     
     def load_quests(self):
-        quests_path = os.path.join("game", "quests")
-        if os.path.exists(quests_path):
-            for quest_file in os.listdir(quests_path):
-                if quest_file.endswith(".yaml"):
-                    file_path = os.path.join(quests_path, quest_file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as file:
-                            quest_data = yaml.safe_load(file)
-                            quest_id = quest_data.get('id')
-                            if quest_id is not None:
-                                self.quests[quest_id] = quest_data
-                    except Exception as e:
-                        print(f"Error loading quest {quest_file}: {e}")
+        self.quests = self.content.templates('quests')
+        
+        # Пак уже содержит разобранные задачи и награды
+        self.packed_specs = self.content.get_resolved('quest_specs') or {}
+        self.quest_specs = {}
+    
+    def set_event_bus(self, event_bus):
+        """Прогресс обновляется по убийствам, завершение проверяется в конце тика"""
+        self.event_bus = event_bus
+        event_bus.subscribe(EntityKilled, self.on_entity_killed)
+        event_bus.subscribe(EntityKilled, self.on_progress_changed, deferred=True)
+        event_bus.subscribe(QuestGiven, self.on_progress_changed, deferred=True)
+    
+    def on_entity_killed(self, event):
+        self.register_kill(event.entity_id)
+    
+    def on_progress_changed(self, event):
+        self.update_quests()
+    
+    def get_quest_spec(self, quest_id):
+        """Задачи и награды квеста; разбираются и получают имена один раз"""
+        spec = self.quest_specs.get(quest_id)
+        if spec is None:
+            quest = self.quests[quest_id]
+            spec = self.packed_specs.get(quest_id) or compile_quest(quest)
+            for error in spec.errors:
+                print(f"Error in quest '{quest.get('name')}': {error}")
+            spec = spec._replace(tasks=tuple(self.resolve_name(task) for task in spec.tasks),
+                                 rewards=tuple(self.resolve_name(reward) for reward in spec.rewards))
+            self.quest_specs[quest_id] = spec
+        return spec
+    
+    def resolve_name(self, entry):
+        resolver = self.target_names.get(entry.kind)
+        if resolver is None:
+            return entry
+        return entry._replace(name=resolver(entry.target))
+    
+    def get_enemy_name(self, enemy_id):
+        enemy_template = self.entity_manager.enemy_templates.get(enemy_id)
+        if enemy_template:
+            return enemy_template.get('name', f"Enemy {enemy_id}")
+        return f"Enemy {enemy_id}"
+    
+    def get_item_name(self, item_id):
+        item_data = self.item_loader.get_item(item_id)
+        return item_data.get('name', f"Item {item_id}") if item_data else f"Item {item_id}"
+    
+    def get_value_name(self, value_id):
+        if self.value_system and value_id in self.value_system.values:
+            return self.value_system.values[value_id]['name']
+        return f"Value {value_id}"
+    
+    def get_task_text(self, task_info):
+        """Строка задачи с прогрессом для лога и деталей квеста"""
+        task = task_info['task']
+        describe = self.task_texts.get(task.kind)
+        text = describe(task) if describe else task.kind
+        return f"{text} ({task_info['current']}/{task.required})"
+    
+    def get_reward_text(self, reward):
+        describe = self.reward_texts.get(reward.kind)
+        return describe(reward) if describe else reward.kind
     
     def give_quest(self, quest_id):
         """Выдает квест игроку, если он еще не активен"""
-        if quest_id in self.quests and quest_id not in self.active_quests:
+        if quest_id not in self.active_quests and self.quests.get(quest_id) is not None:
             # Сбрасываем прогресс при выдаче квеста
-            quest = self.quests[quest_id]
-            tasks = quest.get('quest_task', [])
-            task_progress = {}
-            
-            for i, task in enumerate(tasks):
-                if task.startswith('!quest_kill('):
-                    match = re.search(r'!quest_kill\((\d+),\s*(\d+)\)', task)
-                    if match:
-                        enemy_id = int(match.group(1))
-                        # Начинаем с 0, даже если враги уже убиты
-                        task_progress[i] = {
-                            'type': 'kill',
-                            'enemy_id': enemy_id,
-                            'required': int(match.group(2)),
-                            'current': 0  # Всегда начинаем с 0
-                        }
+            # Начинаем с 0, даже если враги уже убиты
+            task_progress = {i: {'task': task, 'current': 0} for i, task in enumerate(self.get_quest_spec(quest_id).tasks)}
             
             self.active_quests[quest_id] = {
                 'progress': task_progress,
+                'remaining': 0,  # сколько задач еще не выполнено
                 'completed': False
             }
+            self.index_quest(quest_id)
+            if self.hud:
+                self.hud.invalidate('quest_log')
             print(f"\033[34m[i] Quest '{self.quests[quest_id].get('name')}' started!\033[0m")
+            if self.event_bus:
+                self.event_bus.emit(QuestGiven(quest_id))
             return True
         
         # Если квест уже завершен, можно перезапустить его
@@ -76,111 +148,142 @@ class QuestSystem:
             quest_name = self.quests[quest_id].get('name', 'Unknown Quest')
             
             # Сбрасываем прогресс этого квеста
-            for task_id, task_info in self.active_quests[quest_id]['progress'].items():
-                if task_info['type'] == 'kill':
-                    # Не сбрасываем общий счетчик убийств, только прогресс квеста
-                    pass
-            
+            # Не сбрасываем общий счетчик убийств, только прогресс квеста
+            self.unindex_quest(quest_id)
             del self.active_quests[quest_id]
+            if self.hud:
+                self.hud.invalidate('quest_log')
             print(f"\033[34m[i] Quest '{quest_name}' canceled and progress reset!\033[0m")
+            if self.event_bus:
+                self.event_bus.emit(QuestCancelled(quest_id))
             return True
         return False
     
+    def index_quest(self, quest_id):
+        """Добавляет невыполненные задачи квеста в индекс задач и считает их"""
+        quest_data = self.active_quests[quest_id]
+        remaining = 0
+        for task_id, task_info in quest_data['progress'].items():
+            task = task_info['task']
+            if task_info['current'] < task.required:
+                remaining += 1
+                self.task_index.setdefault((task.kind, task.target), {})[(quest_id, task_id)] = task_info
+        quest_data['remaining'] = remaining
+        
+        # Квест без задач завершится при ближайшей проверке
+        if remaining == 0:
+            self.pending_completion.add(quest_id)
+    
+    def unindex_quest(self, quest_id):
+        """Убирает задачи квеста из индекса задач"""
+        self.pending_completion.discard(quest_id)
+        for task_id, task_info in self.active_quests[quest_id]['progress'].items():
+            task = task_info['task']
+            self.unindex_task((task.kind, task.target), quest_id, task_id)
+    
+    def unindex_task(self, key, quest_id, task_id):
+        records = self.task_index.get(key)
+        if records is not None:
+            records.pop((quest_id, task_id), None)
+            if not records:
+                del self.task_index[key]
+    
     def register_kill(self, enemy_id):
-        """Регистрирует убийство врага и обновляет прогресс квестов"""
+        """Регистрирует убийство врага и обновляет только задачи, которые ждут этого врага"""
         if enemy_id not in self.kill_counter:
             self.kill_counter[enemy_id] = 0
         self.kill_counter[enemy_id] += 1
-        
-        # Обновляем прогресс всех активных квестов
-        for quest_id, quest_data in self.active_quests.items():
-            if not quest_data['completed']:
-                self.update_quest_progress(quest_id, enemy_id)
+        self.advance_tasks('kill', enemy_id)
     
-    def update_quest_progress(self, quest_id, enemy_id):
-        quest_data = self.active_quests[quest_id]
+    def advance_tasks(self, kind, target, amount=1):
+        """Продвигает невыполненные задачи вида kind с целью target"""
+        records = self.task_index.get((kind, target))
+        if not records:
+            return
         
-        for task_id, task_info in quest_data['progress'].items():
-            if task_info['type'] == 'kill' and task_info['enemy_id'] == enemy_id:
-                # Увеличиваем прогресс, но не больше required
-                if task_info['current'] < task_info['required']:
-                    task_info['current'] += 1
-                
-                # Логируем прогресс
-                enemy_name = f"Enemy {enemy_id}"
-                enemy_template = self.entity_manager.enemy_templates.get(enemy_id)
-                if enemy_template:
-                    enemy_name = enemy_template.get('name', f"Enemy {enemy_id}")
-                
-                print(f"\033[34m[i] Quest progress: {enemy_name} ({task_info['current']}/{task_info['required']})\033[0m")
+        for (quest_id, task_id), task_info in list(records.items()):
+            task = task_info['task']
+            task_info['current'] = min(task.required, task_info['current'] + amount)
+            if task_info['current'] >= task.required:
+                # Выполненная задача больше не ждет событий
+                self.unindex_task((kind, target), quest_id, task_id)
+                quest_data = self.active_quests[quest_id]
+                quest_data['remaining'] -= 1
+                if quest_data['remaining'] == 0:
+                    self.pending_completion.add(quest_id)
+            
+            print(f"\033[34m[i] Quest progress: {task.name} ({task_info['current']}/{task.required})\033[0m")
+        
+        if self.hud:
+            self.hud.invalidate('quest_log')
     
     def update_quests(self):
-        for quest_id in list(self.active_quests.keys()):
-            quest_data = self.active_quests[quest_id]
-            if not quest_data['completed'] and self.check_quest_completion(quest_id):
+        """Завершает квесты, у которых не осталось невыполненных задач"""
+        if not self.pending_completion:
+            return
+        pending = self.pending_completion
+        self.pending_completion = set()
+        for quest_id in pending:
+            quest_data = self.active_quests.get(quest_id)
+            if quest_data and not quest_data['completed'] and self.check_quest_completion(quest_id):
                 self.complete_quest(quest_id)
     
     def check_quest_completion(self, quest_id):
-        quest_data = self.active_quests[quest_id]
-        
-        # Проверяем completion всех задач
-        all_tasks_completed = True
-        for task_info in quest_data['progress'].values():
-            if task_info['current'] < task_info['required']:
-                all_tasks_completed = False
-                break
-        
-        return all_tasks_completed
+        """Квест выполнен, когда счетчик невыполненных задач дошел до нуля"""
+        return self.active_quests[quest_id]['remaining'] == 0
     
     def complete_quest(self, quest_id):
         quest = self.quests.get(quest_id)
         if not quest:
             return
         
-        # Выдаем награды
-        rewards = quest.get('quest_reward', [])
-        for reward in rewards:
-            self.process_reward(reward)
+        # Выдаем награды одной транзакцией значений
+        rewards = self.get_quest_spec(quest_id).rewards
+        if self.value_system:
+            self.value_system.begin()
+        try:
+            for reward in rewards:
+                self.process_reward(reward)
+        finally:
+            if self.value_system:
+                self.value_system.commit()
         
         # Помечаем как завершенный
         self.completed_quests.add(quest_id)
         if quest_id in self.active_quests:
+            self.unindex_quest(quest_id)
             del self.active_quests[quest_id]
+            if self.hud:
+                self.hud.invalidate('quest_log')
         
         print(f"\033[34m[i] Quest '{quest.get('name')}' completed! Rewards given.\033[0m")
     
     def process_reward(self, reward):
-        if reward.startswith('!quest_reward_addmaxhealth('):
-            match = re.search(r'!quest_reward_addmaxhealth\((\d+)\)', reward)
-            if match:
-                amount = int(match.group(1))
-                self.health_system.max_health += amount
-                self.health_system.heal(amount)
-        
-        elif reward.startswith('!quest_reward_giveitem('):
-            match = re.search(r'!quest_reward_giveitem\((\d+)\)', reward)
-            if match:
-                item_id = int(match.group(1))
-                # Находим свободный слот
-                for slot in range(9):
-                    if not self.inventory.get_item(slot):
-                        self.inventory.give_item(item_id, slot)
-                        break
-        
-        elif reward.startswith('!quest_reward_value('):
-            match = re.search(r'!quest_reward_value\((\d+),\s*([^)]+)\)', reward)
-            if match:
-                value_id = int(match.group(1))
-                amount = int(match.group(2))
-                if self.value_system:
-                    self.value_system.add_value(value_id, amount)
-    
-    def render_quest_log(self, screen):
+        """Выдает одну награду QuestReward"""
+        handler = self.reward_handlers.get(reward.kind)
+        if handler:
+            handler(reward)
+    
+    def reward_add_max_health(self, reward):
+        self.health_system.max_health += reward.amount
+        self.health_system.heal(reward.amount)
+    
+    def reward_give_item(self, reward):
+        # Находим свободный слот
+        for slot in range(9):
+            if not self.inventory.get_item(slot):
+                self.inventory.give_item(reward.target, slot)
+                break
+    
+    def reward_value(self, reward):
+        if self.value_system:
+            self.value_system.add_value(reward.target, reward.amount)
+    
+    def render_quest_log(self, screen, pos=(600, 20)):
         if not self.active_quests:
             return
         
-        quest_log_x = 600
-        quest_log_y = 20
+        quest_log_x, quest_log_y = pos
         quest_log_width = 180
         line_height = 20
         
@@ -190,8 +293,7 @@ class QuestSystem:
         pygame.draw.rect(screen, (100, 100, 120), log_bg, 2)
         
         # Заголовок
-        font = pygame.font.Font(None, 20)
-        title = font.render(f"{self.localization.get('active_quests')}:", True, (255, 255, 255))
+        title = self.font_manager.render(f"{self.localization.get('active_quests')}:", 20, (255, 255, 255))
         screen.blit(title, (quest_log_x + 10, quest_log_y + 10))
         
         y_offset = 40
@@ -200,25 +302,14 @@ class QuestSystem:
             quest = self.quests.get(quest_id)
             if quest:
                 # Название квеста
-                name_font = pygame.font.Font(None, 16)
-                name_text = name_font.render(quest['name'], True, (255, 215, 0))
+                name_text = self.font_manager.render(quest['name'], 16, (255, 215, 0))
                 screen.blit(name_text, (quest_log_x + 10, quest_log_y + y_offset))
                 y_offset += line_height
                 
                 # Прогресс квеста
                 for task_info in quest_data['progress'].values():
-                    if task_info['type'] == 'kill':
-                        enemy_id = task_info['enemy_id']
-                        enemy_name = f"Enemy {enemy_id}"
-                        enemy_template = self.entity_manager.enemy_templates.get(enemy_id)
-                        if enemy_template:
-                            enemy_name = enemy_template.get('name', f"Enemy {enemy_id}")
-                        
-                        progress_text = name_font.render(
-                            f"{self.localization.get('quest_kill')} {enemy_name} ({task_info['current']}/{task_info['required']})", 
-                            True, (200, 200, 200)
-                        )
-                        screen.blit(progress_text, (quest_log_x + 10, quest_log_y + y_offset))
-                        y_offset += line_height
+                    progress_text = self.font_manager.render(self.get_task_text(task_info), 16, (200, 200, 200))
+                    screen.blit(progress_text, (quest_log_x + 10, quest_log_y + y_offset))
+                    y_offset += line_height
                 
                 y_offset += 5
\ No newline at end of file
@@ -0,0 +1,151 @@
+import re
+from collections import namedtuple
+
+# Инструкция скрипта: код операции, уже разобранные аргументы и номер команды в скрипте
+# (элемент списка script в YAML или строка текста, с 1; строки файла YAML сюда не попадают)
+Instruction = namedtuple('Instruction', ['op', 'args', 'statement'])
+
+class ScriptCompileError(Exception):
+    def __init__(self, statement, command, message):
+        super().__init__(f"statement {statement}: {message} ({command})")
+        self.statement = statement
+        self.command = command
+        self.message = message
+    
+    def __reduce__(self):
+        # Ошибки лежат в паке контента - pickle должен восстановить их по исходным аргументам
+        return (ScriptCompileError, (self.statement, self.command, self.message))
+
+def parse_bool(text):
+    return text.strip().lower() == 'true'
+
+def parse_slot(text):
+    """Слот для GiveItem: число или false - первый свободный"""
+    text = text.strip().lower()
+    if text == 'false':
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f"invalid slot '{text}'")
+
+# Команды с аргументами: (префикс, код операции, шаблон, разбор групп в аргументы)
+COMMANDS = [
+    ('$log.', 'log', re.compile(r'\$log\.(\w+)\(["\']([^"\']+)["\']\)'),
+     lambda m: (m.group(1).lower(), m.group(2))),
+    ('$inventory.GiveItem', 'give_item', re.compile(r'\$inventory\.GiveItem\(([^,]+),\s*([^)]+)\)'),
+     lambda m: (int(m.group(1).strip()), parse_slot(m.group(2)))),
+    ('$enemy.spawn', 'enemy_spawn', re.compile(r'\$enemy\.spawn\(([^,]+),\s*([^,]+),\s*([^,]+),\s*([^)]+)\)'),
+     lambda m: (int(m.group(1).strip()), int(m.group(2).strip()), int(m.group(3).strip()), parse_bool(m.group(4)))),
+    ('$npc.spawn', 'npc_spawn', re.compile(r'\$npc\.spawn\(([^,]+),\s*([^,]+),\s*([^,]+),\s*([^)]+)\)'),
+     lambda m: (int(m.group(1).strip()), int(m.group(2).strip()), int(m.group(3).strip()), parse_bool(m.group(4)))),
+    ('$call.script', 'call_script', re.compile(r'\$call\.script\(([^)]+)\)'),
+     lambda m: (int(m.group(1).strip()),)),
+    ('$recall.script', 'recall_script', re.compile(r'\$recall\.script\(([^)]+)\)'),
+     lambda m: (int(m.group(1).strip()),)),
+    ('$quest.Give', 'give_quest', re.compile(r'\$quest\.Give\(([^)]+)\)'),
+     lambda m: (int(m.group(1).strip()),)),
+    ('$quest.Cancel', 'cancel_quest', re.compile(r'\$quest\.Cancel\(([^)]+)\)'),
+     lambda m: (int(m.group(1).strip()),)),
+    ('$npc.dialog', 'npc_dialog', re.compile(r'\$npc\.dialog\(([^)]+)\)'),
+     lambda m: (int(m.group(1).strip()),)),
+    ('$map.set', 'set_map', re.compile(r'\$map\.set\(([^)]+)\)'),
+     lambda m: (int(m.group(1).strip()),)),
+    ('$map.remove', 'map_object', re.compile(r'\$map\.(remove)\(([^)]+)\)'),
+     lambda m: (m.group(1), m.group(2).strip().strip('"\''))),
+    ('$map.restore', 'map_object', re.compile(r'\$map\.(restore)\(([^)]+)\)'),
+     lambda m: (m.group(1), m.group(2).strip().strip('"\''))),
+    ('@open.menu', 'open_menu', re.compile(r'@open\.menu\(([^)]+)\)'),
+     lambda m: (int(m.group(1)),)),
+    ('!delay', 'delay', re.compile(r'!delay\(([\d.]+)\)'),
+     lambda m: (float(m.group(1).strip()),))
+]
+
+# Команды без аргументов
+SIMPLE_COMMANDS = {
+    '@close.menu': 'close_menu',
+    '@close': 'close_dialog'
+}
+
+def compile_command(command):
+    """(код операции, аргументы) одной строки; None - строка ничего не делает"""
+    if command in SIMPLE_COMMANDS:
+        return SIMPLE_COMMANDS[command], ()
+    
+    # %0.v -= 5
+    if command.startswith('%'):
+        if '-=' not in command:
+            raise ValueError("unsupported value operation")
+        left, right = command.split('-=', 1)
+        left = left.strip()
+        if '.' not in left:
+            raise ValueError("expected %<id>.v")
+        return 'value_subtract', (int(left[1:].split('.')[0]), float(right.strip()))
+    
+    for prefix, op, pattern, decode in COMMANDS:
+        if command.startswith(prefix):
+            match = pattern.search(command)
+            if not match:
+                raise ValueError(f"bad arguments for {prefix}")
+            return op, decode(match)
+    
+    # Неизвестные команды, как и раньше, пропускаются
+    return None
+
+def compile_condition(command):
+    """&%0.v > 100: -> (id значения, порог)"""
+    condition = command[1:].split(':')[0].strip()
+    if '>' not in condition:
+        raise ValueError("unsupported condition")
+    left, right = condition.split('>', 1)
+    left = left.strip()
+    if not (left.startswith('%') and '.' in left):
+        raise ValueError("expected %<id>.v on the left of a condition")
+    return int(left[1:].split('.')[0]), float(right.strip())
+
+def compile_script(source):
+    """Компилирует текст или список строк скрипта в (программа, ошибки).
+    Условие &...: становится переходом на строку после парного &end"""
+    lines = source.split('\n') if isinstance(source, str) else source
+    program = []
+    errors = []
+    blocks = []  # индексы инструкций if открытых условий (None - условие с ошибкой)
+    
+    for statement, line in enumerate(lines, 1):
+        command = str(line).strip()
+        if not command or command.startswith('#'):
+            continue
+        
+        try:
+            if command == '&end':
+                if not blocks:
+                    raise ValueError("&end without a condition")
+                index = blocks.pop()
+                if index is not None:
+                    instruction = program[index]
+                    program[index] = instruction._replace(args=instruction.args[:2] + (len(program),))
+                continue
+            
+            if command.startswith('&'):
+                if ':' not in command:
+                    raise ValueError("condition must end with ':'")
+                blocks.append(None)
+                value_id, threshold = compile_condition(command)
+                blocks[-1] = len(program)
+                program.append(Instruction('if_greater', (value_id, threshold, None), statement))
+                continue
+            
+            compiled = compile_command(command)
+            if compiled is not None:
+                program.append(Instruction(compiled[0], compiled[1], statement))
+        except (ValueError, IndexError) as e:
+            errors.append(ScriptCompileError(statement, command, str(e)))
+    
+    # Незакрытые условия действуют до конца скрипта
+    for index in blocks:
+        if index is not None:
+            instruction = program[index]
+            program[index] = instruction._replace(args=instruction.args[:2] + (len(program),))
+            errors.append(ScriptCompileError(instruction.statement, lines[instruction.statement - 1].strip(),
+                                             "condition is not closed with &end"))
+    return program, errors
\ No newline at end of file
@@ -1,14 +1,37 @@
 import yaml
-import re
 import time
+import heapq
+import itertools
 import pygame
+from collections import deque, OrderedDict
+from .content import YamlContent
+from .script_compiler import compile_script
+
+# Классы приоритета: скрипты интерфейса (меню, диалоги) выполняются раньше скриптов мира
+PRIORITY_UI = 0
+PRIORITY_WORLD = 1
+
+class ScriptTask:
+    """Один запуск скрипта: свой счетчик команд и стек вызовов, может ждать на !delay"""
+    __slots__ = ('name', 'priority', 'program', 'pc', 'call_stack', 'wake_time', 'finished', 'batch_values')
+    
+    def __init__(self, program, name=None, priority=PRIORITY_WORLD):
+        self.name = name
+        self.priority = priority
+        self.program = program
+        self.pc = 0  # индекс следующей инструкции
+        self.call_stack = []  # (программа, pc) вызывающих скриптов для $call.script
+        self.wake_time = None
+        self.finished = False
+        self.batch_values = False  # изменения значений за один запуск run сохраняются одной транзакцией
 
 class ScriptRunner:
-    def __init__(self, inventory, item_loader, health_system=None, value_system=None):
+    def __init__(self, inventory, item_loader, health_system=None, value_system=None, content=None):
         self.inventory = inventory
         self.item_loader = item_loader
         self.health_system = health_system
         self.value_system = value_system
+        self.content = content or YamlContent()
         self.entity_manager = None
         self.quest_system = None
         self.npc_system = None
@@ -28,51 +51,150 @@ class ScriptRunner:
         self.scripts = {}
         self.executed_scripts = set()
         
-        # Для неблокирующих задержек
-        self.delay_active = False
-        self.delay_end_time = 0
-        self.delay_commands = []
-        self.current_delay_index = 0
         
-        # Для условных операторов
-        self.if_condition = False
-        self.if_skip = False
-        self.if_level = 0
+        # Скомпилированные программы меню, диалогов и execute_script_content
+        self.block_cache = OrderedDict()  # исходник -> программа, LRU
+        self.max_block_cache = 256  # динамические строки команд не должны копиться бесконечно
+        
+        # Обработчики инструкций: код операции -> метод с разобранными аргументами
+        self.op_handlers = {
+            'log': self.execute_simple_log,
+            'give_item': self.execute_give_item,
+            'enemy_spawn': self.execute_enemy_spawn,
+            'npc_spawn': self.execute_npc_spawn,
+            'call_script': self.execute_call_script,
+            'recall_script': self.execute_recall_script,
+            'give_quest': self.execute_give_quest,
+            'cancel_quest': self.execute_cancel_quest,
+            'npc_dialog': self.execute_npc_dialog,
+            'set_map': self.execute_set_map,
+            'map_object': self.execute_map_object,
+            'value_subtract': self.execute_value_subtract,
+            'if_greater': self.execute_if_greater,
+            'close_menu': self.execute_close_menu,
+            'open_menu': self.execute_open_menu,
+            'close_dialog': self.execute_close_dialog,
+            'delay': self.execute_delay
+        }
+        
+        # Каждый запуск скрипта - отдельная задача; ждущие !delay лежат в куче по времени пробуждения
+        self.game_time = 0.0  # время симуляции, идет только в тиках
+        self.current = None  # задача, которая выполняется сейчас
+        self.timers = []  # (wake_time, порядок, задача)
+        self.timer_order = itertools.count()
+        self.max_call_depth = 100000
+        
+        # Бюджет на тик: сверх него задачи вытесняются в очередь готовых и продолжаются в следующем тике
+        self.instruction_budget = 0  # инструкций за тик, 0 - без лимита
+        self.time_budget = 0.0  # секунд за тик, 0 - без лимита
+        self.ui_reserve = 0.25  # доля бюджета, которую скрипты мира оставляют интерфейсу
+        self.ready = {PRIORITY_UI: deque(), PRIORITY_WORLD: deque()}
+        self.frame_instructions = 0
+        self.frame_start = None  # начало окна бюджета - первая инструкция после update
+        self.stats = {'instructions': 0, 'preempted': 0}
     
     def update(self, delta_time):
-        """Обновляет состояние скриптов"""
-        if self.delay_active:
-            current_time = time.time()
-            if current_time >= self.delay_end_time:
-                self.delay_active = False
-                self.continue_script_execution()
+        """Будит задачи, у которых истек !delay, и продолжает вытесненные - сначала интерфейс"""
+        self.game_time += delta_time
+        self.begin_frame()
+        
+        # Сначала снимаем все проснувшиеся: снова уснувшие на !delay(0) ждут следующего тика
+        timers = self.timers
+        while timers and timers[0][0] <= self.game_time:
+            task = heapq.heappop(timers)[2]
+            task.wake_time = None
+            self.ready[task.priority].append(task)
+        
+        for priority in (PRIORITY_UI, PRIORITY_WORLD):
+            queue = self.ready[priority]
+            # Вытесненные в этом проходе задачи встают в конец очереди и ждут следующего тика
+            for _ in range(len(queue)):
+                if not self.has_budget(priority):
+                    break
+                self.run(queue.popleft())
+    
+    def begin_frame(self):
+        """Открывает новое окно бюджета"""
+        self.stats['instructions'] = self.frame_instructions
+        self.frame_instructions = 0
+        self.frame_start = None
+    
+    def get_limits(self, priority):
+        """(лимит инструкций, дедлайн) класса приоритета в текущем окне"""
+        share = 1.0 if priority == PRIORITY_UI else 1.0 - self.ui_reserve
+        max_instructions = self.instruction_budget * share if self.instruction_budget else float('inf')
+        if not self.time_budget:
+            return max_instructions, float('inf')
+        if self.frame_start is None:
+            self.frame_start = time.perf_counter()
+        return max_instructions, self.frame_start + self.time_budget * share
+    
+    def has_budget(self, priority):
+        max_instructions, deadline = self.get_limits(priority)
+        return self.frame_instructions < max_instructions and time.perf_counter() < deadline
+    
+    def get_waiting_count(self):
+        """Сколько задач ждут !delay"""
+        return len(self.timers)
+    
+    def get_ready_count(self):
+        """Сколько вытесненных задач ждут бюджета"""
+        return len(self.ready[PRIORITY_UI]) + len(self.ready[PRIORITY_WORLD])
+    
+    @staticmethod
+    def parse_script(script_data):
+        """Запись скрипта для self.scripts из данных YAML файла; скрипт сразу компилируется"""
+        script_content = script_data.get('script', '')
+        if isinstance(script_content, list):
+            script_content = '\n'.join(script_content)
+        program, errors = compile_script(script_content)
+        return {
+            'name': script_data.get('name', 'Unknown'),
+            'content': script_content,
+            'callonstart': script_data.get('callonstart', False),
+            'program': program,
+            'errors': errors
+        }
+    
+    def report_compile_errors(self, name, errors):
+        if self.silent_mode:
+            return
+        for error in errors:
+            print(f"{self.colors['red']}Error compiling {name}, {error}{self.colors['reset']}")
+    
+    def load_scripts(self):
+        """Загружает все скрипты; из пака берутся уже скомпилированные"""
+        resolved = self.content.get_resolved('scripts')
+        if resolved is not None:
+            for script_id, script in resolved.items():
+                self.register_script(script_id, script)
+            return
+        
+        for script_file, script_data in self.content.load('scripts'):
+            self.register_script(script_data.get('id'), self.parse_script(script_data))
+    
+    def register_script(self, script_id, script):
+        if script_id is None:
+            return
+        
+        # Сохраняем скрипт
+        self.scripts[script_id] = script
+        self.report_compile_errors(f"script '{script['name']}'", script.get('errors', []))
+        
+        # Запускаем только если callonstart=true
+        if script['callonstart']:
+            try:
+                self.execute_program(script['program'], script['name'])
+                self.executed_scripts.add(script_id)
+            except Exception as e:
+                if not self.silent_mode:
+                    print(f"{self.colors['red']}Error running script {script_id}: {e}{self.colors['reset']}")
     
     def run_script(self, file_path):
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 script_data = yaml.safe_load(file)
-            
-            script_id = script_data.get('id')
-            script_name = script_data.get('name', 'Unknown')
-            call_on_start = script_data.get('callonstart', False)
-            script_content = script_data.get('script', '')
-            
-            if isinstance(script_content, list):
-                script_content = '\n'.join(script_content)
-            
-            # Сохраняем скрипт
-            if script_id is not None:
-                self.scripts[script_id] = {
-                    'name': script_name,
-                    'content': script_content,
-                    'callonstart': call_on_start
-                }
-            
-            # Запускаем только если callonstart=true
-            if call_on_start and script_id is not None:
-                self.execute_script_content(script_content)
-                self.executed_scripts.add(script_id)
-            
+            self.register_script(script_data.get('id'), self.parse_script(script_data))
         except Exception as e:
             if not self.silent_mode:
                 print(f"{self.colors['red']}Error loading script {file_path}: {e}{self.colors['reset']}")
@@ -81,7 +203,7 @@ class ScriptRunner:
         """Запускает скрипт по ID"""
         if script_id in self.scripts:
             script = self.scripts[script_id]
-            self.execute_script_content(script['content'])
+            self.execute_program(script['program'], script['name'])
             self.executed_scripts.add(script_id)
             return True
         return False
@@ -90,271 +212,212 @@ class ScriptRunner:
         """Перезапускает скрипт по ID"""
         if script_id in self.scripts:
             script = self.scripts[script_id]
-            self.execute_script_content(script['content'])
+            self.execute_program(script['program'], script['name'])
             return True
         return False
     
+    def compile_block(self, source, name="script block"):
+        """Программа для текста или списка строк; компилируется один раз на одинаковый исходник"""
+        key = source if isinstance(source, str) else tuple(source)
+        program = self.block_cache.get(key)
+        if program is not None:
+            self.block_cache.move_to_end(key)
+            return program
+        
+        program, errors = compile_script(source)
+        self.report_compile_errors(name, errors)
+        self.block_cache[key] = program
+        while len(self.block_cache) > self.max_block_cache:
+            self.block_cache.popitem(last=False)
+        return program
+    
     def execute_script_content(self, script_content):
         """Выполняет содержимое скрипта"""
-        lines = script_content.split('\n')
-        self.delay_commands = [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
-        self.current_delay_index = 0
-        self.execute_next_command()
-    
-    def execute_next_command(self):
-        """Выполняет следующую команду в скрипте"""
-        if self.current_delay_index < len(self.delay_commands):
-            command = self.delay_commands[self.current_delay_index]
-            self.current_delay_index += 1
-            self.execute_command(command)
-    
-    def continue_script_execution(self):
-        """Продолжает выполнение скрипта после задержки"""
-        self.execute_next_command()
+        self.execute_program(self.compile_block(script_content))
+    
+    def execute_block(self, script_lines, name="script block", batch_values=False):
+        """Выполняет скрипт кнопки меню или диалога с приоритетом интерфейса.
+        batch_values - каждый запуск до !delay, вытеснения или конца сохраняет значения одной транзакцией"""
+        task = ScriptTask(self.compile_block(script_lines, name), name, PRIORITY_UI)
+        task.batch_values = batch_values
+        self.run(task)
+        return task
     
     def execute_command(self, command):
+        """Выполняет одну строку скрипта"""
+        self.execute_program(self.compile_block(command), None, PRIORITY_UI)
+    
+    def execute_program(self, program, name=None, priority=PRIORITY_WORLD):
+        """Запускает программу новой задачей; другие задачи (в том числе ждущие !delay) не затрагиваются"""
+        task = ScriptTask(program, name, priority)
+        self.run(task)
+        return task
+    
+    def run(self, task):
+        """Цикл интерпретатора: выполняет задачу до конца программы, до !delay или до конца бюджета.
+        Вызовы скриптов идут через call_stack задачи, стек Python не растет"""
+        previous = self.current
+        self.current = task
+        handlers = self.op_handlers
+        max_instructions, deadline = self.get_limits(task.priority)
+        check_time = deadline != float('inf')
+        # Транзакция закрывается в finally, до того как задача уснет или уступит кадр
+        transaction = self.value_system if task.batch_values else None
+        if transaction:
+            transaction.begin()
         try:
-            # Обработка условных операторов
-            if command.startswith('&'):
-                self.handle_conditional(command)
-                return
-            
-            # Если мы в режиме пропуска (условие false)
-            if self.if_skip and self.if_level > 0:
-                return
-            
-            # Обработка значений
-            if command.startswith('%'):
-                self.handle_value_command(command)
-                return
-            
-            # Обработка специальных команд
-            if command.startswith('@'):
-                self.handle_special_command(command)
-                return
-            
-            # Обработка обычных команд
-            if command.startswith('$log.') and '(' in command and ')' in command:
-                self.execute_simple_log(command)
-                self.execute_next_command()
-            elif command.startswith('$inventory.GiveItem'):
-                self.execute_give_item(command)
-                self.execute_next_command()
-            elif command.startswith('$enemy.spawn'):
-                self.execute_enemy_spawn(command)
-                self.execute_next_command()
-            elif command.startswith('$npc.spawn'):
-                self.execute_npc_spawn(command)
-                self.execute_next_command()
-            elif command.startswith('$call.script'):
-                self.execute_call_script(command)
-                self.execute_next_command()
-            elif command.startswith('$recall.script'):
-                self.execute_recall_script(command)
-                self.execute_next_command()
-            elif command.startswith('$quest.Give'):
-                self.execute_give_quest(command)
-                self.execute_next_command()
-            elif command.startswith('$quest.Cancel'):
-                self.execute_cancel_quest(command)
-                self.execute_next_command()
-            elif command.startswith('$npc.dialog'):
-                self.execute_npc_dialog(command)
-                self.execute_next_command()
-            elif command.startswith('$map.set'):
-                self.execute_set_map(command)
-                self.execute_next_command()
-            elif command.startswith('!delay'):
-                self.execute_delay(command)
-            else:
-                self.execute_next_command()
+            while True:
+                # Время проверяем раз в 8 инструкций
+                count = self.frame_instructions
+                if count >= max_instructions or (check_time and not count & 7 and time.perf_counter() >= deadline):
+                    self.ready[task.priority].append(task)
+                    self.stats['preempted'] += 1
+                    return
+                self.frame_instructions = count + 1
                 
-        except Exception as e:
-            if not self.silent_mode:
-                print(f"{self.colors['red']}Error executing command: {command}{self.colors['reset']}")
-                print(f"Error details: {e}")
-            self.execute_next_command()
-    
-    def handle_conditional(self, command):
-        """Обрабатывает условные операторы"""
-        if command == '&end':
-            self.if_level = max(0, self.if_level - 1)
-            if self.if_level == 0:
-                self.if_skip = False
-            self.execute_next_command()
-            return
-        
-        if command.startswith('&') and ':' in command:
-            self.if_level += 1
-            condition = command[1:].split(':')[0].strip()
-            
-            # Проверяем условие с значениями
-            if '>' in condition:
-                parts = condition.split('>')
-                left = parts[0].strip()
-                right = parts[1].strip()
+                program = task.program
+                if task.pc >= len(program):
+                    # Скрипт закончился - возвращаемся в вызвавший
+                    if not task.call_stack:
+                        task.finished = True
+                        return
+                    task.program, task.pc = task.call_stack.pop()
+                    continue
                 
-                if left.startswith('%') and '.' in left:
-                    # Обработка значений %0.v
-                    value_parts = left[1:].split('.')
-                    value_id = int(value_parts[0])
-                    left_value = self.value_system.get_value(value_id) if self.value_system else 0
-                    right_value = float(right)
-                    self.if_skip = not (left_value > right_value)
-            
-            self.execute_next_command()
-    
-    def handle_value_command(self, command):
-        """Обрабатывает команды с значениями"""
-        if '-=' in command:
-            parts = command.split('-=')
-            left = parts[0].strip()
-            right = parts[1].strip()
-            
-            if left.startswith('%') and '.' in left:
-                value_parts = left[1:].split('.')
-                value_id = int(value_parts[0])
-                amount = float(right)
-                if self.value_system:
-                    self.value_system.subtract_value(value_id, amount)
-        
-        self.execute_next_command()
+                instruction = program[task.pc]
+                task.pc += 1
+                try:
+                    # Обработчик возвращает True, если задача ждет (!delay)
+                    if handlers[instruction.op](*instruction.args):
+                        return
+                except Exception as e:
+                    if not self.silent_mode:
+                        print(f"{self.colors['red']}Error executing statement {instruction.statement}: "
+                              f"{instruction.op}{instruction.args}{self.colors['reset']}")
+                        print(f"Error details: {e}")
+        finally:
+            if transaction:
+                transaction.commit()
+            self.current = previous
+    
+    def call_program(self, program):
+        """Переходит в программу другого скрипта; по ее окончании выполнение вернется сюда"""
+        task = self.current
+        if len(task.call_stack) >= self.max_call_depth:
+            raise RecursionError(f"script call depth exceeded {self.max_call_depth}")
+        task.call_stack.append((task.program, task.pc))
+        task.program = program
+        task.pc = 0
+    
+    def execute_if_greater(self, value_id, threshold, end_pc):
+        """&%id.v > порог: ... &end - при ложном условии переход за &end"""
+        value = self.value_system.get_value(value_id) if self.value_system else 0
+        if not value > threshold:
+            self.current.pc = end_pc
+    
+    def execute_value_subtract(self, value_id, amount):
+        if self.value_system:
+            self.value_system.subtract_value(value_id, amount)
     
-    def handle_special_command(self, command):
-        """Обрабатывает специальные команды"""
-        if command == '@close.menu' and self.menu_system:
+    def execute_close_menu(self):
+        if self.menu_system:
             self.menu_system.close_menu()
-        elif command.startswith('@open.menu') and self.menu_system:
-            match = re.search(r'@open\.menu\(([^)]+)\)', command)
-            if match:
-                menu_id = int(match.group(1))
-                self.menu_system.open_menu(menu_id)
-        elif command == '@close' and self.npc_system:
+    
+    def execute_open_menu(self, menu_id):
+        if self.menu_system:
+            self.menu_system.open_menu(menu_id)
+    
+    def execute_close_dialog(self):
+        if self.npc_system:
             self.npc_system.active_npc = None
+    
+    def execute_delay(self, seconds):
+        """Обрабатывает команду !delay с секундами (неблокирующая): задача уходит в кучу таймеров"""
+        task = self.current
+        task.wake_time = self.game_time + seconds
+        heapq.heappush(self.timers, (task.wake_time, next(self.timer_order), task))
         
-        self.execute_next_command()
-    
-    def execute_delay(self, command):
-        """Обрабатывает команду !delay с секундами (неблокирующая)"""
-        match = re.search(r'!delay\(([\d.]+)\)', command)
-        if match:
-            seconds = float(match.group(1).strip())
-            self.delay_active = True
-            self.delay_end_time = time.time() + seconds
-            
-            if not self.silent_mode:
-                print(f"{self.colors['blue']}⏳ Delay: {seconds}s{self.colors['reset']}")
-        else:
-            # Если команда не распознана, продолжаем выполнение
-            self.execute_next_command()
+        if not self.silent_mode:
+            print(f"{self.colors['blue']}⏳ Delay: {seconds}s{self.colors['reset']}")
+        return True
     
-    def execute_set_map(self, command):
-        match = re.search(r'\$map\.set\(([^)]+)\)', command)
-        if match and hasattr(self, 'map_system') and self.map_system:
-            map_id = int(match.group(1).strip())
+    def execute_set_map(self, map_id):
+        if self.map_system:
             success = self.map_system.set_map(map_id)
             if success and not self.silent_mode:
                 print(f"{self.colors['green']}✓ Map {map_id} loaded{self.colors['reset']}")
     
-    def execute_npc_spawn(self, command):
-        match = re.search(r'\$npc\.spawn\(([^,]+),\s*([^,]+),\s*([^,]+),\s*([^)]+)\)', command)
-        if match and hasattr(self, 'npc_system') and self.npc_system:
-            npc_id = int(match.group(1).strip())
-            x = int(match.group(2).strip())
-            y = int(match.group(3).strip())
-            initialize = match.group(4).strip().lower() == 'true'
-        
+    def execute_map_object(self, action, obj_name):
+        if self.map_system:
+            if action == 'remove':
+                success = self.map_system.remove_map_object(obj_name)
+            else:
+                success = self.map_system.restore_map_object(obj_name) is not None
+            if success and not self.silent_mode:
+                print(f"{self.colors['green']}✓ Map object '{obj_name}' {action}d{self.colors['reset']}")
+    
+    def execute_npc_spawn(self, npc_id, x, y, initialize):
+        if self.npc_system:
             result = self.npc_system.spawn_npc(npc_id, x, y, initialize)
             if result and initialize and not self.silent_mode:
                 print(f"{self.colors['green']}✓ Spawned NPC {npc_id} at ({x}, {y}){self.colors['reset']}")
-
-    def execute_npc_dialog(self, command):
-        match = re.search(r'\$npc\.dialog\(([^)]+)\)', command)
-        if match and hasattr(self, 'npc_system') and self.npc_system:
-            npc_id = int(match.group(1).strip())
+    
+    def execute_npc_dialog(self, npc_id):
+        if self.npc_system:
             success = self.npc_system.start_dialog(npc_id)
             if success and not self.silent_mode:
                 print(f"{self.colors['blue']}✓ Started dialog with NPC {npc_id}{self.colors['reset']}")
     
-    def execute_simple_log(self, command):
-        match = re.search(r'\$log\.(\w+)\(["\']([^"\']+)["\']\)', command)
-        if match:
-            color_name = match.group(1).lower()
-            message = match.group(2)
-            
-            color_code = self.colors.get(color_name, self.colors['reset'])
-            print(f"{color_code}{message}{self.colors['reset']}")
-    
-    def execute_call_script(self, command):
-        match = re.search(r'\$call\.script\(([^)]+)\)', command)
-        if match:
-            script_id = int(match.group(1).strip())
-            success = self.execute_script(script_id)
-            if success and not self.silent_mode:
+    def execute_simple_log(self, color_name, message):
+        color_code = self.colors.get(color_name, self.colors['reset'])
+        print(f"{color_code}{message}{self.colors['reset']}")
+    
+    def execute_call_script(self, script_id):
+        if script_id in self.scripts:
+            self.call_program(self.scripts[script_id]['program'])
+            self.executed_scripts.add(script_id)
+            if not self.silent_mode:
                 print(f"{self.colors['blue']}✓ Called script {script_id}{self.colors['reset']}")
     
-    def execute_recall_script(self, command):
-        match = re.search(r'\$recall\.script\(([^)]+)\)', command)
-        if match:
-            script_id = int(match.group(1).strip())
-            success = self.recall_script(script_id)
-            if success and not self.silent_mode:
+    def execute_recall_script(self, script_id):
+        if script_id in self.scripts:
+            self.call_program(self.scripts[script_id]['program'])
+            if not self.silent_mode:
                 print(f"{self.colors['cyan']}✓ Recalled script {script_id}{self.colors['reset']}")
     
-    def execute_give_quest(self, command):
-        match = re.search(r'\$quest\.Give\(([^)]+)\)', command)
-        if match and hasattr(self, 'quest_system') and self.quest_system:
-            quest_id = int(match.group(1).strip())
+    def execute_give_quest(self, quest_id):
+        if self.quest_system:
             success = self.quest_system.give_quest(quest_id)
             if success and not self.silent_mode:
                 print(f"{self.colors['green']}✓ Quest {quest_id} given{self.colors['reset']}")
     
-    def execute_cancel_quest(self, command):
-        match = re.search(r'\$quest\.Cancel\(([^)]+)\)', command)
-        if match and hasattr(self, 'quest_system') and self.quest_system:
-            quest_id = int(match.group(1).strip())
+    def execute_cancel_quest(self, quest_id):
+        if self.quest_system:
             success = self.quest_system.cancel_quest(quest_id)
             if success and not self.silent_mode:
                 print(f"{self.colors['yellow']}✓ Quest {quest_id} canceled{self.colors['reset']}")
     
-    def execute_enemy_spawn(self, command):
-        match = re.search(r'\$enemy\.spawn\(([^,]+),\s*([^,]+),\s*([^,]+),\s*([^)]+)\)', command)
-        if match and hasattr(self, 'entity_manager') and self.entity_manager:
-            enemy_id = int(match.group(1).strip())
-            x = int(match.group(2).strip())
-            y = int(match.group(3).strip())
-            initialize = match.group(4).strip().lower() == 'true'
-            
+    def execute_enemy_spawn(self, enemy_id, x, y, initialize):
+        if self.entity_manager:
             result = self.entity_manager.spawn_enemy(enemy_id, x, y, initialize)
             if result and initialize and not self.silent_mode:
                 print(f"{self.colors['green']}✓ Spawned enemy {enemy_id} at ({x}, {y}){self.colors['reset']}")
     
-    def execute_give_item(self, command):
-        match = re.search(r'\$inventory\.GiveItem\(([^,]+),\s*([^)]+)\)', command)
-        if match:
-            item_id = int(match.group(1).strip())
-            slot_str = match.group(2).strip().lower()
-            
-            if slot_str == 'false':
-                # Ищем свободный слот
-                for slot in range(9):
-                    if not self.inventory.get_item(slot):
-                        success = self.inventory.give_item(item_id, slot)
-                        if success and not self.silent_mode:
-                            item_data = self.item_loader.get_item(item_id)
-                            if item_data:
-                                print(f"{self.colors['green']}✓ Item '{item_data.get('name')}' added to free slot {slot}{self.colors['reset']}")
-                        return
-            else:
-                try:
-                    slot = int(slot_str)
-                    success = self.inventory.give_item(item_id, slot)
+    def execute_give_item(self, item_id, slot):
+        """slot None - первый свободный слот"""
+        if slot is None:
+            # Ищем свободный слот
+            for free_slot in range(9):
+                if not self.inventory.get_item(free_slot):
+                    success = self.inventory.give_item(item_id, free_slot)
                     if success and not self.silent_mode:
                         item_data = self.item_loader.get_item(item_id)
                         if item_data:
-                            print(f"{self.colors['green']}✓ Item '{item_data.get('name')}' added to slot {slot}{self.colors['reset']}")
-                except ValueError:
-                    if not self.silent_mode:
-                        print(f"{self.colors['red']}Error: Invalid slot '{slot_str}'{self.colors['reset']}")
-        
-        self.execute_next_command()
\ No newline at end of file
+                            print(f"{self.colors['green']}✓ Item '{item_data.get('name')}' added to free slot {free_slot}{self.colors['reset']}")
+                    return
+        else:
+            success = self.inventory.give_item(item_id, slot)
+            if success and not self.silent_mode:
+                item_data = self.item_loader.get_item(item_id)
+                if item_data:
+                    print(f"{self.colors['green']}✓ Item '{item_data.get('name')}' added to slot {slot}{self.colors['reset']}")
\ No newline at end of file
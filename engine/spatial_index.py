@@ -0,0 +1,228 @@
+import pygame
+
+class SpatialGrid:
+    def __init__(self, cell_size=256):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> set объектов
+        self.bounds = {}  # объект -> (rect, диапазон ячеек)
+    
+    def get_cell_range(self, rect):
+        cell_size = self.cell_size
+        return (rect.left // cell_size, rect.top // cell_size,
+                (rect.right - 1) // cell_size, (rect.bottom - 1) // cell_size)
+    
+    def insert(self, obj, rect):
+        """Добавляет объект с мировыми границами rect"""
+        rect = pygame.Rect(rect)
+        cell_range = self.get_cell_range(rect)
+        min_x, min_y, max_x, max_y = cell_range
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                cell = self.cells.get((cell_x, cell_y))
+                if cell is None:
+                    cell = self.cells[(cell_x, cell_y)] = set()
+                cell.add(obj)
+        self.bounds[obj] = (rect, cell_range)
+    
+    def remove(self, obj):
+        """Удаляет объект из сетки"""
+        entry = self.bounds.pop(obj, None)
+        if entry is None:
+            return
+        min_x, min_y, max_x, max_y = entry[1]
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                cell = self.cells.get((cell_x, cell_y))
+                if cell is not None:
+                    cell.discard(obj)
+                    if not cell:
+                        del self.cells[(cell_x, cell_y)]
+    
+    def update(self, obj, rect):
+        """Обновляет границы; ячейки меняются только при переходе через границу ячейки"""
+        entry = self.bounds.get(obj)
+        if entry is None:
+            self.insert(obj, rect)
+            return
+        rect = pygame.Rect(rect)
+        if self.get_cell_range(rect) == entry[1]:
+            self.bounds[obj] = (rect, entry[1])
+        else:
+            self.remove(obj)
+            self.insert(obj, rect)
+    
+    def query_rect(self, rect):
+        """Объекты, чьи границы пересекают rect"""
+        rect = pygame.Rect(rect)
+        min_x, min_y, max_x, max_y = self.get_cell_range(rect)
+        found = set()
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                cell = self.cells.get((cell_x, cell_y))
+                if cell:
+                    found.update(cell)
+        bounds = self.bounds
+        return [obj for obj in found if bounds[obj][0].colliderect(rect)]
+    
+    def clear(self):
+        self.cells.clear()
+        self.bounds.clear()
+    
+    def __len__(self):
+        return len(self.bounds)
+
+class CollisionGrid(SpatialGrid):
+    ALL_LAYERS = 0xFFFFFFFF
+    
+    def __init__(self, cell_size=128):
+        super().__init__(cell_size)
+        self.layers = {}  # объект -> битовая маска слоя коллизий
+    
+    def insert(self, obj, rect, layer=1):
+        super().insert(obj, rect)
+        self.layers[obj] = layer
+    
+    def remove(self, obj):
+        super().remove(obj)
+        self.layers.pop(obj, None)
+    
+    def clear(self):
+        super().clear()
+        self.layers.clear()
+    
+    def query_colliders(self, rect, mask=ALL_LAYERS):
+        """Коллайдеры, пересекающие rect, чей слой попадает в маску"""
+        layers = self.layers
+        return [obj for obj in self.query_rect(rect) if layers[obj] & mask]
+    
+    def move_rect(self, rect, dx, dy, mask=ALL_LAYERS):
+        """Двигает rect на (dx, dy) со swept AABB по каждой оси отдельно (скольжение вдоль стен).
+        Изменяет rect, возвращает (blocked_x, blocked_y)"""
+        blocked_x = blocked_y = False
+        
+        if dx:
+            allowed = dx
+            for obj in self.query_colliders(rect.union(rect.move(dx, 0)), mask):
+                other = self.bounds[obj][0]
+                if other.colliderect(rect):
+                    continue  # уже внутри - даем выйти
+                if dx > 0:
+                    allowed = min(allowed, other.left - rect.right)
+                else:
+                    allowed = max(allowed, other.right - rect.left)
+            blocked_x = allowed != dx
+            rect.x += allowed
+        
+        if dy:
+            allowed = dy
+            for obj in self.query_colliders(rect.union(rect.move(0, dy)), mask):
+                other = self.bounds[obj][0]
+                if other.colliderect(rect):
+                    continue
+                if dy > 0:
+                    allowed = min(allowed, other.top - rect.bottom)
+                else:
+                    allowed = max(allowed, other.bottom - rect.top)
+            blocked_y = allowed != dy
+            rect.y += allowed
+        
+        return blocked_x, blocked_y
+
+
+class PointGrid:
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> set объектов
+        self.positions = {}  # объект -> (x, y, ячейка)
+    
+    def get_cell(self, x, y):
+        return (int(x // self.cell_size), int(y // self.cell_size))
+    
+    def insert(self, obj, x, y):
+        """Добавляет объект в точке (x, y)"""
+        cell = self.get_cell(x, y)
+        self.cells.setdefault(cell, set()).add(obj)
+        self.positions[obj] = (x, y, cell)
+    
+    def remove(self, obj):
+        entry = self.positions.pop(obj, None)
+        if entry is None:
+            return
+        bucket = self.cells.get(entry[2])
+        if bucket is not None:
+            bucket.discard(obj)
+            if not bucket:
+                del self.cells[entry[2]]
+    
+    def move(self, obj, x, y):
+        """Обновляет позицию; перекладывает объект только при смене ячейки"""
+        entry = self.positions.get(obj)
+        if entry is None:
+            self.insert(obj, x, y)
+            return
+        cell = self.get_cell(x, y)
+        if cell == entry[2]:
+            self.positions[obj] = (x, y, cell)
+        else:
+            self.remove(obj)
+            self.insert(obj, x, y)
+    
+    def query_radius(self, x, y, radius):
+        """Объекты не дальше radius от (x, y)"""
+        min_x, min_y = self.get_cell(x - radius, y - radius)
+        max_x, max_y = self.get_cell(x + radius, y + radius)
+        radius_sq = radius * radius
+        positions = self.positions
+        found = []
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                bucket = self.cells.get((cell_x, cell_y))
+                if not bucket:
+                    continue
+                for obj in bucket:
+                    obj_x, obj_y, _ = positions[obj]
+                    if (obj_x - x) ** 2 + (obj_y - y) ** 2 <= radius_sq:
+                        found.append(obj)
+        return found
+    
+    def query_nearest(self, x, y, k=1, max_radius=None):
+        """k ближайших объектов: список (distance, obj) по возрастанию расстояния"""
+        if k <= 0:
+            return []
+        center_x, center_y = self.get_cell(x, y)
+        positions = self.positions
+        candidates = []
+        seen = 0
+        ring = 0
+        while seen < len(positions):
+            # Обходим кольцо ячеек на расстоянии ring от центральной
+            for cell_x in range(center_x - ring, center_x + ring + 1):
+                for cell_y in range(center_y - ring, center_y + ring + 1):
+                    if ring and abs(cell_x - center_x) != ring and abs(cell_y - center_y) != ring:
+                        continue
+                    bucket = self.cells.get((cell_x, cell_y))
+                    if not bucket:
+                        continue
+                    for obj in bucket:
+                        seen += 1
+                        obj_x, obj_y, _ = positions[obj]
+                        distance = ((obj_x - x) ** 2 + (obj_y - y) ** 2) ** 0.5
+                        if max_radius is None or distance <= max_radius:
+                            candidates.append((distance, obj))
+            
+            # Все, что дальше этого кольца, не ближе ring * cell_size
+            reach = ring * self.cell_size
+            candidates.sort(key=lambda item: item[0])
+            if len(candidates) >= k and candidates[k - 1][0] <= reach:
+                break
+            if max_radius is not None and reach > max_radius:
+                break
+            ring += 1
+        return candidates[:k]
+    
+    def clear(self):
+        self.cells.clear()
+        self.positions.clear()
+    
+    def __len__(self):
+        return len(self.positions)
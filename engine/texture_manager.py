@@ -0,0 +1,168 @@
+import pygame
+import os
+from collections import OrderedDict
+
+class TextureManager:
+    GLOBAL_SCOPE = 'global'
+    
+    def __init__(self, budget_bytes=64 * 1024 * 1024, textures_path=os.path.join("game", "textures")):
+        self.textures_path = textures_path
+        self.budget_bytes = budget_bytes
+        self.convert = True  # convert()/convert_alpha() требуют окно
+        self.textures = OrderedDict()  # (path, size, flags) -> Surface
+        self.refs = {}  # (path, size, flags) -> {scope: count}
+        self.sizes = {}  # (path, size, flags) -> байты
+        self.missing = set()
+        self.current_scope = self.GLOBAL_SCOPE
+        self.total_bytes = 0
+        self.tracked = {}  # владелец -> байты поверхностей вне кэша (запеченные чанки карты и т.п.)
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+    
+    def load(self, texture_name, size=None, flags='alpha', scope=None):
+        """Возвращает общую текстуру и добавляет ссылку от scope (карта, 'global'...)"""
+        key = self.make_key(texture_name, size, flags)
+        texture = self.lookup(key)
+        if texture is not None:
+            scope_refs = self.refs.setdefault(key, {})
+            scope = scope or self.current_scope
+            scope_refs[scope] = scope_refs.get(scope, 0) + 1
+        return texture
+    
+    def get(self, texture_name, size=None, flags='alpha'):
+        """Как load, но без ссылок - для вызовов каждый кадр; текстура только поднимается в LRU
+        и может быть выгружена trim, если ее никто не держит через load"""
+        return self.lookup(self.make_key(texture_name, size, flags))
+    
+    def load_color(self, color, size, scope=None):
+        """Общая залитая цветом поверхность (объекты карты без текстуры)"""
+        return self.load(f"#color{tuple(color)}", size, 'fill', scope)
+    
+    def make_key(self, texture_name, size, flags):
+        if size is not None:
+            size = (int(size[0]), int(size[1]))
+        if flags == 'fill':
+            return (texture_name, size, flags)
+        return (os.path.join(self.textures_path, texture_name), size, flags)
+    
+    def lookup(self, key):
+        texture = self.textures.get(key)
+        if texture is not None:
+            self.textures.move_to_end(key)
+            self.stats['hits'] += 1
+            return texture
+        
+        if key[0] in self.missing:
+            return None
+        
+        self.stats['misses'] += 1
+        texture = self.create(key)
+        if texture is not None:
+            self.store(key, texture)
+        return texture
+    
+    def create(self, key):
+        path, size, flags = key
+        
+        if flags == 'fill':
+            color = tuple(int(c) for c in path[len("#color("):-1].split(','))
+            texture = pygame.Surface(size)
+            texture.fill(color)
+            return texture
+        
+        if size is None:
+            if not os.path.exists(path):
+                self.missing.add(path)
+                return None
+            texture = pygame.image.load(path)
+            if self.convert:
+                texture = texture.convert_alpha() if flags == 'alpha' else texture.convert()
+            return texture
+        
+        # Масштабируем из общего исходника - PNG декодируется один раз
+        source = self.lookup((path, None, flags))
+        if source is None:
+            return None
+        return pygame.transform.scale(source, size)
+    
+    def store(self, key, texture):
+        byte_size = texture.get_width() * texture.get_height() * texture.get_bytesize()
+        self.textures[key] = texture
+        self.sizes[key] = byte_size
+        self.total_bytes += byte_size
+    
+    def track(self, owner, byte_size):
+        """Учитывает в бюджете поверхности, которыми владеет не кэш; trim освободит под них место"""
+        self.total_bytes += byte_size - self.tracked.get(owner, 0)
+        if byte_size:
+            self.tracked[owner] = byte_size
+        else:
+            self.tracked.pop(owner, None)
+    
+    def release(self, texture_name, size=None, flags='alpha', scope=None):
+        """Снимает одну ссылку scope с текстуры"""
+        key = self.make_key(texture_name, size, flags)
+        scope_refs = self.refs.get(key)
+        scope = scope or self.current_scope
+        if scope_refs and scope in scope_refs:
+            scope_refs[scope] -= 1
+            if scope_refs[scope] <= 0:
+                del scope_refs[scope]
+    
+    def release_scope(self, scope):
+        """Снимает все ссылки scope (например, при смене карты)"""
+        for scope_refs in self.refs.values():
+            scope_refs.pop(scope, None)
+    
+    def set_scope(self, scope):
+        """Меняет scope по умолчанию для новых ссылок"""
+        self.current_scope = scope
+    
+    def ref_count(self, key):
+        return sum(self.refs.get(key, {}).values())
+    
+    def trim(self):
+        """Выгружает давно не использованные текстуры без ссылок, пока не влезем в бюджет"""
+        if self.total_bytes <= self.budget_bytes:
+            return 0
+        
+        evicted = 0
+        for key in list(self.textures.keys()):
+            if self.total_bytes <= self.budget_bytes:
+                break
+            if self.ref_count(key) > 0:
+                continue
+            del self.textures[key]
+            self.refs.pop(key, None)
+            self.total_bytes -= self.sizes.pop(key)
+            self.stats['evictions'] += 1
+            evicted += 1
+        return evicted
+    
+    def clear_missing(self):
+        """Сбрасывает кэш отсутствующих файлов (после добавления текстур)"""
+        self.missing.clear()
+    
+    def get_stats(self):
+        """Возвращает счетчики менеджера текстур"""
+        return {
+            'hits': self.stats['hits'],
+            'misses': self.stats['misses'],
+            'evictions': self.stats['evictions'],
+            'textures': len(self.textures),
+            'bytes': self.total_bytes,
+            'tracked_bytes': sum(self.tracked.values()),
+            'budget_bytes': self.budget_bytes
+        }
+
+shared_texture_manager = None
+
+def get_shared_texture_manager():
+    """Общий менеджер по умолчанию для систем, созданных без менеджера движка"""
+    global shared_texture_manager
+    if shared_texture_manager is None:
+        shared_texture_manager = TextureManager()
+    return shared_texture_manager
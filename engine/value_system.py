@@ -1,10 +1,12 @@
-import os
-import yaml
+from .event_bus import ValueChanged
 
 class ValueSystem:
     def __init__(self, cache_manager):
         self.values = {}
         self.cache_manager = cache_manager
+        self.changes = {}  # value_id -> новое значение, еще не отданное на запись
+        self.transaction_depth = 0
+        self.event_bus = None
         self.load_values()
     
     def load_values(self):
@@ -12,9 +14,39 @@ class ValueSystem:
         self.values = self.cache_manager.load_values()
     
     def save_values(self):
-        """Сохраняет значения в кэш"""
+        """Синхронно сохраняет все значения в кэш (при выходе)"""
+        self.flush_changes()
         self.cache_manager.save_values(self.values)
     
+    def begin(self):
+        """Начинает транзакцию: изменения копятся до commit. Транзакции могут быть вложенными"""
+        self.transaction_depth += 1
+    
+    def commit(self):
+        """Завершает транзакцию; внешний commit отдает все изменения на запись одной пачкой"""
+        if self.transaction_depth > 0:
+            self.transaction_depth -= 1
+        if self.transaction_depth == 0:
+            self.flush_changes()
+    
+    def record_change(self, value_id, new_value):
+        """Записывает новое значение; если оно не изменилось, событий и записи нет"""
+        value_data = self.values[value_id]
+        if value_data['value'] == new_value:
+            return
+        value_data['value'] = new_value
+        self.changes[value_id] = new_value
+        if self.event_bus:
+            self.event_bus.emit(ValueChanged(value_id, new_value))
+        if self.transaction_depth == 0:
+            self.flush_changes()
+    
+    def flush_changes(self):
+        """Отдает изменения CacheManager; на диск их пишет фоновый поток"""
+        if self.changes:
+            self.cache_manager.queue_values(self.changes)
+            self.changes = {}
+    
     def get_value(self, value_id):
         """Получает значение по ID"""
         if value_id in self.values:
@@ -25,8 +57,7 @@ class ValueSystem:
         """Устанавливает значение"""
         if value_id in self.values:
             value_data = self.values[value_id]
-            value_data['value'] = max(value_data['min'], min(value_data['max'], amount))
-            self.save_values()
+            self.record_change(value_id, max(value_data['min'], min(value_data['max'], amount)))
             return True
         return False
     
@@ -35,8 +66,7 @@ class ValueSystem:
         if value_id in self.values:
             value_data = self.values[value_id]
             new_value = value_data['value'] + amount
-            value_data['value'] = max(value_data['min'], min(value_data['max'], new_value))
-            self.save_values()
+            self.record_change(value_id, max(value_data['min'], min(value_data['max'], new_value)))
             return True
         return False
     
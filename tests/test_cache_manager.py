@@ -0,0 +1,128 @@
+import json
+import os
+
+import pytest
+import yaml
+
+from engine.cache_manager import CacheManager
+
+CONFIG = {
+    'value_0': {'id': 0, 'name': 'Beli', 'start_value': 10, 'min': 0, 'max': 100},
+    'value_1': {'id': 1, 'name': 'Gems', 'start_value': 0, 'min': -5, 'max': 5}
+}
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    # Конфиг значений читается по относительному пути game/config/values.yaml
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("game", "config"))
+    with open(os.path.join("game", "config", "values.yaml"), 'w', encoding='utf-8') as file:
+        yaml.safe_dump(CONFIG, file)
+    return str(tmp_path / "cache")
+
+def write_cache(cache_dir, values):
+    os.makedirs(cache_dir, exist_ok=True)
+    data = {f"value_{value_id}": dict(CONFIG[f"value_{value_id}"], value=value, id=value_id)
+            for value_id, value in values.items()}
+    for value_data in data.values():
+        value_data.pop('start_value')
+    with open(os.path.join(cache_dir, "values.yaml"), 'w', encoding='utf-8') as file:
+        yaml.dump(data, file)
+
+def write_journal(cache_dir, text):
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, "values.journal"), 'w', encoding='utf-8') as file:
+        file.write(text)
+
+def read_cached_values(cache_dir):
+    with open(os.path.join(cache_dir, "values.yaml"), 'r', encoding='utf-8') as file:
+        data = yaml.safe_load(file)
+    return {value_data['id']: value_data['value'] for value_data in data.values()}
+
+def test_starts_from_config(cache_dir):
+    values = CacheManager(cache_dir, flush_interval=0).load_values()
+    assert {value_id: data['value'] for value_id, data in values.items()} == {0: 10, 1: 0}
+    assert read_cached_values(cache_dir) == {0: 10, 1: 0}
+
+def test_journal_is_replayed_over_values_file(cache_dir):
+    write_cache(cache_dir, {0: 20, 1: 1})
+    write_journal(cache_dir, json.dumps({'0': 30}) + "\n" + json.dumps({'0': 40, '1': 2}) + "\n")
+    cache = CacheManager(cache_dir, flush_interval=0)
+    values = cache.load_values()
+    assert values[0]['value'] == 40
+    assert values[1]['value'] == 2
+    # Докатанный журнал сворачивается в values.yaml
+    assert read_cached_values(cache_dir) == {0: 40, 1: 2}
+    assert not os.path.exists(cache.journal_file)
+
+def test_half_written_journal_line_is_skipped(cache_dir):
+    write_cache(cache_dir, {0: 20, 1: 1})
+    write_journal(cache_dir, json.dumps({'0': 30}) + "\n" + '{"0": 9')
+    values = CacheManager(cache_dir, flush_interval=0).load_values()
+    assert values[0]['value'] == 30
+
+def test_values_are_clamped_to_config_bounds(cache_dir):
+    write_cache(cache_dir, {0: 500, 1: -50})
+    values = CacheManager(cache_dir, flush_interval=0).load_values()
+    assert values[0]['value'] == 100
+    assert values[1]['value'] == -5
+    
+    write_journal(cache_dir, json.dumps({'1': 99}) + "\n")
+    values = CacheManager(cache_dir, flush_interval=0).load_values()
+    assert values[1]['value'] == 5
+
+def test_config_defines_value_set_and_schema(cache_dir):
+    os.makedirs(cache_dir)
+    with open(os.path.join(cache_dir, "values.yaml"), 'w', encoding='utf-8') as file:
+        yaml.dump({'value_0': {'id': 0, 'name': 'Old', 'value': 7, 'min': 0, 'max': 10},
+                   'value_9': {'id': 9, 'name': 'Removed', 'value': 1, 'min': 0, 'max': 1}}, file)
+    values = CacheManager(cache_dir, flush_interval=0).load_values()
+    assert values == {
+        0: {'name': 'Beli', 'value': 7, 'min': 0, 'max': 100},
+        1: {'name': 'Gems', 'value': 0, 'min': -5, 'max': 5}
+    }
+    assert read_cached_values(cache_dir) == {0: 7, 1: 0}
+
+def test_flush_appends_journal_and_compacts(cache_dir):
+    cache = CacheManager(cache_dir, flush_interval=0, compact_every=3)
+    cache.load_values()
+    
+    cache.queue_values({0: 11})
+    cache.flush_values()
+    cache.queue_values({0: 12, 1: 1})
+    cache.queue_values({0: 13})  # повторное изменение схлопывается в очереди
+    cache.flush_values()
+    with open(cache.journal_file, 'r', encoding='utf-8') as file:
+        lines = [json.loads(line) for line in file]
+    assert lines == [{'0': 11}, {'0': 13, '1': 1}]
+    assert read_cached_values(cache_dir) == {0: 10, 1: 0}
+    
+    cache.queue_values({1: 2})
+    cache.flush_values()
+    assert not os.path.exists(cache.journal_file)
+    assert cache.journal_entries == 0
+    assert read_cached_values(cache_dir) == {0: 13, 1: 2}
+
+def test_shutdown_flushes_pending_values_without_writer(cache_dir):
+    cache = CacheManager(cache_dir, flush_interval=0)
+    cache.load_values()
+    cache.queue_values({0: 55})
+    cache.save_slot_cooldown(2, 3.0)
+    assert cache.writer is None
+    assert not os.path.exists(cache.journal_file)
+    
+    cache.shutdown()
+    values = CacheManager(cache_dir, flush_interval=0).load_values()
+    assert values[0]['value'] == 55
+    
+    restored = CacheManager(cache_dir, flush_interval=0)
+    restored.load_slot_cooldowns()
+    assert restored.get_slot_cooldown(2) == pytest.approx(3.0)
+
+def test_pending_values_are_not_on_disk_before_flush(cache_dir):
+    # Изменения в очереди до flush не переживают падение процесса
+    cache = CacheManager(cache_dir, flush_interval=0)
+    cache.load_values()
+    cache.queue_values({0: 77})
+    values = CacheManager(cache_dir, flush_interval=0).load_values()
+    assert values[0]['value'] == 10
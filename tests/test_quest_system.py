@@ -0,0 +1,141 @@
+import pytest
+
+from engine.content import YamlContent
+from engine.event_bus import EntityKilled, EventBus
+from engine.quest_system import QuestSystem
+from engine.value_system import ValueSystem
+
+QUESTS = {
+    1: {'id': 1, 'name': 'Rats', 'quest_task': ["!quest_kill(10, 2)", "!quest_kill(11, 1)"],
+        'quest_reward': ["!quest_reward_value(0, 5)", "!quest_reward_value(0, 7)", "!quest_reward_giveitem(3)"]},
+    2: {'id': 2, 'name': 'More rats', 'quest_task': ["!quest_kill(10, 3)"], 'quest_reward': []},
+    3: {'id': 3, 'name': 'Bats', 'quest_task': ["!quest_kill(12, 1)"], 'quest_reward': []}
+}
+
+class FakeContent(YamlContent):
+    def templates(self, category):
+        return {quest_id: dict(quest) for quest_id, quest in QUESTS.items()}
+
+class FakeCache:
+    def __init__(self):
+        self.queued = []
+    
+    def load_values(self):
+        return {0: {'name': 'Beli', 'value': 0, 'min': 0, 'max': 1000}}
+    
+    def queue_values(self, changes):
+        self.queued.append(dict(changes))
+
+class FakeInventory:
+    def __init__(self):
+        self.given = []
+    
+    def get_item(self, slot):
+        return None
+    
+    def give_item(self, item_id, slot):
+        self.given.append(item_id)
+        return True
+
+class FakeEntities:
+    enemy_templates = {}
+
+class FakeLocalization:
+    def get(self, key, default=None):
+        return default or key
+
+class FakeItems:
+    def get_item(self, item_id):
+        return None
+
+@pytest.fixture
+def quests():
+    cache = FakeCache()
+    system = QuestSystem(FakeEntities(), FakeInventory(), None, FakeItems(), FakeLocalization(), None,
+                         ValueSystem(cache), content=FakeContent())
+    system.set_event_bus(EventBus())
+    system.cache = cache
+    return system
+
+def kill(quests, enemy_id, times=1):
+    for _ in range(times):
+        quests.event_bus.emit(EntityKilled(enemy_id, None))
+    quests.event_bus.flush()
+
+def progress(quests, quest_id):
+    return [task_info['current'] for task_info in quests.active_quests[quest_id]['progress'].values()]
+
+def test_give_quest_indexes_its_tasks(quests):
+    quests.give_quest(1)
+    assert set(quests.task_index) == {('kill', 10), ('kill', 11)}
+    assert set(quests.task_index[('kill', 10)]) == {(1, 0)}
+    assert quests.active_quests[1]['remaining'] == 2
+
+def test_kill_advances_only_matching_tasks(quests):
+    quests.give_quest(1)
+    quests.give_quest(3)
+    kill(quests, 10)
+    assert progress(quests, 1) == [1, 0]
+    assert progress(quests, 3) == [0]
+    kill(quests, 99)
+    assert progress(quests, 1) == [1, 0]
+    assert quests.active_quests[1]['remaining'] == 2
+
+def test_finished_task_leaves_index_and_stops_counting(quests):
+    quests.give_quest(1)
+    kill(quests, 10, 4)
+    assert progress(quests, 1) == [2, 0]
+    assert ('kill', 10) not in quests.task_index
+    assert quests.active_quests[1]['remaining'] == 1
+
+def test_quests_sharing_an_enemy_both_advance(quests):
+    quests.give_quest(1)
+    quests.give_quest(2)
+    kill(quests, 10, 2)
+    assert progress(quests, 1) == [2, 0]
+    assert progress(quests, 2) == [2]
+    assert set(quests.task_index[('kill', 10)]) == {(2, 0)}
+    kill(quests, 10)
+    assert 2 in quests.completed_quests
+    assert 2 not in quests.active_quests
+
+def test_cancel_quest_removes_index_entries(quests):
+    quests.give_quest(1)
+    quests.give_quest(2)
+    assert quests.cancel_quest(1)
+    assert set(quests.task_index) == {('kill', 10)}
+    assert set(quests.task_index[('kill', 10)]) == {(2, 0)}
+    assert quests.cancel_quest(2)
+    assert quests.task_index == {}
+    kill(quests, 10)
+    assert quests.active_quests == {}
+
+def test_quest_completes_once_with_rewards_in_one_transaction(quests):
+    quests.give_quest(1)
+    kill(quests, 10, 2)
+    assert 1 in quests.active_quests
+    kill(quests, 11)
+    assert 1 in quests.completed_quests
+    assert 1 not in quests.active_quests
+    assert quests.task_index == {}
+    assert quests.pending_completion == set()
+    
+    # Обе награды значения ушли на запись одной пачкой
+    assert quests.value_system.get_value(0) == 12
+    assert quests.cache.queued == [{0: 12}]
+    assert quests.inventory.given == [3]
+    
+    kill(quests, 10, 3)
+    kill(quests, 11)
+    quests.update_quests()
+    assert quests.value_system.get_value(0) == 12
+    assert quests.inventory.given == [3]
+
+def test_regiven_quest_starts_from_zero(quests):
+    quests.give_quest(2)
+    kill(quests, 10, 3)
+    assert quests.give_quest(2)
+    assert progress(quests, 2) == [0]
+    assert quests.active_quests[2]['remaining'] == 1
+    kill(quests, 10, 3)
+    assert 2 in quests.completed_quests
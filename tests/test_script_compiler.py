@@ -0,0 +1,129 @@
+import pytest
+
+from engine.script_compiler import Instruction, ScriptCompileError, compile_script
+from engine.script_runner import ScriptRunner
+
+class FakeValues:
+    def __init__(self, **values):
+        self.values = {int(key[1:]): value for key, value in values.items()}
+    
+    def get_value(self, value_id):
+        return self.values.get(value_id, 0)
+    
+    def subtract_value(self, value_id, amount):
+        self.values[value_id] = self.get_value(value_id) - amount
+
+@pytest.fixture
+def runner():
+    runner = ScriptRunner(None, None)
+    runner.silent_mode = True
+    runner.value_system = FakeValues(v0=3)
+    runner.log = []
+    runner.op_handlers['log'] = lambda color, message: runner.log.append(message)
+    return runner
+
+def test_nested_conditions_jump_past_their_end():
+    program, errors = compile_script([
+        "&%0.v > 1:",
+        "&%0.v > 5:",
+        "$log.green(\"inner\")",
+        "&end",
+        "$log.green(\"outer\")",
+        "&end",
+        "@close"
+    ])
+    assert errors == []
+    assert program == [
+        Instruction('if_greater', (0, 1.0, 4), 1),
+        Instruction('if_greater', (0, 5.0, 3), 2),
+        Instruction('log', ('green', 'inner'), 3),
+        Instruction('log', ('green', 'outer'), 5),
+        Instruction('close_dialog', (), 7)
+    ]
+
+def test_unclosed_condition_runs_to_the_end_of_the_script():
+    program, errors = compile_script("$log.green(\"a\")\n&%0.v > 1:\n$log.green(\"b\")")
+    assert program[1] == Instruction('if_greater', (0, 1.0, 3), 2)
+    assert len(errors) == 1
+    assert errors[0].statement == 2
+    assert "not closed" in errors[0].message
+
+def test_bad_argument_reports_statement_number():
+    program, errors = compile_script(["@close", "", "# comment", "$quest.Give(abc)", "&end"])
+    assert [instruction.op for instruction in program] == ['close_dialog']
+    assert [(error.statement, error.command) for error in errors] == [
+        (4, "$quest.Give(abc)"),
+        (5, "&end")
+    ]
+    assert all(isinstance(error, ScriptCompileError) for error in errors)
+    assert str(errors[0]).startswith("statement 4:")
+
+def test_unknown_commands_are_skipped():
+    program, errors = compile_script(["$function.nullstroke", "%0.v -= 2"])
+    assert errors == []
+    assert program == [Instruction('value_subtract', (0, 2.0), 2)]
+
+def test_run_follows_conditions(runner):
+    program, _ = compile_script([
+        "&%0.v > 1:",
+        "$log.green(\"a\")",
+        "&%0.v > 5:",
+        "$log.green(\"b\")",
+        "&end",
+        "$log.green(\"c\")",
+        "&end",
+        "$log.green(\"d\")"
+    ])
+    task = runner.execute_program(program)
+    assert task.finished
+    assert runner.log == ['a', 'c', 'd']
+    
+    runner.log.clear()
+    runner.value_system.values[0] = 0
+    runner.execute_program(program)
+    assert runner.log == ['d']
+
+def test_call_script_returns_to_caller(runner):
+    runner.scripts[1] = ScriptRunner.parse_script({'script': ["$log.green(\"callee\")"]})
+    program, _ = compile_script(["$call.script(1)", "$log.green(\"caller\")"])
+    runner.execute_program(program)
+    assert runner.log == ['callee', 'caller']
+    assert 1 in runner.executed_scripts
+
+def test_call_depth_is_bounded(runner):
+    runner.max_call_depth = 5
+    runner.scripts[1] = ScriptRunner.parse_script({'script': ["$log.green(\"x\")", "$call.script(1)"]})
+    task = runner.execute_program(runner.scripts[1]['program'])
+    assert task.finished
+    assert task.call_stack == []
+    assert len(runner.log) == 6
+
+def test_deep_call_chain_does_not_use_python_stack(runner):
+    depth = 5000
+    for script_id in range(depth):
+        runner.scripts[script_id] = ScriptRunner.parse_script({'script': [f"$call.script({script_id + 1})"]})
+    runner.scripts[depth] = ScriptRunner.parse_script({'script': ["$log.green(\"bottom\")"]})
+    task = runner.execute_program(runner.scripts[0]['program'])
+    assert task.finished
+    assert runner.log == ['bottom']
+
+def test_delay_wakes_tasks_in_time_then_start_order(runner):
+    for name, delay in (('a', 0.5), ('b', 0.2), ('c', 0.2), ('d', 0)):
+        runner.execute_program(compile_script([f"!delay({delay})", f"$log.green(\"{name}\")"])[0])
+    assert runner.log == []
+    assert runner.get_waiting_count() == 4
+    
+    runner.update(0.1)
+    assert runner.log == ['d']
+    runner.update(0.1)
+    assert runner.log == ['d', 'b', 'c']
+    runner.update(0.3)
+    assert runner.log == ['d', 'b', 'c', 'a']
+    assert runner.get_waiting_count() == 0
+
+def test_zero_delay_waits_for_the_next_tick(runner):
+    runner.execute_program(compile_script(["!delay(0)", "$log.green(\"1\")", "!delay(0)", "$log.green(\"2\")"])[0])
+    runner.update(1 / 60)
+    assert runner.log == ['1']
+    runner.update(1 / 60)
+    assert runner.log == ['1', '2']
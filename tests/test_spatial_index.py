@@ -0,0 +1,147 @@
+import random
+
+import pygame
+
+from engine.spatial_index import CollisionGrid, PointGrid
+
+def make_grid(*walls, cell_size=32):
+    grid = CollisionGrid(cell_size)
+    for index, wall in enumerate(walls):
+        rect, layer = wall if isinstance(wall[0], tuple) else (wall, 1)
+        grid.insert(f"wall_{index}", rect, layer)
+    return grid
+
+def test_move_rect_free_space():
+    grid = make_grid((100, 100, 10, 10))
+    rect = pygame.Rect(0, 0, 10, 10)
+    assert grid.move_rect(rect, 7, -3) == (False, False)
+    assert rect.topleft == (7, -3)
+
+def test_move_rect_stops_flush_against_wall():
+    grid = make_grid((20, 0, 10, 10))
+    rect = pygame.Rect(0, 0, 10, 10)
+    assert grid.move_rect(rect, 25, 0) == (True, False)
+    assert rect.right == 20
+    
+    # Вплотную к стене дальше не сдвинуться, но отойти можно
+    assert grid.move_rect(rect, 1, 0) == (True, False)
+    assert rect.right == 20
+    assert grid.move_rect(rect, -5, 0) == (False, False)
+    assert rect.right == 15
+
+def test_move_rect_does_not_tunnel_through_thin_wall():
+    grid = make_grid((50, -100, 2, 300))
+    rect = pygame.Rect(0, 0, 10, 10)
+    assert grid.move_rect(rect, 500, 0) == (True, False)
+    assert rect.right == 50
+
+def test_move_rect_slides_along_wall():
+    grid = make_grid((20, -100, 10, 300))
+    rect = pygame.Rect(0, 0, 10, 10)
+    assert grid.move_rect(rect, 15, 12) == (True, False)
+    assert rect.topleft == (10, 12)
+
+def test_move_rect_negative_directions():
+    grid = make_grid((-30, 0, 10, 10), (0, -30, 10, 10))
+    rect = pygame.Rect(0, 0, 10, 10)
+    assert grid.move_rect(rect, -40, 0) == (True, False)
+    assert rect.left == -20
+    rect = pygame.Rect(0, 0, 10, 10)
+    assert grid.move_rect(rect, 0, -40) == (False, True)
+    assert rect.top == -20
+
+def test_move_rect_resolves_axes_in_order_at_corners():
+    grid = make_grid((15, 15, 10, 10))
+    rect = pygame.Rect(0, 0, 10, 10)
+    assert grid.move_rect(rect, 10, 10) == (False, True)
+    assert rect.topleft == (10, 5)
+
+def test_move_rect_lets_overlapping_rect_leave():
+    grid = make_grid((0, 0, 40, 40))
+    rect = pygame.Rect(10, 10, 10, 10)
+    assert grid.move_rect(rect, 100, 0) == (False, False)
+    assert rect.left == 110
+    
+    rect = pygame.Rect(10, 10, 10, 10)
+    assert grid.move_rect(rect, 0, -100) == (False, False)
+    assert rect.top == -90
+
+def test_move_rect_respects_layer_mask():
+    grid = make_grid(((20, 0, 10, 10), 2), ((60, 0, 10, 10), 1))
+    rect = pygame.Rect(0, 0, 10, 10)
+    assert grid.move_rect(rect, 100, 0, mask=1) == (True, False)
+    assert rect.right == 60
+    
+    rect = pygame.Rect(0, 0, 10, 10)
+    assert grid.move_rect(rect, 100, 0, mask=2) == (True, False)
+    assert rect.right == 20
+    
+    rect = pygame.Rect(0, 0, 10, 10)
+    assert grid.move_rect(rect, 100, 0, mask=4) == (False, False)
+    assert rect.left == 100
+
+def test_move_rect_after_remove_and_update():
+    grid = make_grid((20, 0, 10, 10))
+    grid.update("wall_0", (200, 0, 10, 10))
+    rect = pygame.Rect(0, 0, 10, 10)
+    assert grid.move_rect(rect, 100, 0) == (False, False)
+    grid.remove("wall_0")
+    assert grid.move_rect(rect, 200, 0) == (False, False)
+    assert len(grid) == 0 and not grid.cells and not grid.layers
+
+def brute_nearest(points, x, y, k, max_radius=None):
+    found = []
+    for obj, (obj_x, obj_y) in points.items():
+        distance = ((obj_x - x) ** 2 + (obj_y - y) ** 2) ** 0.5
+        if max_radius is None or distance <= max_radius:
+            found.append((distance, obj))
+    found.sort(key=lambda item: item[0])
+    return [distance for distance, _ in found[:k]]
+
+def test_query_nearest_matches_brute_force():
+    rng = random.Random(7)
+    grid = PointGrid(64)
+    points = {}
+    for index in range(300):
+        points[index] = (rng.uniform(-2000, 2000), rng.uniform(-2000, 2000))
+        grid.insert(index, *points[index])
+    
+    for _ in range(50):
+        x, y = rng.uniform(-2500, 2500), rng.uniform(-2500, 2500)
+        for k in (1, 5, 20):
+            result = grid.query_nearest(x, y, k)
+            assert [distance for distance, _ in result] == brute_nearest(points, x, y, k)
+            assert all(((points[obj][0] - x) ** 2 + (points[obj][1] - y) ** 2) ** 0.5 == distance
+                       for distance, obj in result)
+
+def test_query_nearest_prefers_closer_point_in_outer_ring():
+    # Точка в соседней ячейке ближе точки в дальнем углу своей ячейки
+    grid = PointGrid(100)
+    grid.insert('same_cell', 1, 1)
+    grid.insert('next_cell', 101, 99)
+    assert grid.query_nearest(99, 99) == [(2.0, 'next_cell')]
+
+def test_query_nearest_with_max_radius():
+    grid = PointGrid(50)
+    grid.insert('near', 10, 0)
+    grid.insert('far', 500, 0)
+    assert grid.query_nearest(0, 0, k=2, max_radius=100) == [(10.0, 'near')]
+    assert grid.query_nearest(1000, 1000, k=1, max_radius=100) == []
+
+def test_query_nearest_small_or_empty_grid():
+    grid = PointGrid(32)
+    assert grid.query_nearest(0, 0, k=3) == []
+    grid.insert('a', -40, -40)
+    grid.insert('b', 5000, 5000)
+    assert [obj for _, obj in grid.query_nearest(0, 0, k=5)] == ['a', 'b']
+    assert grid.query_nearest(0, 0, k=0) == []
+
+def test_query_nearest_after_move_and_remove():
+    grid = PointGrid(32)
+    grid.insert('a', 0, 0)
+    grid.insert('b', 100, 0)
+    grid.move('a', 300, 0)
+    assert grid.query_nearest(0, 0) == [(100.0, 'b')]
+    grid.remove('b')
+    assert grid.query_nearest(0, 0) == [(300.0, 'a')]
+    assert grid.query_radius(300, 0, 1) == ['a']